@@ -0,0 +1,161 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (year, month, category) -> [sum, count, min, max], in integer minor units
+BucketKey = Tuple[int, int, Optional[str]]
+
+
+def aggregate_index_path(data_file: str) -> str:
+    return f"{data_file}.summary.json"
+
+
+def year_month(date) -> Tuple[int, int]:
+    """Return ``(year, month)`` for a datetime or a stored ISO-8601 string without parsing the rest."""
+    if isinstance(date, datetime):
+        return date.year, date.month
+    return int(date[0:4]), int(date[5:7])
+
+
+class AggregateIndex:
+    """Per (year, month, category) sum, count, min and max of expense amounts.
+
+    Amounts go in as integer minor units at ``scale`` decimal places, so the
+    sums are exact; ``query`` converts the results back to major units.
+    The index remembers the ``version()`` of the data it was built from. A
+    repository keeps it current on its own writes and rebuilds it when the data
+    changed behind its back. When ``file_path`` is set the index is persisted
+    there, so a fresh process can answer summaries without reading any rows.
+
+    ``last_id`` is the highest expense id in that data, or None when unknown, so
+    a writer can number new expenses without reading the rows either.
+    """
+
+    def __init__(self, file_path: Optional[str] = None, scale: Optional[int] = 2):
+        self.file_path = file_path
+        # None takes the scale from the persisted index.
+        self.scale = scale
+        self.version = None
+        self.buckets: Dict[BucketKey, List] = {}
+        self.last_id: Optional[int] = None
+        self._loaded = False
+
+    def add(self, date, category: Optional[str], amount: int) -> None:
+        key = (*year_month(date), category)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.buckets[key] = [amount, 1, amount, amount]
+        else:
+            bucket[0] += amount
+            bucket[1] += 1
+            bucket[2] = min(bucket[2], amount)
+            bucket[3] = max(bucket[3], amount)
+
+    def remove(self, date, category: Optional[str], amount: int) -> bool:
+        """Take one amount out of its bucket. Returns False when min/max can no longer be kept exact."""
+        key = (*year_month(date), category)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return False
+        if bucket[1] == 1:
+            del self.buckets[key]
+            return True
+        bucket[0] -= amount
+        bucket[1] -= 1
+        return amount != bucket[2] and amount != bucket[3]
+
+    def rebuild(self, entries: Iterable[Tuple], version, last_id: Optional[int] = None) -> None:
+        """Recompute every bucket from ``(date, category, minor units)`` entries."""
+        self.buckets = {}
+        for date, category, amount in entries:
+            self.add(date, category, amount)
+        self.last_id = last_id
+        self.set_version(version)
+
+    def clear(self, version) -> None:
+        self.buckets = {}
+        self.last_id = 0
+        self.set_version(version)
+
+    def set_version(self, version) -> None:
+        # Stored as JSON so it compares equal to a version loaded back from disk.
+        self.version = json.loads(json.dumps(version))
+
+    def is_current(self, version) -> bool:
+        if not self._loaded:
+            self.load()
+        return version is not None and self.version == json.loads(json.dumps(version))
+
+    def invalidate(self) -> None:
+        self.version = None
+
+    def query(self, year: Optional[int] = None, month: Optional[int] = None, category: Optional[str] = None,
+              start_month: Optional[Tuple[int, int]] = None, end_month: Optional[Tuple[int, int]] = None) -> Dict:
+        """Combine the matching buckets. ``start_month``/``end_month`` are inclusive ``(year, month)`` bounds."""
+        total, count, minimum, maximum = 0, 0, None, None
+        for (bucket_year, bucket_month, bucket_category), bucket in self.buckets.items():
+            if year is not None and bucket_year != year:
+                continue
+            if month is not None and bucket_month != month:
+                continue
+            if category is not None and bucket_category != category:
+                continue
+            if start_month is not None and (bucket_year, bucket_month) < tuple(start_month):
+                continue
+            if end_month is not None and (bucket_year, bucket_month) > tuple(end_month):
+                continue
+            total += bucket[0]
+            count += bucket[1]
+            minimum = bucket[2] if minimum is None else min(minimum, bucket[2])
+            maximum = bucket[3] if maximum is None else max(maximum, bucket[3])
+        factor = 10 ** (self.scale or 0)
+        return {"total": total / factor, "count": count,
+                "minimum": None if minimum is None else minimum / factor,
+                "maximum": None if maximum is None else maximum / factor}
+
+    def load(self) -> bool:
+        self._loaded = True
+        if self.file_path is None or not os.path.exists(self.file_path):
+            return False
+        try:
+            with open(self.file_path, "r") as index_file:
+                data = json.load(index_file)
+        except (json.JSONDecodeError, IOError):
+            # A damaged index is only a cache; it gets rebuilt from the data.
+            return False
+        stored_scale = data.get("scale")
+        if stored_scale is None or (self.scale is not None and stored_scale != self.scale):
+            # Built for another scale, or summed floats before amounts were stored in minor units.
+            return False
+        self.scale = stored_scale
+        self.version = data["version"]
+        self.last_id = data.get("last_id")
+        self.buckets = {(year, month, category): [total, count, minimum, maximum]
+                        for year, month, category, total, count, minimum, maximum in data["buckets"]}
+        return True
+
+    def save(self) -> None:
+        if self.file_path is None:
+            return
+        data = {
+            "version": self.version,
+            "scale": self.scale,
+            "last_id": self.last_id,
+            "buckets": [[*key, *bucket] for key, bucket in self.buckets.items()],
+        }
+        directory, name = os.path.split(os.path.abspath(self.file_path))
+        try:
+            # A unique temporary name, so concurrent saves never replace each other's half-written file.
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as index_file:
+                    json.dump(data, index_file)
+                os.replace(temp_path, self.file_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                raise
+        except IOError as e:
+            raise IOError(f"Failed to write to {self.file_path}: {e}")
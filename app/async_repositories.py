@@ -0,0 +1,130 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from .boundaries import AsyncExpenseRepositoryInterface, ExpenseRepositoryInterface
+from .metrics import METRICS
+from .models import Expense, ExpenseQuery, ExpenseSummary
+
+
+class ExecutorExpenseRepository(AsyncExpenseRepositoryInterface):
+    """Runs a synchronous repository on an executor, so its file and database I/O never blocks the event loop.
+
+    The default executor has a single thread. The repositories and their
+    caches are not thread-safe, and one thread also runs calls in the order
+    they were made. Calls never run in parallel, so a slow read such as an
+    export or report delays every call queued behind it. Two things make
+    fewer calls reach that thread under many concurrent requests:
+
+    * identical reads that overlap share one call, unless a write finished in between;
+    * adds that arrive while a write is running are committed together by one ``add_expenses``.
+
+    Results of a shared read are shared too; treat the expenses as read-only.
+    """
+
+    def __init__(self, repository: ExpenseRepositoryInterface, executor: Optional[Executor] = None,
+                 max_batch: int = 1000):
+        self.repository = repository
+        self.max_batch = max_batch
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="expense-repository")
+        self._reads: Dict[Hashable, asyncio.Future] = {}
+        # Bumped whenever a write finishes, so a read started before it is never handed to a later caller.
+        self._generation = 0
+        self._pending_adds: List[Tuple[Expense, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def add_expense(self, expense: Expense) -> Expense:
+        future = asyncio.get_running_loop().create_future()
+        self._pending_adds.append((expense, future))
+        if self._flusher is None or self._flusher.done():
+            # Starts on the next loop iteration, after every add made in this one has been queued.
+            self._flusher = asyncio.ensure_future(self._flush_adds())
+        return await future
+
+    async def add_expenses(self, expenses: List[Expense]) -> List[Expense]:
+        return await self._write(self.repository.add_expenses, expenses)
+
+    async def get_all_expenses(self) -> List[Expense]:
+        return list(await self._read(self.repository.get_all_expenses))
+
+    async def get_all_expenses_by_category(self, category: str) -> List[Expense]:
+        return list(await self._read(self.repository.get_all_expenses_by_category, category))
+
+    async def get_expense(self, expense_id: int) -> Expense:
+        return await self._read(self.repository.get_expense, expense_id)
+
+    async def query_expenses(self, query: ExpenseQuery) -> List[Expense]:
+        return list(await self._read(self._query_page, query))
+
+    async def update_expense(self, expense: Expense) -> Expense:
+        return await self._write(self.repository.update_expense, expense)
+
+    async def delete_expense(self, expense_id: int) -> None:
+        await self._write(self.repository.delete_expense, expense_id)
+
+    async def expense_summary(self, year: Optional[int] = None, month: Optional[int] = None,
+                              category: Optional[str] = None, start_month: Optional[Tuple[int, int]] = None,
+                              end_month: Optional[Tuple[int, int]] = None) -> ExpenseSummary:
+        return await self._read(self.repository.expense_summary, year, month, category, start_month, end_month)
+
+    async def clear_all_expenses(self) -> None:
+        await self._write(self.repository.clear_all_expenses)
+
+    async def export_expenses_to_csv(self, file_path: str, category: Optional[str] = None,
+                                     month: Optional[int] = None, year: Optional[int] = None,
+                                     compress: bool = False) -> None:
+        await self._run(self.repository.export_expenses_to_csv, file_path, category, month, year, compress)
+
+    def close(self) -> None:
+        """Wait for running calls and stop the executor, unless it was passed in."""
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
+
+    def _query_page(self, query: ExpenseQuery) -> List[Expense]:
+        return list(self.repository.query_expenses(query))
+
+    async def _run(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(function, *args))
+
+    async def _read(self, function: Callable, *args):
+        key = (function, args, self._generation)
+        future = self._reads.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(function, *args))
+            self._reads[key] = future
+            future.add_done_callback(lambda done: self._forget_read(key, done))
+        else:
+            METRICS.count("async.coalesced_reads")
+        # One caller giving up must not cancel the load the others are waiting for.
+        return await asyncio.shield(future)
+
+    def _forget_read(self, key: Hashable, future: asyncio.Future) -> None:
+        self._reads.pop(key, None)
+        if not future.cancelled():
+            # Mark the exception as retrieved even if every caller was cancelled.
+            future.exception()
+
+    async def _write(self, function: Callable, *args):
+        try:
+            return await self._run(function, *args)
+        finally:
+            self._generation += 1
+
+    async def _flush_adds(self) -> None:
+        while self._pending_adds:
+            batch = self._pending_adds[:self.max_batch]
+            del self._pending_adds[:self.max_batch]
+            METRICS.count("async.add_batches")
+            METRICS.count("async.batched_adds", len(batch))
+            try:
+                await self._write(self.repository.add_expenses, [expense for expense, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for expense, future in batch:
+                if not future.done():
+                    future.set_result(expense)
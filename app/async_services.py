@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .async_repositories import ExecutorExpenseRepository
+from .boundaries import AsyncExpenseRepositoryInterface, ExpenseRepositoryInterface
+from .importers import ImportResult, normalise_row, read_import_file, validate_rows
+from .models import Expense, ExpenseQuery, ExpenseSummary
+from .services import ExpenseService
+
+
+class AsyncExpenseService:
+    """ExpenseService for asyncio applications such as an aiohttp handler.
+
+    A plain repository is wrapped in an ExecutorExpenseRepository. Validating
+    a single expense is cheap and runs on the event loop. Bulk validation and
+    file parsing run in the loop's default executor.
+    """
+
+    def __init__(self, expense_repository: Union[AsyncExpenseRepositoryInterface, ExpenseRepositoryInterface]):
+        if isinstance(expense_repository, ExpenseRepositoryInterface):
+            expense_repository = ExecutorExpenseRepository(expense_repository)
+        self.repository = expense_repository
+
+    async def add_expense(self, description: str, amount: float, category: Optional[str] = '',
+                          date_time: Optional[datetime] = None) -> Expense:
+        return await self.repository.add_expense(ExpenseService.new_expense(description, amount, category, date_time))
+
+    async def add_expenses(self, rows: Iterable[Dict], batch_size: int = 1000) -> ImportResult:
+        """Validate ``rows`` in batches and store the valid ones in a single write."""
+        return await self._import_rows(lambda: enumerate(map(normalise_row, rows), start=1), batch_size)
+
+    async def import_expenses(self, file_path: str, file_format: Optional[str] = None,
+                              batch_size: int = 1000) -> ImportResult:
+        """Import a CSV or JSON-lines file; errors are reported by line number."""
+        return await self._import_rows(lambda: read_import_file(file_path, file_format), batch_size)
+
+    async def _import_rows(self, numbered_rows, batch_size: int) -> ImportResult:
+        expenses, errors = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: validate_rows(numbered_rows(), batch_size))
+        if expenses:
+            await self.repository.add_expenses(expenses)
+        return ImportResult(added=len(expenses), errors=errors)
+
+    async def list_expenses(self, category: Optional[str] = '') -> List[Expense]:
+        if category:
+            return await self.repository.get_all_expenses_by_category(category)
+        return await self.repository.get_all_expenses()
+
+    async def query_expenses(self, category: Optional[str] = None, search: Optional[str] = None, sort: str = "id",
+                             descending: bool = False, limit: Optional[int] = None, offset: int = 0,
+                             after: Optional[str] = None) -> List[Expense]:
+        """One page of matching expenses; see ExpenseQuery. Give a ``limit`` to keep pages small."""
+        query = ExpenseQuery(category=category or None, search=search or None, sort=sort, descending=descending,
+                             limit=limit, offset=offset, after=after)
+        return await self.repository.query_expenses(query)
+
+    async def summary(self, month: int = None, year: Optional[int] = None, category: Optional[str] = None,
+                      start_month: Optional[Tuple[int, int]] = None,
+                      end_month: Optional[Tuple[int, int]] = None) -> float:
+        return (await self.summary_details(month, year, category, start_month, end_month)).total
+
+    async def summary_details(self, month: int = None, year: Optional[int] = None, category: Optional[str] = None,
+                              start_month: Optional[Tuple[int, int]] = None,
+                              end_month: Optional[Tuple[int, int]] = None) -> ExpenseSummary:
+        """Total, count, min and max of the matching expenses. A month without a year means this year."""
+        if month and not year:
+            year = datetime.now().year
+        return await self.repository.expense_summary(year, month or None, category or None, start_month, end_month)
+
+    async def get(self, expense_id: int) -> Expense:
+        return await self.repository.get_expense(expense_id)
+
+    async def update(self, expense_id: int, description: Optional[str] = None, amount: Optional[float] = None,
+                     category: Optional[str] = None, date_time: Optional[datetime] = None) -> Expense:
+        """Change the given fields of an expense; the others keep their stored values."""
+        current = await self.repository.get_expense(expense_id)
+        return await self.repository.update_expense(
+            ExpenseService.changed_expense(current, description, amount, category, date_time))
+
+    async def delete(self, expense_id: int) -> None:
+        await self.repository.delete_expense(expense_id)
+
+    async def clear_all_expenses(self) -> None:
+        await self.repository.clear_all_expenses()
+
+    async def export_expenses_to_csv(self, file_path: str, category: Optional[str] = None,
+                                     month: Optional[int] = None, year: Optional[int] = None,
+                                     compress: bool = False) -> None:
+        await self.repository.export_expenses_to_csv(file_path, category, month, year, compress)
+
+    def close(self) -> None:
+        if isinstance(self.repository, ExecutorExpenseRepository):
+            self.repository.close()
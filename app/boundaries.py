@@ -1,20 +1,38 @@
 from abc import ABC, abstractmethod
-from app.models import Expense
-from typing import List, Dict
+from contextlib import nullcontext
+from typing import ContextManager, List, Dict, Optional, Tuple, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Only needed for annotations; file handlers import this module and must stay free of pydantic.
+    from app.currency import LedgerCurrency
+    from app.models import Expense, ExpenseChange, ExpenseQuery, ExpenseSummary
+    from app.table import ExpenseTable
 
 
 class ExpenseRepositoryInterface(ABC):
 
     @abstractmethod
-    def add_expense(self, expense: Expense) -> Expense:
+    def add_expense(self, expense: "Expense") -> "Expense":
+        pass
+
+    @abstractmethod
+    def add_expenses(self, expenses: List["Expense"]) -> List["Expense"]:
+        pass
+
+    @abstractmethod
+    def get_all_expenses(self) -> List["Expense"]:
+        pass
+
+    @abstractmethod
+    def get_all_expenses_by_category(self, category: str) -> List["Expense"]:
         pass
 
     @abstractmethod
-    def get_all_expenses(self) -> List[Expense]:
+    def get_expense(self, expense_id: int) -> "Expense":
         pass
 
     @abstractmethod
-    def get_all_expenses_by_category(self, category: str) -> List[Expense]:
+    def update_expense(self, expense: "Expense") -> "Expense":
         pass
 
     @abstractmethod
@@ -26,7 +44,17 @@ class ExpenseRepositoryInterface(ABC):
         pass
 
     @abstractmethod
-    def total_expense_by_month(self, month) -> float:
+    def total_expense_by_month(self, month, year: Optional[int] = None) -> float:
+        pass
+
+    @abstractmethod
+    def expense_summary(self, year: Optional[int] = None, month: Optional[int] = None,
+                        category: Optional[str] = None, start_month: Optional[Tuple[int, int]] = None,
+                        end_month: Optional[Tuple[int, int]] = None) -> "ExpenseSummary":
+        pass
+
+    @abstractmethod
+    def get_expense_table(self) -> "ExpenseTable":
         pass
 
     @abstractmethod
@@ -34,7 +62,100 @@ class ExpenseRepositoryInterface(ABC):
         pass
 
     @abstractmethod
-    def export_expenses_to_csv(self, file_path: str) -> None:
+    def export_expenses_to_csv(self, file_path: str, category: Optional[str] = None, month: Optional[int] = None,
+                               year: Optional[int] = None, compress: bool = False) -> None:
+        pass
+
+    @abstractmethod
+    def migrate_amounts(self, currency: "LedgerCurrency") -> int:
+        """Rewrite every stored amount as integer minor units of ``currency``. Returns the number of expenses."""
+        pass
+
+    @abstractmethod
+    def changes_since(self, sequence: int) -> Tuple[int, Iterator["ExpenseChange"]]:
+        """Return the sequence of the latest change, and the changes after ``sequence`` up to it, oldest first.
+
+        The returned sequence is the checkpoint to pass next time. Sequences only
+        grow, so a sync that keeps its checkpoint reads only what changed since.
+        """
+        pass
+
+    def version(self) -> Optional[Tuple]:
+        """Return a token that changes whenever the stored expenses change, or None if unknown."""
+        return None
+
+    def iter_expenses(self, category: Optional[str] = None) -> Iterator["Expense"]:
+        """Yield the expenses, optionally of one category, in id order.
+
+        Repositories override this to build each expense only when it is reached.
+        """
+        yield from (self.get_all_expenses_by_category(category) if category is not None
+                    else self.get_all_expenses())
+
+    def query_expenses(self, query: "ExpenseQuery") -> Iterator["Expense"]:
+        """Yield one sorted page of the expenses matching ``query``."""
+        from app.queries import run_query
+        return run_query(self.iter_expenses(query.category), query)
+
+    def memory_footprint(self) -> int:
+        """Roughly how many bytes this repository keeps in memory between calls."""
+        return 0
+
+    def close(self) -> None:
+        """Release open files or connections; the repository is not used afterwards."""
+        pass
+
+
+class AsyncExpenseRepositoryInterface(ABC):
+    """The repository operations as coroutines, for callers running on an asyncio event loop."""
+
+    @abstractmethod
+    async def add_expense(self, expense: "Expense") -> "Expense":
+        pass
+
+    @abstractmethod
+    async def add_expenses(self, expenses: List["Expense"]) -> List["Expense"]:
+        pass
+
+    @abstractmethod
+    async def get_all_expenses(self) -> List["Expense"]:
+        pass
+
+    @abstractmethod
+    async def get_all_expenses_by_category(self, category: str) -> List["Expense"]:
+        pass
+
+    @abstractmethod
+    async def get_expense(self, expense_id: int) -> "Expense":
+        pass
+
+    @abstractmethod
+    async def query_expenses(self, query: "ExpenseQuery") -> List["Expense"]:
+        """One page of the expenses matching ``query``."""
+        pass
+
+    @abstractmethod
+    async def update_expense(self, expense: "Expense") -> "Expense":
+        pass
+
+    @abstractmethod
+    async def delete_expense(self, expense_id: int) -> None:
+        pass
+
+    @abstractmethod
+    async def expense_summary(self, year: Optional[int] = None, month: Optional[int] = None,
+                              category: Optional[str] = None, start_month: Optional[Tuple[int, int]] = None,
+                              end_month: Optional[Tuple[int, int]] = None) -> "ExpenseSummary":
+        pass
+
+    @abstractmethod
+    async def clear_all_expenses(self) -> None:
+        pass
+
+    @abstractmethod
+    async def export_expenses_to_csv(self, file_path: str, category: Optional[str] = None,
+                                     month: Optional[int] = None, year: Optional[int] = None,
+                                     compress: bool = False) -> None:
         pass
 
 
@@ -46,3 +167,61 @@ class FileHandlerInterface(ABC):
     @abstractmethod
     def write(self, data: List[Dict]) -> None:
         pass
+
+    def iter_records(self) -> Iterator[Dict]:
+        """Yield stored records one at a time; handlers override this to avoid loading everything."""
+        yield from self.read()
+
+    def version(self) -> Optional[Tuple]:
+        """Return a token that changes whenever the stored data changes, or None if unknown."""
+        return None
+
+    def read_versioned(self) -> Tuple[Optional[Tuple], List[Dict]]:
+        """Read the data together with the ``version()`` token of exactly what was read."""
+        return self.version(), self.read()
+
+    def lock(self) -> ContextManager:
+        """Hold an exclusive lock for a read-modify-write cycle. Handlers without locking return a no-op."""
+        return nullcontext()
+
+
+class ExtendableFileHandlerInterface(FileHandlerInterface):
+    @abstractmethod
+    def extend(self, records: List[Dict]) -> None:
+        """Add records after the stored ones without rewriting them."""
+        pass
+
+
+class AppendableFileHandlerInterface(ExtendableFileHandlerInterface):
+    @abstractmethod
+    def append(self, record: Dict) -> None:
+        pass
+
+    @abstractmethod
+    def remove(self, record_id: int) -> Optional[Dict]:
+        """Delete a record and return it, or return None if there is no such record."""
+        pass
+
+    @abstractmethod
+    def get(self, record_id: int) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def replace(self, record: Dict) -> Optional[Dict]:
+        """Overwrite the record with the same id and return the old one, or return None if there is none."""
+        pass
+
+    @abstractmethod
+    def last_id(self) -> int:
+        pass
+
+    @abstractmethod
+    def compact(self) -> None:
+        pass
+
+
+class ColumnarFileHandlerInterface(FileHandlerInterface):
+    @abstractmethod
+    def columns(self):
+        """Return the stored data as column views; see ``BinarySnapshot`` for the attributes."""
+        pass
@@ -0,0 +1,59 @@
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import METRICS
+from .models import Expense
+
+
+class ExpenseCache:
+    """Keeps the decoded expenses of one store in memory, indexed by id.
+
+    Entries are keyed by the file handler's ``version()`` token, so a changed
+    file (mtime, size or inode) is detected with a single ``stat()``. Cached
+    Expense objects are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._version: Optional[Tuple] = None
+        # Insertion-ordered, so listing keeps the store's order while point operations stay O(1).
+        self._expenses: Optional[Dict[int, Expense]] = None
+
+    def __len__(self) -> int:
+        return len(self._expenses) if self._expenses is not None else 0
+
+    def get(self, version: Optional[Tuple]) -> Optional[List[Expense]]:
+        if self.is_fresh(version):
+            self.hits += 1
+            METRICS.count("cache.hits")
+            return list(self._expenses.values())
+        self.misses += 1
+        METRICS.count("cache.misses")
+        return None
+
+    def put(self, version: Optional[Tuple], expenses: List[Expense]) -> None:
+        if version is None:
+            self.invalidate()
+            return
+        self._version = version
+        self._expenses = {expense.id: expense for expense in expenses}
+
+    def is_fresh(self, version: Optional[Tuple]) -> bool:
+        return version is not None and version == self._version and self._expenses is not None
+
+    def find(self, expense_id: int) -> Optional[Expense]:
+        """Look up one expense in the cached contents; check ``is_fresh`` first."""
+        return self._expenses.get(expense_id) if self._expenses is not None else None
+
+    def append(self, version: Optional[Tuple], expense: Expense) -> None:
+        """Add an expense, or replace the cached one with the same id in its current position."""
+        self._expenses[expense.id] = expense
+        self._version = version
+
+    def remove(self, version: Optional[Tuple], expense_id: int) -> None:
+        self._expenses.pop(expense_id, None)
+        self._version = version
+
+    def invalidate(self) -> None:
+        self._version = None
+        self._expenses = None
@@ -0,0 +1,195 @@
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .utils.json_file_handler import DateTimeEncoder
+
+
+def change_log_path(data_path: str) -> str:
+    return f"{data_path}.changes.jsonl"
+
+
+class ChangeLog:
+    """A ledger's adds, updates, deletes and clears as JSON lines, numbered by a sequence that only grows.
+
+    Each line is ``{"seq": ..., "op": ..., "id": ..., "expense": {...}}``, where
+    ``expense`` holds the stored values after an add or update with the amount
+    in major units, so entries survive a change of scale. Writers append under
+    the ledger's lock once the change itself is stored. A clear shrinks the log
+    to a single clear entry; the sequence carries on from where it was.
+
+    The last line of every append also records, as ``"v"``, the ``version()``
+    of the data it brings the log up to. A log whose version does not match
+    the data missed a change: one made without the log, or one cut short
+    between storing it and logging it. ``is_current`` tells. Writers only
+    append to a current log, so a ledger nobody reads the feed of never gets
+    one; the feed's next reader ``seed``s a missing or stale log instead.
+
+    Readers find their starting point with a binary search over the file, so
+    reading the changes after a checkpoint costs in proportion to those changes.
+    """
+
+    # Below this many bytes between the bounds, the search gives way to reading lines in order.
+    SCAN_BYTES = 1 << 16
+    TAIL_BYTES = 1 << 12
+
+    def __init__(self, file_path: str, fsync: bool = False):
+        self.file_path = file_path
+        self.fsync = fsync
+        # ((inode, size), complete size, last sequence, data version) as of the last look at the tail.
+        self._tail: Optional[Tuple[Tuple[int, int], int, int, object]] = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.file_path)
+
+    def last_sequence(self) -> int:
+        """The sequence of the newest complete entry, or 0 for an empty or missing log."""
+        return self._read_tail()[1]
+
+    def is_current(self, version) -> bool:
+        """Whether the log has every change up to the data at ``version``."""
+        return self.exists() and self._read_tail()[2] == json.loads(json.dumps(version, cls=DateTimeEncoder))
+
+    def seed(self, expenses: Iterable[Dict], version=None) -> int:
+        """Start the log over with an add for each stored expense, the data being at ``version``.
+
+        A log that already has entries gets a clear first, so readers drop what
+        they had and the sequence carries on. Returns the last sequence.
+        """
+        sequence = self.last_sequence()
+        changes = [("clear", None, None)] if sequence else []
+        changes += [("add", expense["id"], expense) for expense in expenses]
+        entries = [self._entry(number, operation, expense_id, expense)
+                   for number, (operation, expense_id, expense) in enumerate(changes, start=sequence + 1)]
+        sequence += len(entries)
+        self._replace(self._stamp(entries, sequence, version))
+        return sequence
+
+    def append(self, changes: Iterable[Tuple[str, Optional[int], Optional[Dict]]], version=None) -> int:
+        """Add ``(operation, expense id, expense)`` entries after the newest one. Returns the last sequence.
+
+        ``version`` is that of the data with these changes stored. With no
+        changes, the version alone is recorded, for writes that change the
+        files but not the expenses.
+        """
+        size, sequence = self._read_tail()[:2]
+        lines = []
+        for operation, expense_id, expense in changes:
+            sequence += 1
+            lines.append(self._entry(sequence, operation, expense_id, expense))
+        if not lines and version is None:
+            return sequence
+        lines = self._stamp(lines, sequence, version)
+        try:
+            with open(self.file_path, "ab") as log_file:
+                if log_file.tell() != size:
+                    # Drop the torn entry an interrupted append left behind.
+                    log_file.truncate(size)
+                log_file.write("".join(lines).encode())
+                log_file.flush()
+                if self.fsync:
+                    os.fsync(log_file.fileno())
+                stat = os.fstat(log_file.fileno())
+                self._tail = ((stat.st_ino, stat.st_size), stat.st_size, sequence, json.loads(lines[-1]).get("v"))
+        except IOError as e:
+            raise IOError(f"Failed to write to {self.file_path}: {e}")
+        return sequence
+
+    def clear(self, version=None) -> int:
+        """Replace the log with a single clear entry. Returns its sequence."""
+        sequence = self.last_sequence() + 1
+        self._replace(self._stamp([self._entry(sequence, "clear", None, None)], sequence, version))
+        return sequence
+
+    def read(self, after: int, through: Optional[int] = None) -> Iterator[Dict]:
+        """Yield the entries with ``after < seq <= through``, oldest first."""
+        if not self.exists():
+            return
+        try:
+            with open(self.file_path, "rb") as log_file:
+                log_file.seek(self._start_of(log_file, after))
+                for line in log_file:
+                    if not line.endswith(b"\n"):
+                        return
+                    entry = json.loads(line)
+                    if through is not None and entry["seq"] > through:
+                        return
+                    # Lines that only record a version carry no change.
+                    if entry["seq"] > after and "op" in entry:
+                        yield entry
+        except IOError as e:
+            raise IOError(f"Failed to read {self.file_path}: {e}")
+
+    def _start_of(self, log_file, after: int) -> int:
+        """An offset at which every earlier entry has ``seq <= after``."""
+        low, high = 0, os.fstat(log_file.fileno()).st_size
+        while high - low > self.SCAN_BYTES:
+            middle = (low + high) // 2
+            # Skip to the first line starting at or after the middle.
+            log_file.seek(middle - 1)
+            log_file.readline()
+            start = log_file.tell()
+            line = log_file.readline()
+            if start >= high or not line.endswith(b"\n"):
+                high = middle
+            elif json.loads(line)["seq"] <= after:
+                low = log_file.tell()
+            else:
+                high = start
+        return low
+
+    def _read_tail(self) -> Tuple[int, int, object]:
+        """The size of the log up to its last complete line, and that line's sequence and data version."""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return 0, 0, None
+        # The inode changes when a clear replaces the file, so a log of the same size is never mistaken for it.
+        key, size = (stat.st_ino, stat.st_size), stat.st_size
+        if self._tail is not None and self._tail[0] == key:
+            return self._tail[1:]
+        try:
+            with open(self.file_path, "rb") as log_file:
+                block = self.TAIL_BYTES
+                while True:
+                    start = max(0, size - block)
+                    log_file.seek(start)
+                    data = log_file.read(size - start)
+                    end = data.rfind(b"\n")
+                    lines = data[:end].split(b"\n") if end >= 0 else []
+                    # The first line of a partial block may itself be cut off, so it only counts from the start.
+                    if len(lines) > 1 or (lines and start == 0):
+                        break
+                    if start == 0:
+                        return 0, 0, None
+                    block *= 2
+        except IOError as e:
+            raise IOError(f"Failed to read {self.file_path}: {e}")
+        last = json.loads(lines[-1])
+        self._tail = (key, start + end + 1, last["seq"], last.get("v"))
+        return self._tail[1:]
+
+    def _replace(self, entries: list) -> None:
+        temp_path = f"{self.file_path}.tmp"
+        try:
+            with open(temp_path, "w") as log_file:
+                log_file.write("".join(entries))
+                log_file.flush()
+                os.fsync(log_file.fileno())
+            os.replace(temp_path, self.file_path)
+        except IOError as e:
+            raise IOError(f"Failed to write to {self.file_path}: {e}")
+        self._tail = None
+
+    @staticmethod
+    def _entry(sequence: int, operation: str, expense_id: Optional[int], expense: Optional[Dict]) -> str:
+        return json.dumps({"seq": sequence, "op": operation, "id": expense_id, "expense": expense},
+                          cls=DateTimeEncoder) + "\n"
+
+    @staticmethod
+    def _stamp(lines: List[str], sequence: int, version) -> List[str]:
+        """Record ``version`` on the last line, or on a line of its own when there are no entries."""
+        if not lines:
+            return [json.dumps({"seq": sequence, "v": version}, cls=DateTimeEncoder) + "\n"]
+        # Entries end in "}\n", so the version is spliced in before the closing brace.
+        return lines[:-1] + [lines[-1][:-2] + ", \"v\": " + json.dumps(version, cls=DateTimeEncoder) + "}\n"]
@@ -1,2 +1,32 @@
 DATA_FILE: str = "app/expenses.json"
-TESTS_DATA_FILE: str = 'tests/expenses.json'
\ No newline at end of file
+SQLITE_DATA_FILE: str = "app/expenses.db"
+BINARY_DATA_FILE: str = "app/expenses.bin"
+PARTITIONS_DIR: str = "app/expenses.d"
+# Ledgers other than the default one each get a directory here, holding the files above.
+LEDGERS_DIR: str = "app/ledgers"
+DEFAULT_LEDGER: str = "default"
+LEDGER_ENV_VAR: str = "EXPENSE_TRACKER_LEDGER"
+TESTS_DATA_FILE: str = 'tests/expenses.json'
+
+BACKEND_ENV_VAR: str = "EXPENSE_TRACKER_BACKEND"
+BACKENDS: tuple = ("json", "journal", "sqlite", "binary", "partitioned")
+DEFAULT_BACKEND: str = "json"
+# Set to a number of spaces to pretty-print the JSON ledger; it is compact by default.
+JSON_INDENT_ENV_VAR: str = "EXPENSE_TRACKER_JSON_INDENT"
+
+LOG_FILE: str = "expense_tracker.log"
+LOG_LEVEL_ENV_VAR: str = "EXPENSE_TRACKER_LOG_LEVEL"
+LOG_FILE_ENV_VAR: str = "EXPENSE_TRACKER_LOG_FILE"
+LOG_FORMAT_ENV_VAR: str = "EXPENSE_TRACKER_LOG_FORMAT"
+LOG_FORMATS: tuple = ("text", "json")
+LOG_LEVELS: tuple = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+SOCKET_FILE: str = "app/expense-tracker.sock"
+SOCKET_ENV_VAR: str = "EXPENSE_TRACKER_SOCKET"
+
+IMPORT_FORMATS: tuple = ("csv", "jsonl")
+
+QUERY_SORTS: tuple = ("id", "date", "amount")
+
+REPORT_PERIODS: tuple = ("day", "week", "month", "year")
+REPORT_FORMATS: tuple = ("table", "csv", "json")
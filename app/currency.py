@@ -0,0 +1,64 @@
+import json
+import os
+
+from pydantic import BaseModel, Field
+
+
+def currency_path(data_path: str) -> str:
+    return f"{data_path}.currency.json"
+
+
+class LedgerCurrency(BaseModel):
+    """The currency a ledger is kept in, and how many decimal places its minor unit has.
+
+    Amounts are stored as integers counting minor units (cents at a scale of 2),
+    so sums over them are exact. Ledgers written before that hold floats in
+    major units; ``decode`` and ``minor`` accept both, so such a ledger keeps
+    working until ``migrate-amounts`` rewrites it.
+    """
+    code: str = Field(default="USD", min_length=1, max_length=10)
+    scale: int = Field(default=2, ge=0, le=6)
+
+    @property
+    def factor(self) -> int:
+        return 10 ** self.scale
+
+    def to_minor(self, amount: float) -> int:
+        """The nearest whole number of minor units to an amount in major units."""
+        return round(amount * self.factor)
+
+    def from_minor(self, units: int) -> float:
+        # One correctly rounded division, so the float prints as the exact decimal.
+        return units / self.factor
+
+    def quantize(self, amount: float) -> float:
+        """``amount`` rounded to the ledger's minor unit."""
+        return self.from_minor(self.to_minor(amount))
+
+    def minor(self, value) -> int:
+        """Minor units of a stored amount: an int in minor units, or a float in major units from an older ledger."""
+        return value if type(value) is int else self.to_minor(value)
+
+    def decode(self, value) -> float:
+        """A stored amount, in either form, in major units."""
+        return value / self.factor if type(value) is int else float(value)
+
+    @classmethod
+    def load(cls, file_path: str) -> "LedgerCurrency":
+        """The settings saved at ``file_path``, or the defaults if there are none."""
+        if not os.path.exists(file_path):
+            return cls()
+        try:
+            with open(file_path, "r") as currency_file:
+                return cls.model_validate(json.load(currency_file))
+        except (IOError, ValueError) as e:
+            raise IOError(f"Failed to read {file_path}: {e}")
+
+    def save(self, file_path: str) -> None:
+        temp_path = f"{file_path}.tmp"
+        try:
+            with open(temp_path, "w") as currency_file:
+                json.dump(self.model_dump(), currency_file)
+            os.replace(temp_path, file_path)
+        except IOError as e:
+            raise IOError(f"Failed to write to {file_path}: {e}")
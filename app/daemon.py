@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import groupby
+from typing import Callable, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from .constants import DEFAULT_LEDGER
+from .ledgers import LedgerRegistry
+from .metrics import METRICS, Metrics
+from .models import Expense
+from .services import ExpenseService
+from .utils.json_file_handler import DateTimeEncoder
+from .utils.logger_config import get_logger
+
+LOGGER = get_logger()
+
+# Commands that change the ledger go through the single writer; everything else is answered directly.
+WRITE_COMMANDS = ("add", "update", "delete", "clear", "import")
+# Answered on the event loop itself: they touch no files.
+LOOP_COMMANDS = ("ping", "metrics")
+
+
+class _WriteJob:
+    def __init__(self, command: str, ledger: str, args: Dict, future: asyncio.Future, expense=None):
+        self.command = command
+        self.ledger = ledger
+        self.args = args
+        self.future = future
+        self.expense = expense
+
+
+class ExpenseDaemon:
+    """Serves one ExpenseService over a Unix domain socket.
+
+    The protocol is one JSON object per line in each direction. A request is
+    ``{"command": ..., "backend": ..., "ledger": ..., "args": {...}}`` and a response is
+    ``{"ok": true, "result": ...}`` or ``{"ok": false, "error": ..., "errors": [...]}``.
+
+    ``expense_service`` answers for ``ledger``, which is also used when a request
+    names none. Given a ``registry``, the daemon serves every other ledger from it.
+
+    Repository calls run on a single worker thread, so a slow export or write
+    never blocks the event loop; the repositories are not thread-safe, and one
+    thread also keeps reads from overlapping a write. Reads are therefore not
+    concurrent: they are answered one at a time, and a slow export or report
+    delays every other client's request until it finishes. Only ``ping`` and
+    ``metrics`` are answered on the loop. All writes are queued to one writer
+    task, which commits runs of queued adds as a single ``add_expenses`` call.
+
+    While serving, ``metrics`` are recorded and returned by the ``metrics`` command.
+    """
+
+    def __init__(self, expense_service: ExpenseService, socket_path: str, backend: str,
+                 max_batch: int = 1000, logger=LOGGER, metrics: Metrics = METRICS, ledger: str = DEFAULT_LEDGER,
+                 registry: Optional[LedgerRegistry] = None):
+        self.expense_service = expense_service
+        self.ledger = ledger
+        self.registry = registry
+        self.socket_path = socket_path
+        self.backend = backend
+        self.max_batch = max_batch
+        self.logger = logger
+        self.metrics = metrics
+        self._queue: Optional[asyncio.Queue] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def run(self) -> None:
+        """Serve until SIGINT or SIGTERM."""
+        asyncio.run(self.serve(install_signal_handlers=True))
+
+    async def serve(self, install_signal_handlers: bool = False) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._stopped = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="expense-daemon")
+        if install_signal_handlers:
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                self._loop.add_signal_handler(signal_number, self._stopped.set)
+
+        self._remove_stale_socket()
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        writer_task = asyncio.create_task(self._writer())
+        sweeper_task = None
+        if self.registry is not None and self.registry.idle_seconds:
+            sweeper_task = asyncio.create_task(self._sweep_idle_ledgers())
+        self.logger.info("Serving the %s backend on %s", self.backend, self.socket_path)
+        was_enabled, self.metrics.enabled = self.metrics.enabled, True
+        try:
+            await self._stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            writer_task.cancel()
+            if sweeper_task is not None:
+                sweeper_task.cancel()
+            # Let a call that is already running finish before the process exits.
+            self._executor.shutdown(wait=True)
+            self.metrics.enabled = was_enabled
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def stop(self) -> None:
+        """Stop serving; safe to call from another thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                response = await self._dispatch(line)
+                writer.write(json.dumps(response, cls=DateTimeEncoder).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, line: bytes) -> Dict:
+        try:
+            request = json.loads(line)
+            command, args, ledger = request["command"], request.get("args", {}), request.get("ledger") or self.ledger
+            if request.get("backend", self.backend) != self.backend:
+                return {"ok": False, "error": f"This daemon serves the {self.backend} backend."}
+            # Resolved up front, so a ledger this daemon cannot serve fails before anything is queued.
+            # Opening another ledger reads its files and may close one the worker thread is using.
+            service = self.expense_service if ledger == self.ledger else await self._run(self._service, ledger)
+            self.metrics.count(f"daemon.requests.{command}")
+            with self.metrics.timer(f"daemon.{command}"):
+                if command in WRITE_COMMANDS:
+                    result = await self._submit_write(command, ledger, args)
+                elif command in LOOP_COMMANDS:
+                    result = self._read(command, args, service)
+                else:
+                    result = await self._run(self._read, command, args, service)
+            return {"ok": True, "result": result}
+        except ValidationError as e:
+            errors = [{"loc": list(error["loc"]), "msg": error["msg"]} for error in e.errors()]
+            return {"ok": False, "error": str(e), "errors": errors}
+        except (ValueError, KeyError, TypeError, IOError) as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            # A bug, but the client still gets an answer rather than a dropped connection.
+            self.logger.exception("Failed to answer a request")
+            return {"ok": False, "error": f"The daemon failed to answer: {e!r}"}
+
+    async def _run(self, function: Callable, *args):
+        return await self._loop.run_in_executor(self._executor, partial(function, *args))
+
+    def _service(self, ledger: str) -> ExpenseService:
+        if ledger == self.ledger:
+            return self.expense_service
+        if self.registry is None:
+            raise ValueError(f"This daemon serves the {self.ledger} ledger only.")
+        return self.registry.service(ledger)
+
+    def _read(self, command: str, args: Dict, service: ExpenseService):
+        if command == "ping":
+            return {"backend": self.backend, "ledger": service.ledger}
+        if command == "metrics":
+            snapshot = self.metrics.snapshot()
+            if self.registry is not None:
+                snapshot["ledgers"] = self.registry.stats()
+            if args.get("reset"):
+                self.metrics.reset()
+            return snapshot
+        if command == "list":
+            return [expense.model_dump() for expense in service.list_expenses(args.get("category"))]
+        if command == "query":
+            return [expense.model_dump() for expense in service.query_expenses(**args)]
+        if command == "get":
+            return service.get(args["id"]).model_dump()
+        if command == "summary":
+            summary = service.summary_details(
+                args.get("month"), args.get("year"), args.get("category"),
+                args.get("start_month"), args.get("end_month"))
+            return summary.model_dump()
+        if command == "report":
+            # The service's report engine keeps its date index between requests until the ledger changes.
+            start, end = (datetime.fromisoformat(args[bound]) if args.get(bound) else None
+                          for bound in ("start", "end"))
+            rows = service.report(args["period"], start, end, args.get("category"), args.get("by_category", False))
+            return [row.model_dump() for row in rows]
+        if command == "export":
+            service.export_expenses_to_csv(
+                args["file_path"], args.get("category"), args.get("month"), args.get("year"),
+                args.get("compress", False))
+            return None
+        raise ValueError(f"Unknown command: {command}")
+
+    async def _submit_write(self, command: str, ledger: str, args: Dict):
+        expense = None
+        if command == "add":
+            # Validate before queueing so a bad request never holds up a batch.
+            date_time = datetime.fromisoformat(args["date"]) if args.get("date") else None
+            expense = ExpenseService.new_expense(args["description"], args["amount"], args.get("category"), date_time)
+        future = self._loop.create_future()
+        await self._queue.put(_WriteJob(command, ledger, args, future, expense))
+        return await future
+
+    async def _writer(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty() and len(batch) < self.max_batch:
+                batch.append(self._queue.get_nowait())
+            self.metrics.count("daemon.write_batches")
+            self.metrics.count("daemon.write_jobs", len(batch))
+            self.logger.debug("Writing a batch of %s jobs", len(batch), extra={"jobs": len(batch)})
+            for (is_add, _), jobs in groupby(batch, key=lambda job: (job.command == "add", job.ledger)):
+                jobs = list(jobs)
+                if is_add:
+                    await self._commit_adds(jobs)
+                else:
+                    for job in jobs:
+                        await self._run_write(job)
+            # Let readers in between batches.
+            await asyncio.sleep(0)
+
+    async def _sweep_idle_ledgers(self) -> None:
+        while True:
+            await asyncio.sleep(self.registry.idle_seconds)
+            await self._run(self.registry.evict_idle)
+
+    async def _commit_adds(self, jobs: List[_WriteJob]) -> None:
+        try:
+            await self._run(self._add_expenses, jobs[0].ledger, [job.expense for job in jobs])
+        except Exception as e:
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+        for job in jobs:
+            if not job.future.done():
+                job.future.set_result(job.expense.model_dump())
+
+    async def _run_write(self, job: _WriteJob) -> None:
+        try:
+            result = await self._run(self._write, job)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _add_expenses(self, ledger: str, expenses: List[Expense]) -> None:
+        # The ledger is looked up again here: it may have left the registry's pool while the jobs were queued.
+        self._service(ledger).repository.add_expenses(expenses)
+
+    def _write(self, job: _WriteJob):
+        service = self._service(job.ledger)
+        if job.command == "update":
+            date_time = datetime.fromisoformat(job.args["date"]) if job.args.get("date") else None
+            return service.update(job.args["id"], job.args.get("description"), job.args.get("amount"),
+                                  job.args.get("category"), date_time).model_dump()
+        if job.command == "delete":
+            service.delete(job.args["id"])
+            return None
+        if job.command == "clear":
+            service.clear_all_expenses()
+            return None
+        return service.import_expenses(job.args["file_path"], job.args.get("format")).model_dump()
+
+    def _remove_stale_socket(self) -> None:
+        if not os.path.exists(self.socket_path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except ConnectionRefusedError:
+                # Left behind by a daemon that did not shut down cleanly.
+                os.unlink(self.socket_path)
+                return
+        raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
@@ -0,0 +1,128 @@
+import json
+import os
+import socket
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+class DaemonError(ValueError):
+    """An error reported by the daemon. ``errors()`` mirrors pydantic's ValidationError.errors()."""
+
+    def __init__(self, message: str, errors: Optional[List[Dict]] = None):
+        super().__init__(message)
+        self._errors = errors or []
+
+    def errors(self) -> List[Dict]:
+        return self._errors
+
+
+class DaemonClient:
+    """Talks to a running ``serve`` daemon with the same calls the CLI makes on ExpenseService.
+
+    Only the standard library is imported here so forwarding a command stays cheap.
+    Expenses come back as simple attribute objects rather than models.
+    """
+
+    def __init__(self, socket_path: str, backend: str, timeout: float = 30.0, ledger: Optional[str] = None):
+        self.socket_path = socket_path
+        self.backend = backend
+        # None leaves the choice to the daemon, which then uses the ledger it was started with.
+        self.ledger = ledger
+        self.timeout = timeout
+
+    @classmethod
+    def connect(cls, socket_path: str, backend: str, ledger: Optional[str] = None) -> Optional["DaemonClient"]:
+        """Return a client if a daemon serving ``backend`` and ``ledger`` listens on ``socket_path``, else None."""
+        if not os.path.exists(socket_path):
+            return None
+        client = cls(socket_path, backend, ledger=ledger)
+        try:
+            client.request("ping")
+        except (DaemonUnavailable, DaemonError):
+            return None
+        return client
+
+    def request(self, command: str, **args):
+        message = json.dumps({"command": command, "backend": self.backend, "ledger": self.ledger,
+                              "args": args}).encode() + b"\n"
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.settimeout(self.timeout)
+                connection.connect(self.socket_path)
+                connection.sendall(message)
+                with connection.makefile("rb") as stream:
+                    line = stream.readline()
+        except OSError as e:
+            raise DaemonUnavailable(f"Cannot reach the daemon at {self.socket_path}: {e}")
+        if not line:
+            raise DaemonUnavailable(f"The daemon at {self.socket_path} closed the connection.")
+
+        response = json.loads(line)
+        if not response["ok"]:
+            raise DaemonError(response["error"], response.get("errors"))
+        return response["result"]
+
+    def add_expense(self, description: str, amount: float, category: Optional[str] = '',
+                    date_time: Optional[datetime] = None):
+        return self._expense(self.request("add", description=description, amount=amount, category=category,
+                                          date=date_time.isoformat() if date_time else None))
+
+    def list_expenses(self, category: Optional[str] = ''):
+        return [self._expense(data) for data in self.request("list", category=category)]
+
+    def query_expenses(self, category: Optional[str] = None, search: Optional[str] = None, sort: str = "id",
+                       descending: bool = False, limit: Optional[int] = None, offset: int = 0,
+                       after: Optional[str] = None):
+        return [self._expense(data) for data in self.request(
+            "query", category=category, search=search, sort=sort, descending=descending, limit=limit,
+            offset=offset, after=after)]
+
+    def summary_details(self, month: int = None, year: Optional[int] = None, category: Optional[str] = None,
+                        start_month: Optional[Tuple[int, int]] = None,
+                        end_month: Optional[Tuple[int, int]] = None) -> Dict:
+        return self.request("summary", month=month, year=year, category=category,
+                            start_month=start_month, end_month=end_month)
+
+    def report(self, period: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               category: Optional[str] = None, by_category: bool = False) -> List[SimpleNamespace]:
+        rows = self.request("report", period=period, start=start.isoformat() if start else None,
+                            end=end.isoformat() if end else None, category=category, by_category=by_category)
+        return [SimpleNamespace(**row) for row in rows]
+
+    def get(self, expense_id: int):
+        return self._expense(self.request("get", id=expense_id))
+
+    def update(self, expense_id: int, description: Optional[str] = None, amount: Optional[float] = None,
+               category: Optional[str] = None, date_time: Optional[datetime] = None):
+        return self._expense(self.request("update", id=expense_id, description=description, amount=amount,
+                                          category=category, date=date_time.isoformat() if date_time else None))
+
+    def metrics(self, reset: bool = False) -> Dict:
+        """The daemon's counters and timers; ``reset`` starts them over after this snapshot."""
+        return self.request("metrics", reset=reset)
+
+    def delete(self, expense_id: int) -> None:
+        self.request("delete", id=expense_id)
+
+    def clear_all_expenses(self) -> None:
+        self.request("clear")
+
+    def export_expenses_to_csv(self, file_path: str, category: Optional[str] = None, month: Optional[int] = None,
+                               year: Optional[int] = None, compress: bool = False) -> None:
+        # The daemon may run in another directory, so hand it an absolute path.
+        self.request("export", file_path=os.path.abspath(file_path), category=category, month=month,
+                     year=year, compress=compress)
+
+    def import_expenses(self, file_path: str, file_format: Optional[str] = None):
+        result = self.request("import", file_path=os.path.abspath(file_path), format=file_format)
+        errors = [SimpleNamespace(**error) for error in result["errors"]]
+        return SimpleNamespace(added=result["added"], errors=errors)
+
+    @staticmethod
+    def _expense(data: Dict) -> SimpleNamespace:
+        return SimpleNamespace(**{**data, "date": datetime.fromisoformat(data["date"])})
@@ -0,0 +1,273 @@
+import csv
+import io
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from .metrics import METRICS, timed
+from .models import Expense
+
+IMPORT_FIELDS: Tuple[str, ...] = ("description", "amount", "category", "date")
+
+_EXPENSE_LIST = TypeAdapter(List[Expense])
+# Key used to carry a parse failure through to validation so it is reported with its line number.
+_PARSE_ERROR = "__error__"
+
+
+class RowError(BaseModel):
+    line: int
+    message: str
+
+
+class ImportResult(BaseModel):
+    added: int = 0
+    errors: List[RowError] = []
+
+
+class FileImportResult(ImportResult):
+    file_path: str
+
+
+def detect_format(file_path: str) -> str:
+    return "csv" if file_path.lower().endswith(".csv") else "jsonl"
+
+
+def read_import_file(file_path: str, file_format: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+    """Yield ``(line_number, row)`` pairs from a CSV file with a header or a JSON-lines file.
+
+    Column names are matched case-insensitively, so a file written by ``export``
+    can be imported again. Ids in the input are ignored; the repository assigns new ones.
+    """
+    file_format = file_format or detect_format(file_path)
+    try:
+        with open(file_path, "r", newline="", encoding="utf-8") as import_file:
+            yield from _iter_rows(import_file, file_format)
+    except UnicodeDecodeError as e:
+        raise _not_utf8(file_path, e)
+    except IOError as e:
+        raise IOError(f"Failed to read {file_path}: {e}")
+
+
+def _iter_rows(stream: TextIO, file_format: str, fieldnames: Optional[List[str]] = None
+               ) -> Iterator[Tuple[int, Dict]]:
+    if file_format == "csv":
+        reader = csv.DictReader(stream, fieldnames=fieldnames)
+        # Without given fieldnames the header is line 1 of the stream and is counted by line_num.
+        for row in reader:
+            yield reader.line_num, normalise_row(row)
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, {_PARSE_ERROR: f"Invalid JSON: {e.msg}"}
+            continue
+        if not isinstance(row, dict):
+            yield line_number, {_PARSE_ERROR: "Each line must be a JSON object."}
+            continue
+        yield line_number, normalise_row(row)
+
+
+def validate_rows(numbered_rows: Iterable[Tuple[int, Dict]], batch_size: int = 1000
+                  ) -> Tuple[List[Expense], List[RowError]]:
+    """Validate rows in batches, collecting every bad row instead of stopping at the first one."""
+    expenses: List[Expense] = []
+    errors: List[RowError] = []
+    batch: List[Tuple[int, Dict]] = []
+    for numbered_row in numbered_rows:
+        batch.append(numbered_row)
+        if len(batch) >= batch_size:
+            _validate_batch(batch, expenses, errors)
+            batch = []
+    if batch:
+        _validate_batch(batch, expenses, errors)
+    errors.sort(key=lambda error: error.line)
+    return expenses, errors
+
+
+@timed("validation")
+def _validate_batch(batch: List[Tuple[int, Dict]], expenses: List[Expense], errors: List[RowError]) -> None:
+    METRICS.count("validation.rows", len(batch))
+    rows = []
+    for line, row in batch:
+        if _PARSE_ERROR in row:
+            errors.append(RowError(line=line, message=row[_PARSE_ERROR]))
+        else:
+            rows.append((line, row))
+
+    try:
+        expenses.extend(_EXPENSE_LIST.validate_python([row for _, row in rows]))
+        return
+    except ValidationError as e:
+        messages: Dict[int, List[str]] = {}
+        for error in e.errors():
+            index, field = error["loc"][0], error["loc"][1] if len(error["loc"]) > 1 else "row"
+            messages.setdefault(index, []).append(f"Error in field '{field}': {error['msg']}")
+
+    # Only the rows that passed are validated again, so the good part of the batch is kept.
+    good_rows = [row for index, (_, row) in enumerate(rows) if index not in messages]
+    expenses.extend(_EXPENSE_LIST.validate_python(good_rows))
+    for index in sorted(messages):
+        errors.append(RowError(line=rows[index][0], message="; ".join(messages[index])))
+
+
+def validate_files(file_paths: List[str], file_format: Optional[str] = None, workers: int = 1,
+                   chunk_bytes: int = 1 << 20, batch_size: int = 1000
+                   ) -> Tuple[List[Expense], List[FileImportResult]]:
+    """Parse and validate several import files, spreading the work over ``workers`` processes.
+
+    Each file is cut into chunks of about ``chunk_bytes`` at line boundaries,
+    and every worker reads and parses its own chunk, so the parent only plans
+    chunks and merges results. Results are merged in file and line order however
+    the chunks finish, so the ids they later get do not depend on scheduling.
+    A file that cannot be read or decoded is skipped and reported as an error on line 0.
+    """
+    results = [FileImportResult(file_path=file_path) for file_path in file_paths]
+    expenses: List[Expense] = []
+    # Lines before the next chunk to merge, per file; chunks number their lines from 1.
+    line_offsets = [0] * len(file_paths)
+
+    def merge(file_index: int, chunk_expenses: List[Expense], chunk_errors: List[RowError], lines: int = 0) -> None:
+        offset = line_offsets[file_index]
+        expenses.extend(chunk_expenses)
+        results[file_index].added += len(chunk_expenses)
+        results[file_index].errors.extend(RowError(line=error.line + offset, message=error.message)
+                                          for error in chunk_errors)
+        line_offsets[file_index] += lines
+
+    # Files that failed, or whose remaining chunks were parsed in one piece; their later chunks are dropped.
+    finished = set()
+
+    def fail(file_index: int, error: Exception) -> None:
+        # A file is imported whole or not at all. Merges go in file order, so its rows are the last ones merged.
+        del expenses[len(expenses) - results[file_index].added:]
+        results[file_index].added = 0
+        results[file_index].errors = [RowError(line=0, message=str(error))]
+        finished.add(file_index)
+
+    if workers <= 1:
+        for file_index, file_path in enumerate(file_paths):
+            try:
+                merge(file_index, *validate_rows(read_import_file(file_path, file_format), batch_size))
+            except (IOError, ValueError) as e:
+                fail(file_index, e)
+        return expenses, results
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # A bounded window of chunks in flight keeps memory flat on large inputs.
+        pending = deque()
+
+        def collect() -> None:
+            file_index, chunk, future = pending.popleft()
+            if file_index in finished:
+                future.cancel()
+                return
+            try:
+                chunk_expenses, chunk_errors, lines, quoted = future.result()
+                if quoted:
+                    # A quoted field may run across the cut, so the rest of the file is parsed from here in one go.
+                    whole = chunk._replace(end=None)
+                    chunk_expenses, chunk_errors, lines, _ = pool.submit(_validate_chunk, whole,
+                                                                         batch_size).result()
+                    finished.add(file_index)
+                merge(file_index, chunk_expenses, chunk_errors, lines)
+            except (IOError, ValueError) as e:
+                fail(file_index, e)
+
+        for file_index, file_path in enumerate(file_paths):
+            try:
+                chunks = plan_chunks(file_path, file_format or detect_format(file_path), chunk_bytes)
+            except (IOError, ValueError) as e:
+                fail(file_index, e)
+                continue
+            # The CSV header is line 1.
+            line_offsets[file_index] = 1 if chunks and chunks[0].fieldnames is not None else 0
+            for chunk in chunks:
+                pending.append((file_index, chunk, pool.submit(_validate_chunk, chunk, batch_size)))
+                if len(pending) >= 2 * workers:
+                    collect()
+        while pending:
+            collect()
+    return expenses, results
+
+
+class ImportChunk(NamedTuple):
+    file_path: str
+    file_format: str
+    start: int
+    # None for the last chunk, which runs to the end of the file.
+    end: Optional[int]
+    fieldnames: Optional[List[str]]
+
+
+def plan_chunks(file_path: str, file_format: str, chunk_bytes: int) -> List[ImportChunk]:
+    """Cut a file into byte ranges that each start at a line boundary.
+
+    Only the bytes from each cut to the next newline are read, so planning costs
+    the same however large the file is.
+    """
+    try:
+        with open(file_path, "rb") as import_file:
+            size = os.fstat(import_file.fileno()).st_size
+            start, fieldnames = 0, None
+            if file_format == "csv":
+                header = import_file.readline()
+                start = import_file.tell()
+                fieldnames = next(csv.reader([header.decode("utf-8")]), [])
+            chunks = []
+            while start < size:
+                import_file.seek(start + chunk_bytes)
+                import_file.readline()
+                end = import_file.tell()
+                chunks.append(ImportChunk(file_path, file_format, start, end if end < size else None, fieldnames))
+                start = end
+    except UnicodeDecodeError as e:
+        raise _not_utf8(file_path, e)
+    except IOError as e:
+        raise IOError(f"Failed to read {file_path}: {e}")
+    return chunks
+
+
+def _validate_chunk(chunk: ImportChunk, batch_size: int) -> Tuple[List[Expense], List[RowError], int, bool]:
+    """Work unit run in a pool process: read, parse and validate one chunk.
+
+    Lines are numbered from 1 within the chunk. Also returns the number of lines
+    read, and whether a CSV chunk that ends before the file does contains quotes;
+    its rows are then unreliable, since a quoted field may span lines.
+    """
+    try:
+        with open(chunk.file_path, "rb") as import_file:
+            import_file.seek(chunk.start)
+            data = import_file.read() if chunk.end is None else import_file.read(chunk.end - chunk.start)
+        text = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise _not_utf8(chunk.file_path, e)
+    except IOError as e:
+        raise IOError(f"Failed to read {chunk.file_path}: {e}")
+    if chunk.file_format == "csv" and chunk.end is not None and '"' in text:
+        return [], [], 0, True
+    rows = _iter_rows(io.StringIO(text, newline=""), chunk.file_format, chunk.fieldnames)
+    return (*validate_rows(rows, batch_size), text.count("\n"), False)
+
+
+def _not_utf8(file_path: str, error: UnicodeDecodeError) -> ValueError:
+    return ValueError(f"Failed to read {file_path}: not UTF-8 text ({error.reason} at byte {error.start})")
+
+
+def normalise_row(row: Dict) -> Dict:
+    normalised = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        key = key.strip().lower()
+        if key in IMPORT_FIELDS and value not in ("", None):
+            normalised[key] = value
+    if "category" not in normalised:
+        normalised["category"] = None
+    return normalised
@@ -0,0 +1,188 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING
+
+from .constants import (DATA_FILE, SQLITE_DATA_FILE, BINARY_DATA_FILE, PARTITIONS_DIR, DEFAULT_BACKEND,
+                        DEFAULT_LEDGER, LEDGERS_DIR)
+from .metrics import METRICS
+
+if TYPE_CHECKING:
+    # Only the registry opens ledgers, so the model layer is imported on first use; see _open_service.
+    from .services import ExpenseService
+
+# Letters, digits, '.', '_' and '-', starting with a letter or digit, so a name is always one safe path component.
+_LEDGER_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,63}")
+
+
+def check_ledger_name(ledger: str) -> str:
+    if not _LEDGER_NAME.fullmatch(ledger or ""):
+        raise ValueError(f"Invalid ledger name: {ledger!r}. Use up to 64 letters, digits, '.', '_' or '-'.")
+    return ledger
+
+
+def ledger_path(backend: str, ledger: Optional[str] = None) -> str:
+    """The file or directory holding a ledger of one of the names in ``constants.BACKENDS``.
+
+    The default ledger lives at the paths in ``constants``; any other one in its
+    own directory under ``LEDGERS_DIR``, with the same file names.
+    """
+    paths = {"json": DATA_FILE, "journal": DATA_FILE, "binary": BINARY_DATA_FILE,
+             "partitioned": PARTITIONS_DIR, "sqlite": SQLITE_DATA_FILE}
+    if backend not in paths:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if ledger is None or ledger == DEFAULT_LEDGER:
+        return paths[backend]
+    return os.path.join(LEDGERS_DIR, check_ledger_name(ledger), os.path.basename(paths[backend]))
+
+
+class _PooledLedger:
+    __slots__ = ("service", "last_used", "footprint")
+
+    def __init__(self, service: "ExpenseService"):
+        self.service = service
+        self.last_used = monotonic()
+        self.footprint = 0
+
+
+class LedgerRegistry:
+    """Maps ledger names to open ExpenseServices, keeping the recently used ones in a bounded LRU pool.
+
+    A ledger is opened once with a cached repository, so later requests for it
+    are answered from memory instead of re-reading its files. The pool keeps at
+    most ``max_open`` ledgers and, with ``memory_budget`` set, roughly that many
+    bytes of cached data; the least recently used ledgers are closed first.
+    Ledgers left unused for ``idle_seconds`` are closed as well.
+
+    A service handed out here may be closed once other ledgers push it out of
+    the pool, so fetch it again for every request instead of keeping it.
+    Safe to share between threads.
+    """
+
+    def __init__(self, backend: str = DEFAULT_BACKEND, max_open: int = 256, memory_budget: Optional[int] = None,
+                 idle_seconds: Optional[float] = None, verify: bool = False,
+                 opener: Optional[Callable[[str], "ExpenseService"]] = None):
+        if max_open < 1:
+            raise ValueError("max_open must be at least 1.")
+        self.backend = backend
+        self.max_open = max_open
+        self.memory_budget = memory_budget
+        self.idle_seconds = idle_seconds
+        self.verify = verify
+        self._opener = opener or self._open_service
+        self._lock = threading.RLock()
+        # Least recently used first.
+        self._pool: "OrderedDict[str, _PooledLedger]" = OrderedDict()
+        self._footprint = 0
+        # The ledger handed out last; its caches may have grown since, so its footprint is re-read on the next call.
+        self._last: Optional[str] = None
+
+    def service(self, ledger: Optional[str] = None) -> "ExpenseService":
+        """The service of ``ledger`` (the default one if not given), opening it if it is not pooled."""
+        name = check_ledger_name(ledger or DEFAULT_LEDGER)
+        with self._lock:
+            self._refresh_footprint(self._last)
+            entry = self._pool.get(name)
+            if entry is None:
+                METRICS.count("ledgers.opened")
+                entry = _PooledLedger(self._opener(name))
+                self._pool[name] = entry
+            else:
+                METRICS.count("ledgers.reused")
+                self._pool.move_to_end(name)
+            entry.last_used = monotonic()
+            self._last = name
+            self._shrink(keep=name)
+            return entry.service
+
+    def evict(self, ledger: str) -> bool:
+        """Close ``ledger`` if it is open. It is reopened on the next request for it."""
+        with self._lock:
+            entry = self._pool.pop(ledger, None)
+            if entry is None:
+                return False
+            self._close(ledger, entry)
+            return True
+
+    def evict_idle(self) -> int:
+        """Close the ledgers not used for ``idle_seconds``. Returns how many were closed."""
+        with self._lock:
+            return self._evict_idle(keep=None)
+
+    def close(self) -> None:
+        """Close every open ledger."""
+        with self._lock:
+            while self._pool:
+                self._close(*self._pool.popitem(last=False))
+
+    def open_ledgers(self) -> List[str]:
+        """The open ledgers, least recently used first."""
+        with self._lock:
+            return list(self._pool)
+
+    def memory_footprint(self) -> int:
+        """Estimated bytes held by the open ledgers, as of their last use."""
+        with self._lock:
+            self._refresh_footprint(self._last)
+            return self._footprint
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"open": len(self._pool), "max_open": self.max_open, "memory_footprint": self.memory_footprint(),
+                    "memory_budget": self.memory_budget}
+
+    def __contains__(self, ledger: str) -> bool:
+        return ledger in self._pool
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+    def _open_service(self, ledger: str) -> "ExpenseService":
+        from .repositories import create_repository
+        from .services import ExpenseService
+        return ExpenseService(create_repository(self.backend, verify=self.verify, cached=True, ledger=ledger),
+                              ledger=ledger)
+
+    def _refresh_footprint(self, ledger: Optional[str]) -> None:
+        entry = self._pool.get(ledger) if ledger is not None else None
+        if entry is not None:
+            footprint = entry.service.repository.memory_footprint()
+            self._footprint += footprint - entry.footprint
+            entry.footprint = footprint
+
+    def _shrink(self, keep: str) -> None:
+        self._evict_idle(keep)
+        # The ledger just asked for stays open even if it alone is over the budget.
+        while len(self._pool) > 1 and (len(self._pool) > self.max_open or self._over_budget()):
+            name, entry = next(iter(self._pool.items()))
+            if name == keep:
+                break
+            del self._pool[name]
+            self._close(name, entry)
+
+    def _over_budget(self) -> bool:
+        return self.memory_budget is not None and self._footprint > self.memory_budget
+
+    def _evict_idle(self, keep: Optional[str]) -> int:
+        if self.idle_seconds is None:
+            return 0
+        cutoff = monotonic() - self.idle_seconds
+        evicted = 0
+        # Oldest first, so the scan stops at the first ledger that is still in use.
+        while self._pool:
+            name, entry = next(iter(self._pool.items()))
+            if name == keep or entry.last_used > cutoff:
+                break
+            del self._pool[name]
+            self._close(name, entry)
+            evicted += 1
+        return evicted
+
+    def _close(self, name: str, entry: _PooledLedger) -> None:
+        METRICS.count("ledgers.evicted")
+        self._footprint -= entry.footprint
+        if self._last == name:
+            self._last = None
+        entry.service.repository.close()
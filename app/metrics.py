@@ -0,0 +1,115 @@
+import sys
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from time import perf_counter
+from typing import Callable, ContextManager, Dict, Optional, TextIO
+
+# Shared by every disabled timer, so an uninstrumented run allocates nothing.
+_DISABLED = nullcontext()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "began")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.began = perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, perf_counter() - self.began)
+
+
+class Metrics:
+    """Process-wide counters and timers for the hot paths.
+
+    Disabled by default: instrumented code then pays one attribute check per
+    call. Timers are inclusive, so ``service.list_expenses`` also contains the
+    ``json.read`` it triggered.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.counters: Dict[str, int] = {}
+        # name -> [seconds, calls]
+        self.timers: Dict[str, list] = {}
+
+    def count(self, name: str, value: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timer(self, name: str) -> ContextManager:
+        return _Timer(self, name) if self.enabled else _DISABLED
+
+    def add_time(self, name: str, seconds: float) -> None:
+        entry = self.timers.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def reset(self) -> None:
+        self.counters = {}
+        self.timers = {}
+
+    def snapshot(self) -> Dict:
+        """Everything recorded so far, as plain JSON-serialisable data."""
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "timers": {name: {"seconds": seconds, "calls": calls}
+                       for name, (seconds, calls) in sorted(self.timers.items())},
+        }
+
+    def format(self, wall_seconds: Optional[float] = None) -> str:
+        """A breakdown table: timers by total time, then counters."""
+        lines = [f"Profile (wall time {wall_seconds * 1e3:.1f} ms)" if wall_seconds is not None else "Profile"]
+        if self.timers:
+            lines.append(f"{'Timer':<32} {'Calls':>8} {'Total ms':>10} {'Mean ms':>10}")
+            for name, (seconds, calls) in sorted(self.timers.items(), key=lambda item: -item[1][0]):
+                lines.append(f"{name:<32} {calls:>8} {seconds * 1e3:>10.3f} {seconds * 1e3 / calls:>10.3f}")
+        if self.counters:
+            lines.append(f"{'Counter':<32} {'Value':>8}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name:<32} {value:>8}")
+        return "\n".join(lines)
+
+
+METRICS = Metrics()
+
+
+def timed(name: str) -> Callable:
+    """Decorate a function so each call is recorded under ``name`` while metrics are enabled."""
+    def decorate(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return function(*args, **kwargs)
+            with _Timer(METRICS, name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def profiled(profile_output: Optional[str] = None, stream: Optional[TextIO] = None):
+    """Record metrics for the enclosed block and print the breakdown to ``stream`` (stderr by default).
+
+    With ``profile_output`` set, a cProfile dump is also written there for ``pstats`` or snakeviz.
+    """
+    profiler = None
+    if profile_output:
+        import cProfile
+        profiler = cProfile.Profile()
+    was_enabled, METRICS.enabled = METRICS.enabled, True
+    METRICS.reset()
+    began = perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield METRICS
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_output)
+        METRICS.enabled = was_enabled
+        print(METRICS.format(perf_counter() - began), file=stream or sys.stderr)
@@ -1,7 +1,15 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Literal, Optional, Dict, TYPE_CHECKING
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
+
+if TYPE_CHECKING:
+    from .currency import LedgerCurrency
+
+# Validation context for rows read back from our own store.
+STORED_CONTEXT: Dict = {"stored": True}
+# How far back a new expense may be dated.
+MAX_EXPENSE_AGE = timedelta(days=365 * 10)
 
 
 class Expense(BaseModel):
@@ -13,12 +21,15 @@ class Expense(BaseModel):
 
     @field_validator('date',mode='after')
     @classmethod
-    def validate_date(cls, date: datetime) -> datetime:
+    def validate_date(cls, date: datetime, info: ValidationInfo) -> datetime:
+        # The window only applies to new entries; stored rows are allowed to age past it.
+        if info.context and info.context.get("stored"):
+            return date
         now = datetime.now()
         if date > now:
             raise ValueError("Date cannot be in the future.")
         # Prevent excessively past dates
-        min_date = now - timedelta(days=365 * 10)
+        min_date = now - MAX_EXPENSE_AGE
         if date < min_date:
             raise ValueError(f"Date cannot be earlier than {min_date.strftime('%Y-%m-%d')}.")
 
@@ -32,3 +43,69 @@ class Expense(BaseModel):
         if amount > 1e9:
             raise ValueError("Amount must not exceed 1 billion.")
         return amount
+
+    @classmethod
+    def from_storage(cls, data: Dict, currency: Optional["LedgerCurrency"] = None) -> "Expense":
+        """Build an Expense from a row we wrote ourselves, skipping validation.
+
+        With a ``currency`` the stored amount is decoded from minor units; without one it is taken as is.
+        """
+        date = data["date"]
+        return cls.model_construct(
+            id=data["id"],
+            date=date if isinstance(date, datetime) else datetime.fromisoformat(date),
+            amount=currency.decode(data["amount"]) if currency is not None else float(data["amount"]),
+            description=data["description"],
+            category=data.get("category"),
+        )
+
+
+class ExpenseSummary(BaseModel):
+    total: float = 0
+    count: int = 0
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+
+class ExpenseQuery(BaseModel):
+    """Filters, sort order and page for ``query_expenses``.
+
+    ``after`` is a keyset cursor from ``queries.cursor_for`` on the last row of
+    the previous page; the next page starts right after it.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    category: Optional[str] = None
+    # Case-insensitive substring of the description.
+    search: Optional[str] = None
+    sort: Literal["id", "date", "amount"] = "id"
+    descending: bool = False
+    limit: Optional[int] = Field(default=None, ge=0)
+    offset: int = Field(default=0, ge=0)
+    after: Optional[str] = None
+
+
+class ExpenseChange(BaseModel):
+    """One entry of a ledger's change feed; see ``changes_since``.
+
+    Adds and updates carry the expense as stored afterwards. Deletes name the
+    removed id, and a clear removes every expense before it.
+    """
+    sequence: int
+    operation: Literal["add", "update", "delete", "clear"]
+    expense_id: Optional[int] = None
+    expense: Optional[Expense] = None
+
+    @classmethod
+    def from_entry(cls, entry: Dict) -> "ExpenseChange":
+        """Build a change from a change log entry we wrote ourselves, skipping validation."""
+        expense = Expense.from_storage(entry["expense"]) if entry.get("expense") else None
+        return cls.model_construct(sequence=entry["seq"], operation=entry["op"], expense_id=entry.get("id"),
+                                   expense=expense)
+
+
+class ReportRow(BaseModel):
+    bucket: str
+    category: Optional[str] = None
+    total: float = 0
+    count: int = 0
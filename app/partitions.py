@@ -0,0 +1,194 @@
+import json
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .aggregates import AggregateIndex, year_month
+
+MANIFEST_FORMAT = 2
+# Format 1 summed float amounts; its aggregates are recomputed on load.
+READABLE_MANIFEST_FORMATS = (1, MANIFEST_FORMAT)
+
+
+def partition_name(date) -> str:
+    """The ``YYYY-MM`` partition a datetime or stored ISO-8601 string belongs to."""
+    year, month = year_month(date)
+    return f"{year:04d}-{month:02d}"
+
+
+def partition_month(name: str) -> Tuple[int, int]:
+    year, month = name.split("-")
+    return int(year), int(month)
+
+
+class PartitionManifest:
+    """The small file that describes a partitioned ledger.
+
+    It holds the id high-water mark, the ``version()`` each partition file had
+    when its aggregates were last computed, and the per (year, month,
+    category) aggregates themselves. A partition whose file no longer matches
+    its recorded version has its aggregates recomputed from that file alone.
+
+    ``id_log_size`` is how much of the id index the high-water mark covers, so
+    ids recorded by a write that crashed before saving the manifest are found
+    by reading only what follows. ``id_generation`` goes up on every clear.
+    """
+
+    def __init__(self, file_path: str, scale: int = 2):
+        self.file_path = file_path
+        self.scale = scale
+        self.last_id = 0
+        self.id_log_size = 0
+        self.id_generation = 0
+        self.partitions: Dict[str, Optional[list]] = {}
+        self.aggregates = AggregateIndex(scale=scale)
+
+    def load(self) -> None:
+        self.last_id, self.partitions, self.aggregates = 0, {}, AggregateIndex(scale=self.scale)
+        self.id_log_size, self.id_generation = 0, 0
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r") as manifest_file:
+                data = json.load(manifest_file)
+        except json.JSONDecodeError:
+            raise ValueError(f"{self.file_path} contains invalid JSON.")
+        except IOError as e:
+            raise IOError(f"Failed to read {self.file_path}: {e}")
+        if data.get("format") not in READABLE_MANIFEST_FORMATS:
+            raise ValueError(f"{self.file_path} uses manifest format {data.get('format')}, "
+                             f"expected {MANIFEST_FORMAT}.")
+        self.last_id = data["last_id"]
+        # Missing from older manifests: the whole id index is then read once for the high-water mark.
+        self.id_log_size = data.get("id_log_size", 0)
+        self.id_generation = data.get("id_generation", 0)
+        if data.get("scale") != self.scale:
+            # With no partition marked current, every partition's aggregates are recomputed.
+            return
+        self.partitions = data["partitions"]
+        self.aggregates.buckets = {(year, month, category): [total, count, minimum, maximum]
+                                   for year, month, category, total, count, minimum, maximum in data["buckets"]}
+
+    def save(self) -> None:
+        data = {
+            "format": MANIFEST_FORMAT,
+            "last_id": self.last_id,
+            "id_log_size": self.id_log_size,
+            "id_generation": self.id_generation,
+            "scale": self.scale,
+            "partitions": self.partitions,
+            "buckets": [[*key, *bucket] for key, bucket in self.aggregates.buckets.items()],
+        }
+        temp_path = f"{self.file_path}.tmp"
+        try:
+            with open(temp_path, "w") as manifest_file:
+                json.dump(data, manifest_file)
+                manifest_file.flush()
+                os.fsync(manifest_file.fileno())
+            os.replace(temp_path, self.file_path)
+        except IOError as e:
+            raise IOError(f"Failed to write to {self.file_path}: {e}")
+
+    def set_partition(self, name: str, version: Optional[Tuple], entries: Iterable[Tuple]) -> None:
+        """Replace the aggregates of one partition with ``(date, category, minor units)`` entries."""
+        year, month = partition_month(name)
+        self.aggregates.buckets = {key: bucket for key, bucket in self.aggregates.buckets.items()
+                                   if (key[0], key[1]) != (year, month)}
+        for date, category, amount in entries:
+            self.aggregates.add(date, category, amount)
+        if version is None:
+            self.partitions.pop(name, None)
+        else:
+            # Stored as JSON so it compares equal to a version loaded back from disk.
+            self.partitions[name] = json.loads(json.dumps(version))
+
+    def is_current(self, name: str, version: Optional[Tuple]) -> bool:
+        return version is not None and self.partitions.get(name) == json.loads(json.dumps(version))
+
+
+class PartitionIdIndex:
+    """Append-only map from expense id to the partition holding it.
+
+    Each line is ``<id> <partition>``; a partition of ``-`` records a delete.
+    Lines appended by other processes are picked up incrementally. The map is
+    only read for lookups; adds take their ids from the manifest.
+    """
+
+    DELETED = "-"
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.partitions: Dict[int, str] = {}
+        self._offset = 0
+        self._generation: Optional[int] = None
+
+    def refresh(self, generation: int) -> None:
+        """Read lines appended since the last refresh; ``generation`` is the manifest's ``id_generation``."""
+        size = self.size()
+        if generation != self._generation or size < self._offset:
+            # Cleared since the last refresh, maybe written past our offset again; start over.
+            self.partitions, self._offset, self._generation = {}, 0, generation
+        if size == self._offset:
+            return
+        complete = self._read_lines(self._offset, size)
+        for expense_id, partition in self._parse(complete):
+            if partition == self.DELETED:
+                self.partitions.pop(expense_id, None)
+            else:
+                self.partitions[expense_id] = partition
+        self._offset += len(complete)
+
+    def last_id_after(self, offset: int) -> int:
+        """The largest id recorded past ``offset``, or 0; only that tail of the file is read."""
+        size = self.size()
+        if size < offset:
+            offset = 0
+        return max((expense_id for expense_id, _ in self._parse(self._read_lines(offset, size))), default=0)
+
+    def lookup(self, expense_id: int) -> Optional[str]:
+        """Look an id up in the map as of the last ``refresh``."""
+        return self.partitions.get(expense_id)
+
+    def record(self, entries: List[Tuple[int, str]]) -> int:
+        """Append ``entries`` and return the new size of the file."""
+        data = "".join(f"{expense_id} {partition}\n" for expense_id, partition in entries).encode("utf-8")
+        try:
+            with open(self.file_path, "ab") as index_file:
+                start = index_file.tell()
+                index_file.write(data)
+        except IOError as e:
+            raise IOError(f"Failed to write to {self.file_path}: {e}")
+        if start == self._offset:
+            # Our own lines need not be read back; lines of other processes in between would be.
+            for expense_id, partition in entries:
+                if partition == self.DELETED:
+                    self.partitions.pop(expense_id, None)
+                else:
+                    self.partitions[expense_id] = partition
+            self._offset += len(data)
+        return start + len(data)
+
+    def clear(self, generation: int) -> None:
+        with open(self.file_path, "w"):
+            pass
+        self.partitions, self._offset, self._generation = {}, 0, generation
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.file_path)
+        except FileNotFoundError:
+            return 0
+
+    def _read_lines(self, start: int, end: int) -> bytes:
+        if start >= end:
+            return b""
+        with open(self.file_path, "rb") as index_file:
+            index_file.seek(start)
+            chunk = index_file.read(end - start)
+        # Ignore a torn last line; it is re-read once it is complete.
+        return chunk[:chunk.rfind(b"\n") + 1]
+
+    @staticmethod
+    def _parse(lines: bytes) -> Iterator[Tuple[int, str]]:
+        for line in lines.decode("utf-8").splitlines():
+            expense_id, partition = line.split(" ", 1)
+            yield int(expense_id), partition
@@ -0,0 +1,66 @@
+import heapq
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .models import Expense, ExpenseQuery
+
+# Every sort ends with the id, so the order is total and a cursor is unambiguous.
+SORT_KEYS: Dict[str, Callable] = {
+    "id": lambda expense: (expense.id,),
+    "date": lambda expense: (expense.date, expense.id),
+    "amount": lambda expense: (expense.amount, expense.id),
+}
+
+
+def cursor_for(expense, sort: str = "id") -> str:
+    """The ``after`` value that continues a listing right after ``expense``.
+
+    Works on anything with id, date and amount attributes, so daemon results qualify too.
+    """
+    if sort == "id":
+        return str(expense.id)
+    value = expense.date.isoformat() if sort == "date" else repr(expense.amount)
+    return f"{value},{expense.id}"
+
+
+def parse_cursor(cursor: str, sort: str = "id") -> Tuple:
+    """Turn an ``after`` value back into the sort key it stands for."""
+    try:
+        if sort == "id":
+            return (int(cursor),)
+        value, expense_id = cursor.rsplit(",", 1)
+        return (datetime.fromisoformat(value) if sort == "date" else float(value)), int(expense_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor for sorting by {sort}: {cursor!r}")
+
+
+def run_query(expenses: Iterable["Expense"], query: "ExpenseQuery") -> Iterator["Expense"]:
+    """Search, sort and page ``expenses``, which must come in id order and already match the category.
+
+    In id order a page is streamed straight from ``expenses`` and reading stops
+    at its last row. Other orders with a ``limit`` keep only ``offset + limit``
+    rows in a bounded heap; without one every match is sorted.
+    """
+    key = SORT_KEYS[query.sort]
+    rows = iter(expenses)
+    if query.search:
+        needle = query.search.casefold()
+        rows = (expense for expense in rows if needle in expense.description.casefold())
+    if query.after is not None:
+        after = parse_cursor(query.after, query.sort)
+        if query.descending:
+            rows = (expense for expense in rows if key(expense) < after)
+        else:
+            rows = (expense for expense in rows if key(expense) > after)
+
+    if query.sort == "id" and not query.descending:
+        stop = None if query.limit is None else query.offset + query.limit
+        return islice(rows, query.offset, stop)
+    if query.limit is not None:
+        select = heapq.nlargest if query.descending else heapq.nsmallest
+        page = select(query.offset + query.limit, rows, key=key)
+    else:
+        page = sorted(rows, key=key, reverse=query.descending)
+    return iter(page[query.offset:])
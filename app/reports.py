@@ -0,0 +1,162 @@
+import csv
+import json
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional, TextIO, Tuple
+
+from .boundaries import ExpenseRepositoryInterface
+from .metrics import METRICS
+from .models import ReportRow
+from .table import ExpenseTable, numpy
+from .utils.timestamps import from_timestamp, to_timestamp
+
+REPORT_FIELDS = ("bucket", "total", "count")
+
+
+def _week(date: datetime) -> str:
+    iso = date.isocalendar()
+    return f"{iso.year}-W{iso.week:02d}"
+
+
+# Bucket labels sort chronologically, and rows in date order fall into each bucket contiguously.
+PERIODS: Dict[str, Callable[[datetime], str]] = {
+    "day": lambda date: f"{date.year:04d}-{date.month:02d}-{date.day:02d}",
+    "week": _week,
+    "month": lambda date: f"{date.year:04d}-{date.month:02d}",
+    "year": lambda date: f"{date.year:04d}",
+}
+
+
+class DateIndex:
+    """Row positions of an ExpenseTable sorted by date.
+
+    A date range becomes two binary searches over the sorted timestamps, so
+    a query costs O(log N + k) for k matching rows instead of a full scan.
+    """
+
+    def __init__(self, table: ExpenseTable):
+        self.table = table
+        if numpy is not None:
+            order = numpy.argsort(numpy.frombuffer(table.timestamps, dtype=numpy.int64), kind="stable")
+            self.order = array("q", order.astype(numpy.int64).tobytes())
+        else:
+            self.order = array("q", sorted(range(len(table)), key=table.timestamps.__getitem__))
+        self.timestamps = array("q", (table.timestamps[row] for row in self.order))
+
+    def rows_between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> array:
+        """Row positions dated in ``[start, end)`` in date order; an unset bound is open."""
+        low = bisect_left(self.timestamps, to_timestamp(start)) if start is not None else 0
+        high = bisect_left(self.timestamps, to_timestamp(end)) if end is not None else len(self.timestamps)
+        return self.order[low:high]
+
+
+class ReportEngine:
+    """Bucketed totals over a repository, backed by a DateIndex.
+
+    The index is rebuilt only when the repository reports a new ``version()``;
+    repositories that cannot tell rebuild it for every report.
+    """
+
+    def __init__(self, repository: ExpenseRepositoryInterface):
+        self.repository = repository
+        self._index: Optional[DateIndex] = None
+        self._version = None
+
+    def index(self) -> DateIndex:
+        version = self.repository.version()
+        if self._index is None or version is None or version != self._version:
+            with METRICS.timer("reports.build_index"):
+                self._index = DateIndex(self.repository.get_expense_table())
+            self._version = version
+        return self._index
+
+    def report(self, period: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               category: Optional[str] = None, by_category: bool = False) -> Iterator[ReportRow]:
+        """Yield one row per ``period`` bucket in ``[start, end)``, or per bucket and category.
+
+        Each bucket is yielded as soon as the scan moves past it.
+        """
+        if period not in PERIODS:
+            raise ValueError(f"Unknown report period: {period}")
+        label = PERIODS[period]
+        index = self.index()
+        table = index.table
+        code = None
+        if category is not None:
+            if category not in table.categories:
+                return
+            code = table.categories.index(category)
+
+        bucket: Optional[str] = None
+        totals: Dict[int, list] = {}
+        for row in index.rows_between(start, end):
+            row_code = table.category_codes[row]
+            if code is not None and row_code != code:
+                continue
+            row_bucket = label(from_timestamp(table.timestamps[row]))
+            if row_bucket != bucket:
+                yield from self._bucket_rows(bucket, totals, table, by_category)
+                bucket, totals = row_bucket, {}
+            # Summed in minor units, so the totals are exact.
+            entry = totals.setdefault(row_code if by_category else 0, [0, 0])
+            entry[0] += table.amounts[row]
+            entry[1] += 1
+        yield from self._bucket_rows(bucket, totals, table, by_category)
+
+    @staticmethod
+    def _bucket_rows(bucket: Optional[str], totals: Dict[int, list], table: ExpenseTable,
+                     by_category: bool) -> Iterator[ReportRow]:
+        if bucket is None:
+            return
+        if not by_category:
+            total, count = totals[0]
+            yield ReportRow(bucket=bucket, total=table.currency.from_minor(total), count=count)
+            return
+        categories = table.categories
+        # Uncategorised expenses come first, then categories alphabetically.
+        for code in sorted(totals, key=lambda code: (categories[code] is not None, categories[code] or "")):
+            total, count = totals[code]
+            yield ReportRow(bucket=bucket, category=categories[code], total=table.currency.from_minor(total),
+                            count=count)
+
+
+_TABLE_HEADINGS = {"bucket": f"{'Bucket':<10}", "category": f"{'Category':<20}",
+                   "total": f"{'Total':>14}", "count": f"{'Count':>8}"}
+
+
+def _table_cell(row: ReportRow, field: str) -> str:
+    if field == "bucket":
+        return f"{row.bucket:<10}"
+    if field == "category":
+        return f"{row.category or '-':<20}"
+    if field == "total":
+        return f"{row.total:>14.2f}"
+    return f"{row.count:>8}"
+
+
+def write_report(rows: Iterator[ReportRow], output_format: str, stream: TextIO, by_category: bool = False) -> int:
+    """Write report rows as they arrive. Returns the number of rows written.
+
+    Rows only need the attributes being written, so the daemon client's plain rows work too.
+    """
+    fields: Tuple[str, ...] = ("bucket", "category", "total", "count") if by_category else REPORT_FIELDS
+    written = 0
+    if output_format == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow([getattr(row, field) for field in fields])
+            written += 1
+    elif output_format == "json":
+        stream.write("[")
+        for row in rows:
+            stream.write(("," if written else "") + "\n  " + json.dumps({field: getattr(row, field) for field in fields}))
+            written += 1
+        stream.write("\n]\n" if written else "]\n")
+    else:
+        stream.write(" ".join(_TABLE_HEADINGS[field] for field in fields) + "\n")
+        for row in rows:
+            stream.write(" ".join(_table_cell(row, field) for field in fields) + "\n")
+            written += 1
+    return written
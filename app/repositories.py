@@ -1,69 +1,1201 @@
+from collections import defaultdict
 from datetime import datetime
-from typing import List, Dict
-import csv
+from itertools import chain
+from typing import List, Dict, Optional, Iterator, Tuple
+import json
+import os
+import re
+import sqlite3
 
-from .boundaries import ExpenseRepositoryInterface, FileHandlerInterface
-from .models import Expense
+from .boundaries import (ExpenseRepositoryInterface, FileHandlerInterface, AppendableFileHandlerInterface,
+                         ColumnarFileHandlerInterface, ExtendableFileHandlerInterface)
+from .models import Expense, ExpenseChange, ExpenseQuery, ExpenseSummary, STORED_CONTEXT
+from .aggregates import AggregateIndex, aggregate_index_path
+from .cache import ExpenseCache
+from .changes import ChangeLog, change_log_path
+from .currency import LedgerCurrency, currency_path
+from .metrics import METRICS
+from .table import ExpenseTable
+from .queries import parse_cursor
+from .partitions import PartitionIdIndex, PartitionManifest, partition_month, partition_name
+from .constants import JSON_INDENT_ENV_VAR
+from .ledgers import ledger_path
+from .utils.json_file_handler import DateTimeEncoder, JSONFileHandler
+from .utils.journal_file_handler import JournalFileHandler
+from .utils.binary_file_handler import BinaryFileHandler
+from .utils.timestamps import from_timestamp
+from .utils.csv_export import write_csv_rows
+from .utils.file_lock import FileLock
 
-from .utils.logger_config import setup_logger
-LOGGER = setup_logger()
+from .utils.logger_config import get_logger
+LOGGER = get_logger()
+
+# Measured per expense in a cached JSON ledger: the Expense, its dumped record and that record's encoded text.
+CACHED_EXPENSE_BYTES = 1200
 
 
 class ExpenseJsonRepository(ExpenseRepositoryInterface):
 
-    def __init__(self, expense_file_handler: FileHandlerInterface, logger=LOGGER):
+    def __init__(self, expense_file_handler: FileHandlerInterface, logger=LOGGER, verify: bool = False,
+                 cache: Optional[ExpenseCache] = None, aggregate_index: Optional[AggregateIndex] = None,
+                 currency: Optional[LedgerCurrency] = None, change_log: Optional[ChangeLog] = None):
+        """Pass a ``cache`` to keep decoded expenses in memory between calls.
+
+        Cached expenses are handed to every caller as they are, so treat what a cached repository returns as
+        read-only; ``ExpenseService.update`` builds a new expense rather than editing the stored one.
+        Without a ``change_log`` the repository keeps no change feed.
+        """
         self.expense_file_handler = expense_file_handler
         self.logger = logger
+        self.verify = verify
+        self.cache = cache
+        self.aggregate_index = aggregate_index
+        self.change_log = change_log
+        self.currency = currency or LedgerCurrency()
+        # id -> (expense, its model_dump()), reused while the cache hands out the same objects.
+        self._dumped: Dict[int, Tuple[Expense, Dict]] = {}
 
     def add_expense(self, new_expense: Expense) -> Expense:
-        expenses = self.get_all_expenses()
-        self._assign_new_id(new_expense, expenses)
-        expenses.append(new_expense)
-        self._save_expense(expenses)
-        self.logger.info(f"Expense added successfully (ID: {new_expense.id})")
+        round_amounts([new_expense], self.currency)
+        with self.expense_file_handler.lock():
+            if isinstance(self.expense_file_handler, AppendableFileHandlerInterface):
+                fresh = self._begin_write()
+                new_expense.id = self.expense_file_handler.last_id() + 1
+                self.expense_file_handler.append(self._record(new_expense))
+                self._finish_write(fresh, added=[new_expense])
+            elif isinstance(self.expense_file_handler, ExtendableFileHandlerInterface):
+                new_expense.id = self._prepare_extend() + 1
+                # Taken after _prepare_extend, which may just have loaded the cache or rebuilt the index.
+                fresh = self._begin_write()
+                self.expense_file_handler.extend(self._dump_expenses([new_expense], replace_all=False))
+                self._finish_write(fresh, added=[new_expense])
+            else:
+                fresh = self._begin_write()
+                expenses = self.get_all_expenses()
+                self._assign_new_id(new_expense, expenses)
+                expenses.append(new_expense)
+                self._save_expense(expenses)
+                self._finish_write(fresh, added=[new_expense], expenses=expenses)
+        self.logger.info("Expense added successfully (ID: %s)", new_expense.id)
         return new_expense
 
+    def add_expenses(self, new_expenses: List[Expense]) -> List[Expense]:
+        round_amounts(new_expenses, self.currency)
+        with self.expense_file_handler.lock():
+            if isinstance(self.expense_file_handler, AppendableFileHandlerInterface):
+                fresh = self._begin_write()
+                self._assign_ids_from(new_expenses, self.expense_file_handler.last_id())
+                self.expense_file_handler.extend([self._record(expense) for expense in new_expenses])
+                self._finish_write(fresh, added=new_expenses)
+            elif isinstance(self.expense_file_handler, ExtendableFileHandlerInterface):
+                self._assign_ids_from(new_expenses, self._prepare_extend())
+                fresh = self._begin_write()
+                self.expense_file_handler.extend(self._dump_expenses(new_expenses, replace_all=False))
+                self._finish_write(fresh, added=new_expenses)
+            else:
+                fresh = self._begin_write()
+                expenses = self.get_all_expenses()
+                self._assign_ids_from(new_expenses, max([expense.id for expense in expenses], default=0))
+                expenses.extend(new_expenses)
+                self._save_expense(expenses)
+                self._finish_write(fresh, added=new_expenses, expenses=expenses)
+        self.logger.info("Added %s expenses", len(new_expenses))
+        return new_expenses
+
     def get_all_expenses(self) -> List[Expense]:
-        raw_data = self.expense_file_handler.read()
-        return [Expense(**data) for data in raw_data]
+        if self.cache is None:
+            return self._load_expenses(self.expense_file_handler.read())
+
+        expenses = self.cache.get(self.expense_file_handler.version())
+        if expenses is None:
+            # Key the cache by the version the data was actually read at, not one taken beforehand.
+            version, raw_data = self.expense_file_handler.read_versioned()
+            expenses = self._load_expenses(raw_data)
+            self.cache.put(version, expenses)
+        return expenses
 
     def get_all_expenses_by_category(self, category: str) -> List[Expense]:
+        if self.cache is not None:
+            return [expense for expense in self.get_all_expenses() if expense.category == category]
         raw_data = self.expense_file_handler.read()
-        return [Expense(**data) for data in raw_data if data["category"] == category]
+        return self._load_expenses([data for data in raw_data if data["category"] == category])
 
-    def delete_expense(self, expense_id) -> None:
-        expenses = self.get_all_expenses()
-        updated_expenses = [expense for expense in expenses if expense.id != expense_id]
-        if len(expenses) == len(updated_expenses):
+    def version(self) -> Optional[Tuple]:
+        return self.expense_file_handler.version()
+
+    def memory_footprint(self) -> int:
+        return len(self.cache) * CACHED_EXPENSE_BYTES if self.cache is not None else 0
+
+    def close(self) -> None:
+        # Nothing stays open between calls; dropping the caches frees their memory even while references remain.
+        if self.cache is not None:
+            self.cache.invalidate()
+        self._dumped.clear()
+
+    def iter_expenses(self, category: Optional[str] = None) -> Iterator[Expense]:
+        if self.cache is not None:
+            expenses = self.get_all_expenses()
+            yield from (expenses if category is None else
+                        (expense for expense in expenses if expense.category == category))
+            return
+        # Records are filtered before any model is built, and only the ones the caller reaches are built.
+        for data in self.expense_file_handler.iter_records():
+            if category is None or data.get("category") == category:
+                yield self._load_expense(data)
+
+    def get_expense_table(self) -> ExpenseTable:
+        if self.cache is not None:
+            return ExpenseTable.from_expenses(self.get_all_expenses(), self.currency)
+        if isinstance(self.expense_file_handler, ColumnarFileHandlerInterface):
+            columns = self.expense_file_handler.columns()
+            return ExpenseTable.from_columns(columns.ids, columns.amounts, columns.timestamps,
+                                             columns.category_codes, columns.categories, columns.descriptions,
+                                             self.currency)
+        return ExpenseTable.from_records(self.expense_file_handler.iter_records(), self.currency)
+
+    def get_expense(self, expense_id: int) -> Expense:
+        handler = self.expense_file_handler
+        if isinstance(handler, AppendableFileHandlerInterface):
+            data = handler.get(expense_id)
+        elif self.cache is not None:
+            if not self.cache.is_fresh(handler.version()):
+                self.get_all_expenses()
+            expense = self.cache.find(expense_id)
+            if expense is None:
+                raise ValueError(f"Expense with ID {expense_id} not found.")
+            return expense
+        elif isinstance(handler, ColumnarFileHandlerInterface):
+            columns = handler.columns()
+            row = columns.find(expense_id)
+            data = columns.record(row) if row is not None else None
+        else:
+            # Stops at the match and never builds models for the rows it skips.
+            data = next((data for data in handler.iter_records() if data["id"] == expense_id), None)
+        if data is None:
             raise ValueError(f"Expense with ID {expense_id} not found.")
-        self._save_expense(updated_expenses)
-        self.logger.info(f"Deleted the Expense with ID: {expense_id}")
+        return self._load_expense(data)
+
+    def update_expense(self, expense: Expense) -> Expense:
+        round_amounts([expense], self.currency)
+        with self.expense_file_handler.lock():
+            fresh = self._begin_write()
+            if isinstance(self.expense_file_handler, AppendableFileHandlerInterface):
+                previous = self.expense_file_handler.replace(self._record(expense))
+                if previous is None:
+                    raise ValueError(f"Expense with ID {expense.id} not found.")
+                self._finish_write(fresh, replaced=[(self._load_expense(previous), expense)])
+            else:
+                expenses = self.get_all_expenses()
+                position = next((position for position, stored in enumerate(expenses) if stored.id == expense.id),
+                                None)
+                if position is None:
+                    raise ValueError(f"Expense with ID {expense.id} not found.")
+                previous, expenses[position] = expenses[position], expense
+                self._save_expense(expenses)
+                self._finish_write(fresh, replaced=[(previous, expense)], expenses=expenses)
+        self.logger.info("Updated the Expense with ID: %s", expense.id)
+        return expense
+
+    def delete_expense(self, expense_id) -> None:
+        with self.expense_file_handler.lock():
+            fresh = self._begin_write()
+            if isinstance(self.expense_file_handler, AppendableFileHandlerInterface):
+                removed = self.expense_file_handler.remove(expense_id)
+                if removed is None:
+                    raise ValueError(f"Expense with ID {expense_id} not found.")
+                self._finish_write(fresh, removed=[self._load_expense(removed)])
+            else:
+                expenses = self.get_all_expenses()
+                updated_expenses = [expense for expense in expenses if expense.id != expense_id]
+                if len(expenses) == len(updated_expenses):
+                    raise ValueError(f"Expense with ID {expense_id} not found.")
+                self._save_expense(updated_expenses)
+                removed = [expense for expense in expenses if expense.id == expense_id]
+                self._finish_write(fresh, removed=removed, expenses=updated_expenses)
+        self.logger.info("Deleted the Expense with ID: %s", expense_id)
 
     def total_expense(self) -> float:
-        return sum([expense.amount for expense in self.get_all_expenses()])
-
-    def total_expense_by_month(self, month: int) -> float:
-        year: int = datetime.now().year
-        total_monthly_expense = 0
-        for expense in self.get_all_expenses():
-            if expense.date.month == month and expense.date.year == year:
-                total_monthly_expense += expense.amount
-        return total_monthly_expense
-
-    def export_expenses_to_csv(self, file_path: str) -> None:
-        expenses = self.get_all_expenses()
-        with open(file_path, "w", newline="") as csv_file:
-            writer = csv.writer(csv_file)
-            writer.writerow(["ID", "Description", "Category", "Amount", "Date"])
-            for expense in expenses:
-                writer.writerow([expense.id, expense.description, expense.category, expense.amount, expense.date])
+        return self.expense_summary().total
+
+    def total_expense_by_month(self, month: int, year: Optional[int] = None) -> float:
+        return self.expense_summary(year=year or datetime.now().year, month=month).total
+
+    def expense_summary(self, year: Optional[int] = None, month: Optional[int] = None,
+                        category: Optional[str] = None, start_month: Optional[Tuple[int, int]] = None,
+                        end_month: Optional[Tuple[int, int]] = None) -> ExpenseSummary:
+        if self.aggregate_index is not None:
+            index = self.aggregate_index
+            if not index.is_current(self.expense_file_handler.version()):
+                # Held so no write lands between the rebuild's read and its save, and saves never overlap.
+                with self.expense_file_handler.lock():
+                    version = self.expense_file_handler.version()
+                    if not index.is_current(version):
+                        index.rebuild(self._iter_aggregate_entries(), version)
+                        index.save()
+        else:
+            # Without a maintained index, build a throwaway one from a single pass over the rows.
+            index = AggregateIndex()
+            index.rebuild(self._iter_aggregate_entries(), None)
+        return ExpenseSummary(**index.query(year, month, category, start_month, end_month))
+
+    def _iter_aggregate_entries(self) -> Iterator[Tuple]:
+        """``(date, category, minor units)`` of every stored expense."""
+        minor = self.currency.minor
+        if self.cache is not None:
+            to_minor = self.currency.to_minor
+            return ((expense.date, expense.category, to_minor(expense.amount)) for expense in self.get_all_expenses())
+        if isinstance(self.expense_file_handler, ColumnarFileHandlerInterface):
+            # Only the three columns a summary needs are read; descriptions are never decoded.
+            columns = self.expense_file_handler.columns()
+            categories = columns.categories
+            return ((from_timestamp(timestamp), categories[code], minor(amount))
+                    for timestamp, code, amount in zip(columns.timestamps, columns.category_codes, columns.amounts))
+        return ((data["date"], data.get("category"), minor(data["amount"]))
+                for data in self.expense_file_handler.iter_records())
+
+    def export_expenses_to_csv(self, file_path: str, category: Optional[str] = None, month: Optional[int] = None,
+                               year: Optional[int] = None, compress: bool = False) -> None:
+        rows = self._iter_csv_rows(category, month, year or datetime.now().year)
+        write_csv_rows(rows, file_path, compress)
+
+    def _iter_csv_rows(self, category: Optional[str], month: Optional[int], year: int) -> Iterator[list]:
+        # Works on raw records so the export never holds more than one row in memory.
+        for data in self.expense_file_handler.iter_records():
+            if category and data.get("category") != category:
+                continue
+            date = data["date"] if isinstance(data["date"], datetime) else datetime.fromisoformat(data["date"])
+            if month and (date.month != month or date.year != year):
+                continue
+            yield [data["id"], data["description"], data.get("category"), self.currency.decode(data["amount"]), date]
 
     def clear_all_expenses(self) -> None:
-        self._save_expense([])
+        with self.expense_file_handler.lock():
+            self._save_expense([])
+            self._finish_write((False, False, False), expenses=[], cleared=True)
+
+    def migrate_amounts(self, currency: LedgerCurrency) -> int:
+        with self.expense_file_handler.lock():
+            log_current = self._log_is_current()
+            # Decoded with the old settings, then written back with the new ones.
+            expenses = self._load_expenses(self.expense_file_handler.read())
+            self.currency = currency
+            round_amounts(expenses, currency)
+            self._dumped = {}
+            if self.aggregate_index is not None:
+                self.aggregate_index.scale = currency.scale
+            self._save_expense(expenses)
+            # Rounding to another scale may change amounts, so every expense is logged as updated.
+            self._finish_write((False, False, log_current), expenses=expenses,
+                               replaced=[(expense, expense) for expense in expenses])
+        self.logger.info("Stored %s amounts in minor units of %s", len(expenses), currency.code)
+        return len(expenses)
+
+    def changes_since(self, sequence: int) -> Tuple[int, Iterator[ExpenseChange]]:
+        if self.change_log is None:
+            raise ValueError("This repository keeps no change feed.")
+        with self.expense_file_handler.lock():
+            self._sync_change_log()
+        return read_changes(self.change_log, sequence)
+
+    def compact(self) -> None:
+        """Fold a journal into its snapshot. A current change log is told the new version, since no expense changed."""
+        with self.expense_file_handler.lock():
+            log_current = self._log_is_current()
+            self.expense_file_handler.compact()
+            if log_current:
+                self.change_log.append([], self.expense_file_handler.version())
+
+    def _log_is_current(self) -> bool:
+        return self.change_log is not None and self.change_log.is_current(self.expense_file_handler.version())
+
+    def _sync_change_log(self) -> None:
+        """Start a missing change log, or start it over if the data changed without it. Call under the lock.
+
+        Only readers of the feed do this; writes leave such a log alone, so they never pay for the rebuild.
+        """
+        version = self.expense_file_handler.version()
+        if not self.change_log.is_current(version):
+            records = self.expense_file_handler.iter_records() if version is not None else ()
+            self.change_log.seed((self._load_expense(data).model_dump() for data in records), version)
+
+    def _prepare_extend(self) -> int:
+        """Return the highest stored id before an extend.
+
+        A current aggregate index usually knows it, so nothing is read. Otherwise the
+        same pass loads the cache or rebuilds a stale index, so the extend can bring
+        both up to date without reading the file again.
+        """
+        version = self.expense_file_handler.version()
+        index_stale = self.aggregate_index is not None and not self.aggregate_index.is_current(version)
+        if self.aggregate_index is not None and not index_stale and self.aggregate_index.last_id is not None:
+            return self.aggregate_index.last_id
+        if self.cache is not None:
+            last_id = max((expense.id for expense in self.get_all_expenses()), default=0)
+            if index_stale:
+                self.aggregate_index.rebuild(self._iter_aggregate_entries(), version, last_id)
+            elif self.aggregate_index is not None:
+                self.aggregate_index.last_id = last_id
+            return last_id
+        if not index_stale:
+            # Raw records are enough; no Expense is built just to find the highest id.
+            last_id = max((data["id"] for data in self.expense_file_handler.iter_records()), default=0)
+            if self.aggregate_index is not None:
+                # Saved with the index after the extend, so the next add reads nothing.
+                self.aggregate_index.last_id = last_id
+            return last_id
+
+        last_id = 0
+
+        def entries() -> Iterator[Tuple]:
+            nonlocal last_id
+            for data in self.expense_file_handler.iter_records():
+                last_id = max(last_id, data["id"])
+                yield data["date"], data.get("category"), self.currency.minor(data["amount"])
+
+        self.aggregate_index.rebuild(entries(), version)
+        self.aggregate_index.last_id = last_id
+        return last_id
 
     def _assign_new_id(self, new_expense: Expense, expenses: List[Expense]) -> None:
         new_expense.id = max([expense.id for expense in expenses], default=0) + 1
 
+    @staticmethod
+    def _assign_ids_from(new_expenses: List[Expense], last_id: int) -> None:
+        for offset, expense in enumerate(new_expenses, start=1):
+            expense.id = last_id + offset
+
+    def _load_expense(self, data: Dict) -> Expense:
+        if self.verify:
+            return Expense.model_validate({**data, "amount": self.currency.decode(data["amount"])},
+                                          context=STORED_CONTEXT)
+        return Expense.from_storage(data, self.currency)
+
+    def _record(self, expense: Expense) -> Dict:
+        return stored_record(expense, self.currency)
+
+    def _load_expenses(self, raw_data: List[Dict]) -> List[Expense]:
+        with METRICS.timer("repository.decode"):
+            expenses = [self._load_expense(data) for data in raw_data]
+        METRICS.count("repository.rows_decoded", len(expenses))
+        return expenses
+
+    def _begin_write(self) -> Tuple[bool, bool, bool]:
+        """Record whether the cache, aggregate index and change log match the data before a write changes it."""
+        version = self.expense_file_handler.version()
+        cache_fresh = self.cache is not None and self.cache.is_fresh(version)
+        index_fresh = self.aggregate_index is not None and self.aggregate_index.is_current(version)
+        log_current = self.change_log is not None and self.change_log.is_current(version)
+        return cache_fresh, index_fresh, log_current
+
+    def _finish_write(self, fresh: Tuple[bool, bool, bool], added: List[Expense] = (), removed: List[Expense] = (),
+                      expenses: Optional[List[Expense]] = None, cleared: bool = False,
+                      replaced: List[Tuple[Expense, Expense]] = ()) -> None:
+        """Bring the cache, aggregate index and change log up to date with a write this repository just made.
+
+        ``replaced`` holds ``(old, new)`` pairs of updated expenses. Derived state
+        that was already stale is left alone and gets rebuilt on its next read; a
+        change log that is missing or behind is started over by its next reader.
+        """
+        cache_fresh, index_fresh, log_current = fresh
+        version = self.expense_file_handler.version()
+        to_minor = self.currency.to_minor
+
+        if cleared:
+            if self.change_log is not None and self.change_log.exists():
+                # A clear entry is right whatever the log missed before it.
+                self.change_log.clear(version)
+        elif log_current:
+            self.change_log.append(change_entries(added, removed, replaced), version)
+
+        if self.cache is not None:
+            if expenses is not None:
+                self.cache.put(version, expenses)
+            elif cache_fresh:
+                for expense in added:
+                    self.cache.append(version, expense)
+                for expense in removed:
+                    self.cache.remove(version, expense.id)
+                for _, expense in replaced:
+                    self.cache.append(version, expense)
+
+        if self.aggregate_index is not None:
+            if cleared:
+                self.aggregate_index.clear(version)
+            elif expenses is not None and not index_fresh:
+                # A full rewrite already has every expense in memory, so rebuilding is cheap.
+                self.aggregate_index.rebuild(((expense.date, expense.category, to_minor(expense.amount))
+                                              for expense in expenses), version,
+                                             max((expense.id for expense in expenses), default=0))
+            elif index_fresh:
+                exact = True
+                for expense in [*added, *(new for _, new in replaced)]:
+                    self.aggregate_index.add(expense.date, expense.category, to_minor(expense.amount))
+                for expense in [*removed, *(old for old, _ in replaced)]:
+                    exact = self.aggregate_index.remove(expense.date, expense.category,
+                                                        to_minor(expense.amount)) and exact
+                if exact:
+                    self.aggregate_index.set_version(version)
+                    self._track_last_id(added, removed, expenses)
+                else:
+                    self.aggregate_index.invalidate()
+            else:
+                return
+            self.aggregate_index.save()
+
+    def _track_last_id(self, added: List[Expense], removed: List[Expense],
+                       expenses: Optional[List[Expense]]) -> None:
+        """Keep the aggregate index's highest id in step with a write it was current for."""
+        index = self.aggregate_index
+        if expenses is not None:
+            index.last_id = max((expense.id for expense in expenses), default=0)
+        elif index.last_id is not None:
+            if any(expense.id == index.last_id for expense in removed):
+                index.last_id = None
+            else:
+                index.last_id = max([index.last_id] + [expense.id for expense in added])
+
     def _save_expense(self, expenses: List[Expense]):
-        data: List[Dict] = [expense.model_dump() for expense in expenses]
-        self.expense_file_handler.write(data)
+        self.expense_file_handler.write(self._dump_expenses(expenses))
+
+    def _dump_expenses(self, expenses: List[Expense], replace_all: bool = True) -> List[Dict]:
+        """The stored form of each expense, reusing earlier dumps of unchanged cached expenses.
+
+        The same dict objects let the file handler reuse their encoded text as well.
+        ``replace_all`` means ``expenses`` is everything stored, so other dumps can be dropped.
+        """
+        with METRICS.timer("repository.serialise"):
+            if self.cache is None:
+                data = [self._record(expense) for expense in expenses]
+                METRICS.count("repository.rows_serialised", len(data))
+                return data
+            dumped = {} if replace_all else self._dumped
+            data = []
+            for expense in expenses:
+                entry = self._dumped.get(expense.id)
+                if entry is None or entry[0] is not expense:
+                    METRICS.count("repository.rows_serialised")
+                    entry = (expense, self._record(expense))
+                dumped[expense.id] = entry
+                data.append(entry[1])
+            self._dumped = dumped
+        return data
+
+
+class ExpenseSqliteRepository(ExpenseRepositoryInterface):
+    """Stores expenses in SQLite so filters and totals run as indexed SQL queries.
+
+    Dates are kept as ISO-8601 text, which sorts chronologically, so month
+    lookups become range scans on the ``date`` index. Amounts are INTEGER
+    minor units, so SUM is exact; databases created before that keep a REAL
+    column until ``migrate_amounts`` rebuilds the table.
+    """
+
+    _COLUMNS = "id, date, amount, description, category"
+
+    def __init__(self, database_path: str, logger=LOGGER, verify: bool = False,
+                 currency: Optional[LedgerCurrency] = None):
+        self.database_path = database_path
+        self.logger = logger
+        self.verify = verify
+        self.currency = currency or LedgerCurrency()
+        # Callers such as ExecutorExpenseRepository use the connection from one worker thread at a time.
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self._create_schema()
+        self._minor_units = self._amount_is_integer()
+
+    def add_expense(self, new_expense: Expense) -> Expense:
+        round_amounts([new_expense], self.currency)
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO expenses (date, amount, description, category) VALUES (?, ?, ?, ?)",
+                (new_expense.date.isoformat(), self._stored_amount(new_expense), new_expense.description,
+                 new_expense.category),
+            )
+            new_expense.id = cursor.lastrowid
+            self._log_changes(change_entries(added=[new_expense]))
+        self.logger.info("Expense added successfully (ID: %s)", new_expense.id)
+        return new_expense
+
+    def add_expenses(self, new_expenses: List[Expense]) -> List[Expense]:
+        round_amounts(new_expenses, self.currency)
+        with self.connection:
+            last_id = self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM expenses").fetchone()[0]
+            for offset, expense in enumerate(new_expenses, start=1):
+                expense.id = last_id + offset
+            self.connection.executemany(
+                f"INSERT INTO expenses ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                ((expense.id, expense.date.isoformat(), self._stored_amount(expense), expense.description,
+                  expense.category) for expense in new_expenses),
+            )
+            self._log_changes(change_entries(added=new_expenses))
+        self.logger.info("Added %s expenses", len(new_expenses))
+        return new_expenses
+
+    def get_all_expenses(self) -> List[Expense]:
+        with METRICS.timer("sqlite.read"):
+            rows = self.connection.execute(f"SELECT {self._COLUMNS} FROM expenses ORDER BY id").fetchall()
+        with METRICS.timer("repository.decode"):
+            expenses = [self._to_expense(row) for row in rows]
+        METRICS.count("repository.rows_decoded", len(expenses))
+        return expenses
+
+    def get_all_expenses_by_category(self, category: str) -> List[Expense]:
+        rows = self.connection.execute(
+            f"SELECT {self._COLUMNS} FROM expenses WHERE category = ? ORDER BY id", (category,)
+        )
+        return [self._to_expense(row) for row in rows]
+
+    def version(self) -> Optional[Tuple]:
+        # data_version moves when other connections commit; total_changes counts our own writes.
+        data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self.connection.total_changes
+
+    def memory_footprint(self) -> int:
+        # SQLite's page cache grows up to cache_size (pages, or KiB when negative) but never beyond the database.
+        cache_size = self.connection.execute("PRAGMA cache_size").fetchone()[0]
+        if cache_size < 0:
+            limit = -cache_size * 1024
+        else:
+            limit = cache_size * self.connection.execute("PRAGMA page_size").fetchone()[0]
+        return min(limit, os.path.getsize(self.database_path)) if os.path.exists(self.database_path) else 0
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get_expense_table(self) -> ExpenseTable:
+        rows = self.connection.execute("SELECT id, description, amount, category, date FROM expenses ORDER BY id")
+        table = ExpenseTable(self.currency)
+        minor = self.currency.minor
+        for expense_id, description, amount, category, date in rows:
+            table.append(expense_id, description, minor(amount), category, date)
+        return table
+
+    def get_expense(self, expense_id: int) -> Expense:
+        row = self.connection.execute(f"SELECT {self._COLUMNS} FROM expenses WHERE id = ?", (expense_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Expense with ID {expense_id} not found.")
+        return self._to_expense(row)
+
+    def update_expense(self, expense: Expense) -> Expense:
+        round_amounts([expense], self.currency)
+        with self.connection:
+            cursor = self.connection.execute(
+                "UPDATE expenses SET date = ?, amount = ?, description = ?, category = ? WHERE id = ?",
+                (expense.date.isoformat(), self._stored_amount(expense), expense.description, expense.category,
+                 expense.id),
+            )
+            if cursor.rowcount:
+                self._log_changes([("update", expense.id, expense.model_dump())])
+        if cursor.rowcount == 0:
+            raise ValueError(f"Expense with ID {expense.id} not found.")
+        self.logger.info("Updated the Expense with ID: %s", expense.id)
+        return expense
+
+    def delete_expense(self, expense_id: int) -> None:
+        with self.connection:
+            cursor = self.connection.execute("DELETE FROM expenses WHERE id = ?", (expense_id,))
+            if cursor.rowcount:
+                self._log_changes([("delete", expense_id, None)])
+        if cursor.rowcount == 0:
+            raise ValueError(f"Expense with ID {expense_id} not found.")
+        self.logger.info("Deleted the Expense with ID: %s", expense_id)
+
+    def total_expense(self) -> float:
+        return self.currency.from_minor(
+            self.connection.execute(f"SELECT COALESCE(SUM({self._minor_amount}), 0) FROM expenses").fetchone()[0])
+
+    def total_expense_by_month(self, month: int, year: Optional[int] = None) -> float:
+        start, end = month_bounds(year or datetime.now().year, month)
+        return self.currency.from_minor(self.connection.execute(
+            f"SELECT COALESCE(SUM({self._minor_amount}), 0) FROM expenses WHERE date >= ? AND date < ?",
+            (start.isoformat(), end.isoformat()),
+        ).fetchone()[0])
+
+    def expense_summary(self, year: Optional[int] = None, month: Optional[int] = None,
+                        category: Optional[str] = None, start_month: Optional[Tuple[int, int]] = None,
+                        end_month: Optional[Tuple[int, int]] = None) -> ExpenseSummary:
+        conditions, parameters = [], []
+        if year is not None:
+            # Year and month filters become ranges on the date index where possible.
+            start, end = month_bounds(year, month) if month is not None else (datetime(year, 1, 1),
+                                                                             datetime(year + 1, 1, 1))
+            conditions.append("date >= ? AND date < ?")
+            parameters.extend([start.isoformat(), end.isoformat()])
+        elif month is not None:
+            conditions.append("CAST(substr(date, 6, 2) AS INTEGER) = ?")
+            parameters.append(month)
+        if category is not None:
+            conditions.append("category = ?")
+            parameters.append(category)
+        if start_month is not None:
+            conditions.append("date >= ?")
+            parameters.append(month_bounds(*start_month)[0].isoformat())
+        if end_month is not None:
+            conditions.append("date < ?")
+            parameters.append(month_bounds(*end_month)[1].isoformat())
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        amount = self._minor_amount
+        total, count, minimum, maximum = self.connection.execute(
+            f"SELECT COALESCE(SUM({amount}), 0), COUNT(*), MIN({amount}), MAX({amount}) FROM expenses{where}",
+            parameters
+        ).fetchone()
+        from_minor = self.currency.from_minor
+        return ExpenseSummary(total=from_minor(total), count=count,
+                              minimum=None if minimum is None else from_minor(minimum),
+                              maximum=None if maximum is None else from_minor(maximum))
+
+    def export_expenses_to_csv(self, file_path: str, category: Optional[str] = None, month: Optional[int] = None,
+                               year: Optional[int] = None, compress: bool = False) -> None:
+        conditions, parameters = [], []
+        if category:
+            conditions.append("category = ?")
+            parameters.append(category)
+        if month:
+            start, end = month_bounds(year or datetime.now().year, month)
+            conditions.append("date >= ? AND date < ?")
+            parameters.extend([start.isoformat(), end.isoformat()])
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.connection.execute(
+            f"SELECT id, description, category, amount, date FROM expenses{where} ORDER BY id", parameters
+        )
+        decode = self.currency.decode
+        rows = ([expense_id, description, category, decode(amount), datetime.fromisoformat(date)]
+                for expense_id, description, category, amount, date in cursor)
+        write_csv_rows(rows, file_path, compress)
+
+    def clear_all_expenses(self) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM expenses")
+            # AUTOINCREMENT never reuses a sequence, so the clear still comes after every earlier change.
+            self.connection.execute("DELETE FROM expense_changes")
+            self._log_changes([("clear", None, None)])
+
+    def migrate_from(self, file_handler: FileHandlerInterface, currency: Optional[LedgerCurrency] = None) -> int:
+        """Copy every record from a file-based store, keeping ids. Returns the number of rows copied.
+
+        ``currency`` is the source's, when its amounts are minor units at another scale.
+        """
+        source = currency or self.currency
+        rows = [
+            (record["id"], self._date_to_text(record["date"]), self._column_amount(source.decode(record["amount"])),
+             record["description"], record.get("category"))
+            for record in file_handler.read()
+        ]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO expenses ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._log_changes(("add", row[0], self._change_record(row)) for row in rows)
+        self.logger.info("Migrated %s expenses into %s", len(rows), self.database_path)
+        return len(rows)
+
+    def migrate_amounts(self, currency: LedgerCurrency) -> int:
+        rows = [(expense_id, date, currency.to_minor(self.currency.decode(amount)), description, category)
+                for expense_id, date, amount, description, category
+                in self.connection.execute(f"SELECT {self._COLUMNS} FROM expenses")]
+        with self.connection:
+            # Recreated rather than updated in place, so the amount column gets INTEGER affinity.
+            self.connection.execute("DROP TABLE expenses")
+            self._create_tables()
+            self.connection.executemany(f"INSERT INTO expenses ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?)", rows)
+            # Rounding to another scale may change amounts, so every expense is logged as updated.
+            self._log_changes(("update", row[0], self._change_record(row, currency)) for row in rows)
+        self.currency, self._minor_units = currency, True
+        self.logger.info("Stored %s amounts in minor units of %s", len(rows), currency.code)
+        return len(rows)
+
+    def changes_since(self, sequence: int) -> Tuple[int, Iterator[ExpenseChange]]:
+        checkpoint = self.connection.execute("SELECT COALESCE(MAX(sequence), 0) FROM expense_changes").fetchone()[0]
+        check_checkpoint(sequence, checkpoint)
+        cursor = self.connection.execute(
+            "SELECT sequence, operation, expense_id, expense FROM expense_changes "
+            "WHERE sequence > ? AND sequence <= ? ORDER BY sequence", (sequence, checkpoint))
+        return checkpoint, (ExpenseChange.from_entry({"seq": seq, "op": operation, "id": expense_id,
+                                                      "expense": json.loads(expense) if expense else None})
+                            for seq, operation, expense_id, expense in cursor)
+
+    def _log_changes(self, entries) -> None:
+        """Record changes in the transaction that makes them, so the feed and the data never disagree."""
+        self.connection.executemany(
+            "INSERT INTO expense_changes (operation, expense_id, expense) VALUES (?, ?, ?)",
+            ((operation, expense_id, json.dumps(expense, cls=DateTimeEncoder) if expense else None)
+             for operation, expense_id, expense in entries))
+
+    def _change_record(self, row, currency: Optional[LedgerCurrency] = None) -> Dict:
+        """A row in ``_COLUMNS`` order as a change log entry records it; ``currency`` stores amounts in minor units."""
+        expense_id, date, amount, description, category = row
+        if currency is None and self._minor_units:
+            currency = self.currency
+        return {"id": expense_id, "date": date, "amount": currency.decode(amount) if currency is not None else amount,
+                "description": description, "category": category}
+
+    def _create_schema(self) -> None:
+        with self.connection:
+            has_changes = self.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expense_changes'").fetchone()
+            self._create_tables()
+            if not has_changes:
+                # A database older than its change log starts the log with every expense it holds.
+                self._minor_units = self._amount_is_integer()
+                self._log_changes(("add", row[0], self._change_record(row)) for row in self.connection.execute(
+                    f"SELECT {self._COLUMNS} FROM expenses ORDER BY id").fetchall())
+
+    def _amount_is_integer(self) -> bool:
+        columns = self.connection.execute("PRAGMA table_info(expenses)").fetchall()
+        return any(name == "amount" and kind.upper() == "INTEGER" for _, name, kind, *_ in columns)
+
+    def _create_tables(self) -> None:
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS expenses ("
+            "id INTEGER PRIMARY KEY, date TEXT NOT NULL, amount INTEGER NOT NULL, "
+            "description TEXT NOT NULL, category TEXT)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses (category)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS expense_changes ("
+            "sequence INTEGER PRIMARY KEY AUTOINCREMENT, operation TEXT NOT NULL, expense_id INTEGER, expense TEXT)"
+        )
+
+    @property
+    def _minor_amount(self) -> str:
+        """SQL for the amount in minor units, so sums are exact before a REAL column is migrated too."""
+        return "amount" if self._minor_units else f"CAST(ROUND(amount * {self.currency.factor}) AS INTEGER)"
+
+    def _stored_amount(self, expense: Expense):
+        """The expense's amount as the amount column stores it."""
+        units = self.currency.to_minor(expense.amount)
+        return units if self._minor_units else self.currency.from_minor(units)
+
+    def _column_amount(self, value):
+        """A stored amount from another store, in either form, as the amount column stores it."""
+        return self.currency.minor(value) if self._minor_units else self.currency.decode(value)
+
+    def iter_expenses(self, category: Optional[str] = None) -> Iterator[Expense]:
+        return self.query_expenses(ExpenseQuery(category=category))
+
+    def query_expenses(self, query: ExpenseQuery) -> Iterator[Expense]:
+        """Runs the whole query in SQL and streams the rows from the cursor."""
+        clauses, params = [], []
+        if query.category is not None:
+            clauses.append("category = ?")
+            params.append(query.category)
+        if query.search:
+            # LIKE ignores case for ASCII letters only.
+            clauses.append("description LIKE ? ESCAPE '\\'")
+            escaped = query.search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        comparison = "<" if query.descending else ">"
+        if query.after is not None:
+            after = parse_cursor(query.after, query.sort)
+            if query.sort == "id":
+                clauses.append(f"id {comparison} ?")
+                params.append(after[0])
+            else:
+                value = self._date_to_text(after[0]) if query.sort == "date" else self._column_amount(after[0])
+                clauses.append(f"({query.sort}, id) {comparison} (?, ?)")
+                params.extend([value, after[1]])
+        direction = "DESC" if query.descending else "ASC"
+        order = f"id {direction}" if query.sort == "id" else f"{query.sort} {direction}, id {direction}"
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.connection.execute(
+            f"SELECT {self._COLUMNS} FROM expenses {where} ORDER BY {order} LIMIT ? OFFSET ?",
+            (*params, -1 if query.limit is None else query.limit, query.offset),
+        )
+        return (self._to_expense(row) for row in rows)
+
+    def _to_expense(self, row) -> Expense:
+        expense_id, date, amount, description, category = row
+        data = {"id": expense_id, "date": date, "amount": amount, "description": description, "category": category}
+        if self.verify:
+            return Expense.model_validate({**data, "amount": self.currency.decode(amount)}, context=STORED_CONTEXT)
+        return Expense.from_storage(data, self.currency)
+
+    @staticmethod
+    def _date_to_text(date) -> str:
+        return date.isoformat() if isinstance(date, datetime) else date
+
+
+class ExpensePartitionedRepository(ExpenseRepositoryInterface):
+    """Keeps one JSON file per month under ``directory``, plus a manifest and an id index.
+
+    An add or delete rewrites only the partition it touches, summaries come
+    from the per-partition aggregates in the manifest, and month filters open
+    only the partitions they name. ``ids.log`` maps every id to its partition,
+    so a delete goes straight to the right file.
+    """
+
+    _PARTITION_FILE = re.compile(r"(\d{4}-\d{2})\.json")
+
+    def __init__(self, directory: str, logger=LOGGER, verify: bool = False,
+                 currency: Optional[LedgerCurrency] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.logger = logger
+        self.verify = verify
+        self.currency = currency or LedgerCurrency()
+        self.manifest = PartitionManifest(os.path.join(directory, "manifest.json"), self.currency.scale)
+        self.id_index = PartitionIdIndex(os.path.join(directory, "ids.log"))
+        self.change_log = ChangeLog(os.path.join(directory, "changes.jsonl"))
+        self._file_lock = FileLock(self.manifest.file_path)
+
+    def add_expense(self, new_expense: Expense) -> Expense:
+        self.add_expenses([new_expense])
+        self.logger.info("Expense added successfully (ID: %s)", new_expense.id)
+        return new_expense
+
+    def add_expenses(self, new_expenses: List[Expense]) -> List[Expense]:
+        round_amounts(new_expenses, self.currency)
+        with self._file_lock.acquire():
+            self.manifest.load()
+            log_current = self.change_log.is_current(self.version())
+            # The id index is written before the manifest, so ids past the part of it the manifest covers
+            # come from a write that crashed in between.
+            last_id = max(self.manifest.last_id, self.id_index.last_id_after(self.manifest.id_log_size))
+            for offset, expense in enumerate(new_expenses, start=1):
+                expense.id = last_id + offset
+            by_partition: Dict[str, List[Expense]] = defaultdict(list)
+            for expense in new_expenses:
+                by_partition[partition_name(expense.date)].append(expense)
+
+            self.manifest.id_log_size = self.id_index.record(
+                [(expense.id, name) for name, group in by_partition.items() for expense in group])
+            for name, group in by_partition.items():
+                self._write_partition(name, self._read_partition(name) + [self._record(expense) for expense in group])
+            self.manifest.last_id = last_id + len(new_expenses)
+            self.manifest.save()
+            if log_current:
+                self.change_log.append(change_entries(added=new_expenses), self.version())
+        if len(new_expenses) != 1:
+            self.logger.info("Added %s expenses", len(new_expenses))
+        return new_expenses
+
+    def get_all_expenses(self) -> List[Expense]:
+        with METRICS.timer("repository.decode"):
+            expenses = [self._load_expense(data) for data in self._iter_records(self._partition_names())]
+        METRICS.count("repository.rows_decoded", len(expenses))
+        return sorted(expenses, key=lambda expense: expense.id)
+
+    def get_all_expenses_by_category(self, category: str) -> List[Expense]:
+        expenses = [self._load_expense(data) for data in self._iter_records(self._partition_names())
+                    if data.get("category") == category]
+        return sorted(expenses, key=lambda expense: expense.id)
+
+    def get_expense(self, expense_id: int) -> Expense:
+        self._refresh()
+        name = self.id_index.lookup(expense_id)
+        data = next((data for data in self._read_partition(name) if data["id"] == expense_id), None) if name else None
+        if data is None:
+            raise ValueError(f"Expense with ID {expense_id} not found.")
+        return self._load_expense(data)
+
+    def update_expense(self, expense: Expense) -> Expense:
+        round_amounts([expense], self.currency)
+        with self._file_lock.acquire():
+            self._refresh()
+            log_current = self.change_log.is_current(self.version())
+            name = self.id_index.lookup(expense.id)
+            records = self._read_partition(name) if name else []
+            remaining = [data for data in records if data["id"] != expense.id]
+            if len(remaining) == len(records):
+                raise ValueError(f"Expense with ID {expense.id} not found.")
+            new_name = partition_name(expense.date)
+            if new_name == name:
+                self._write_partition(name, [self._record(expense) if data["id"] == expense.id else data
+                                             for data in records])
+            else:
+                # A changed month moves the expense to another partition.
+                self.manifest.id_log_size = self.id_index.record([(expense.id, new_name)])
+                self._write_partition(new_name, self._read_partition(new_name) + [self._record(expense)])
+                self._write_partition(name, remaining)
+            self.manifest.save()
+            if log_current:
+                self.change_log.append([("update", expense.id, expense.model_dump())], self.version())
+        self.logger.info("Updated the Expense with ID: %s", expense.id)
+        return expense
+
+    def delete_expense(self, expense_id: int) -> None:
+        with self._file_lock.acquire():
+            self._refresh()
+            log_current = self.change_log.is_current(self.version())
+            name = self.id_index.lookup(expense_id)
+            records = self._read_partition(name) if name else []
+            remaining = [data for data in records if data["id"] != expense_id]
+            if len(remaining) == len(records):
+                raise ValueError(f"Expense with ID {expense_id} not found.")
+            self._write_partition(name, remaining)
+            self.manifest.id_log_size = self.id_index.record([(expense_id, PartitionIdIndex.DELETED)])
+            self.manifest.save()
+            if log_current:
+                self.change_log.append([("delete", expense_id, None)], self.version())
+        self.logger.info("Deleted the Expense with ID: %s", expense_id)
+
+    def total_expense(self) -> float:
+        return self.expense_summary().total
+
+    def total_expense_by_month(self, month: int, year: Optional[int] = None) -> float:
+        return self.expense_summary(year=year or datetime.now().year, month=month).total
+
+    def expense_summary(self, year: Optional[int] = None, month: Optional[int] = None,
+                        category: Optional[str] = None, start_month: Optional[Tuple[int, int]] = None,
+                        end_month: Optional[Tuple[int, int]] = None) -> ExpenseSummary:
+        self.manifest.load()
+        names = self._partition_names(year, month, start_month, end_month)
+        stale = [name for name in names if not self.manifest.is_current(name, self._handler(name).version())]
+        # Aggregates of partitions whose files have gone are dropped as well.
+        existing = set(self._partition_names())
+        stale += [name for name in self.manifest.partitions if name not in existing]
+        if stale:
+            with self._file_lock.acquire():
+                self.manifest.load()
+                in_step = self.change_log.is_current(self.version())
+                for name in stale:
+                    self._write_partition_aggregates(name, self._read_partition(name))
+                self.manifest.save()
+                if in_step:
+                    # Only the aggregates changed, so the log stays in step with the new manifest.
+                    self.change_log.append([], self.version())
+        return ExpenseSummary(**self.manifest.aggregates.query(year, month, category, start_month, end_month))
+
+    def export_expenses_to_csv(self, file_path: str, category: Optional[str] = None, month: Optional[int] = None,
+                               year: Optional[int] = None, compress: bool = False) -> None:
+        # Rows stream one partition at a time, so they come out in month order.
+        names = self._partition_names(year or datetime.now().year, month) if month else self._partition_names()
+        rows = ([data["id"], data["description"], data.get("category"), self.currency.decode(data["amount"]),
+                 datetime.fromisoformat(data["date"])]
+                for data in self._iter_records(names) if not category or data.get("category") == category)
+        write_csv_rows(rows, file_path, compress)
+
+    def get_expense_table(self) -> ExpenseTable:
+        return ExpenseTable.from_records(self._iter_records(self._partition_names()), self.currency)
+
+    def clear_all_expenses(self) -> None:
+        with self._file_lock.acquire():
+            for name in self._partition_names():
+                os.remove(self._handler(name).file_path)
+            self.manifest.load()
+            # Processes holding the old id map see the new generation and read the index from the start.
+            self.manifest.id_generation += 1
+            self.id_index.clear(self.manifest.id_generation)
+            self.manifest.last_id, self.manifest.id_log_size, self.manifest.partitions = 0, 0, {}
+            self.manifest.aggregates.buckets = {}
+            self.manifest.save()
+            if self.change_log.exists():
+                # A clear entry is right whatever the log missed before it.
+                self.change_log.clear(self.version())
+
+    def version(self) -> Optional[Tuple]:
+        try:
+            stat = os.stat(self.manifest.file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def migrate_from(self, file_handler: FileHandlerInterface, currency: Optional[LedgerCurrency] = None) -> int:
+        """Split every record of a single-file store into partitions, keeping ids. Returns the number copied.
+
+        ``currency`` is the source's, when its amounts are minor units at another scale.
+        """
+        by_partition: Dict[str, List[Dict]] = defaultdict(list)
+        for record in file_handler.iter_records():
+            if currency is not None and currency.scale != self.currency.scale:
+                record["amount"] = self.currency.to_minor(currency.decode(record["amount"]))
+            by_partition[partition_name(record["date"])].append(record)
+        with self._file_lock.acquire():
+            self._refresh()
+            log_current = self.change_log.is_current(self.version())
+            last_id = max(self.manifest.last_id, self.id_index.last_id_after(self.manifest.id_log_size))
+            self.manifest.id_log_size = self.id_index.record(
+                [(record["id"], name) for name, records in by_partition.items() for record in records])
+            for name, records in by_partition.items():
+                self._write_partition(name, self._read_partition(name) + records)
+            self.manifest.last_id = max([last_id] + [record["id"] for records in by_partition.values()
+                                                     for record in records])
+            self.manifest.save()
+            if log_current:
+                self.change_log.append([("add", record["id"], self._load_expense(record).model_dump())
+                                        for records in by_partition.values() for record in records], self.version())
+        migrated = sum(len(records) for records in by_partition.values())
+        self.logger.info("Migrated %s expenses into %s", migrated, self.directory)
+        return migrated
+
+    def migrate_amounts(self, currency: LedgerCurrency) -> int:
+        converted = 0
+        with self._file_lock.acquire():
+            log_current = self.change_log.is_current(self.version())
+            updated = []
+            previous, self.currency = self.currency, currency
+            # At a new scale, loading the manifest drops the old aggregates; each rewrite recomputes its own.
+            self.manifest.scale = currency.scale
+            self._refresh()
+            for name in self._partition_names():
+                records = self._read_partition(name)
+                for data in records:
+                    data["amount"] = currency.to_minor(previous.decode(data["amount"]))
+                self._write_partition(name, records)
+                updated += [("update", data["id"], self._load_expense(data).model_dump()) for data in records]
+                converted += len(records)
+            self.manifest.save()
+            if log_current:
+                self.change_log.append(updated, self.version())
+        self.logger.info("Stored %s amounts in minor units of %s", converted, currency.code)
+        return converted
+
+    def changes_since(self, sequence: int) -> Tuple[int, Iterator[ExpenseChange]]:
+        with self._file_lock.acquire():
+            self._sync_change_log()
+        return read_changes(self.change_log, sequence)
+
+    def _sync_change_log(self) -> None:
+        """Start a missing change log, or start it over if the data changed without it. Call under the lock.
+
+        The manifest is saved after every write, so its version stands for the whole ledger. Only readers
+        of the feed do this; writes leave such a log alone, so they never pay for the rebuild.
+        """
+        version = self.version()
+        if not self.change_log.is_current(version):
+            self.change_log.seed((expense.model_dump() for expense in self.get_all_expenses()), version)
+
+    def _refresh(self) -> None:
+        self.manifest.load()
+        self.id_index.refresh(self.manifest.id_generation)
+
+    def _handler(self, name: str) -> JSONFileHandler:
+        return JSONFileHandler(os.path.join(self.directory, f"{name}.json"))
+
+    def _partition_names(self, year: Optional[int] = None, month: Optional[int] = None,
+                         start_month: Optional[Tuple[int, int]] = None,
+                         end_month: Optional[Tuple[int, int]] = None) -> List[str]:
+        names = []
+        for file_name in sorted(os.listdir(self.directory)):
+            match = self._PARTITION_FILE.fullmatch(file_name)
+            if match is None:
+                continue
+            partition_year, partition_month_number = partition_month(match.group(1))
+            if year is not None and partition_year != year:
+                continue
+            if month is not None and partition_month_number != month:
+                continue
+            if start_month is not None and (partition_year, partition_month_number) < tuple(start_month):
+                continue
+            if end_month is not None and (partition_year, partition_month_number) > tuple(end_month):
+                continue
+            names.append(match.group(1))
+        return names
+
+    def _read_partition(self, name: str) -> List[Dict]:
+        handler = self._handler(name)
+        return handler.read() if os.path.exists(handler.file_path) else []
+
+    def _iter_records(self, names: List[str]) -> Iterator[Dict]:
+        return chain.from_iterable(self._handler(name).iter_records() for name in names)
+
+    def _write_partition(self, name: str, records: List[Dict]) -> None:
+        handler = self._handler(name)
+        if records:
+            handler.write(records)
+        elif os.path.exists(handler.file_path):
+            os.remove(handler.file_path)
+        self._write_partition_aggregates(name, records)
+
+    def _write_partition_aggregates(self, name: str, records: List[Dict]) -> None:
+        # The whole partition is in memory already, so recomputing its aggregates keeps min/max exact.
+        minor = self.currency.minor
+        self.manifest.set_partition(name, self._handler(name).version(),
+                                    ((data["date"], data.get("category"), minor(data["amount"])) for data in records))
+
+    def _load_expense(self, data: Dict) -> Expense:
+        if self.verify:
+            return Expense.model_validate({**data, "amount": self.currency.decode(data["amount"])},
+                                          context=STORED_CONTEXT)
+        return Expense.from_storage(data, self.currency)
+
+    def _record(self, expense: Expense) -> Dict:
+        return stored_record(expense, self.currency)
+
+
+def stored_record(expense: Expense, currency: LedgerCurrency) -> Dict:
+    """The stored form of ``expense``, with the amount as integer minor units. ``expense`` is left as it is."""
+    record = expense.model_dump()
+    record["amount"] = currency.to_minor(expense.amount)
+    return record
+
+
+def round_amounts(expenses: List[Expense], currency: LedgerCurrency) -> None:
+    """Round the amounts of expenses about to be stored to the minor unit, so they show what is stored."""
+    for expense in expenses:
+        expense.amount = currency.quantize(expense.amount)
+
+
+def change_entries(added: List[Expense] = (), removed: List[Expense] = (),
+                   replaced: List[Tuple[Expense, Expense]] = ()) -> List[Tuple[str, int, Optional[Dict]]]:
+    """Change log entries for one write; ``replaced`` holds ``(old, new)`` pairs of updated expenses."""
+    return ([("update", new.id, new.model_dump()) for _, new in replaced]
+            + [("delete", expense.id, None) for expense in removed]
+            + [("add", expense.id, expense.model_dump()) for expense in added])
+
+
+def check_checkpoint(sequence: int, checkpoint: int) -> None:
+    if not 0 <= sequence <= checkpoint:
+        raise ValueError(f"Invalid checkpoint {sequence}: this ledger's changes run from 0 to {checkpoint}.")
+
+
+def read_changes(change_log: ChangeLog, sequence: int) -> Tuple[int, Iterator[ExpenseChange]]:
+    checkpoint = change_log.last_sequence()
+    check_checkpoint(sequence, checkpoint)
+    return checkpoint, (ExpenseChange.from_entry(entry) for entry in change_log.read(sequence, checkpoint))
+
+
+def month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    """Return the half-open ``[start, end)`` datetime range covering one calendar month."""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def json_indent() -> Optional[int]:
+    """The indent from ``$EXPENSE_TRACKER_JSON_INDENT``, or None for the compact layout."""
+    value = os.environ.get(JSON_INDENT_ENV_VAR)
+    return int(value) if value else None
+
+
+def load_ledger_currency(backend: str, ledger: Optional[str] = None) -> LedgerCurrency:
+    """The currency settings saved next to a ledger, or the defaults."""
+    return LedgerCurrency.load(currency_path(ledger_path(backend, ledger)))
+
+
+def save_ledger_currency(backend: str, currency: LedgerCurrency, ledger: Optional[str] = None) -> None:
+    currency.save(currency_path(ledger_path(backend, ledger)))
+
+
+def create_repository(backend: str, verify: bool = False, cached: bool = False,
+                      ledger: Optional[str] = None) -> ExpenseRepositoryInterface:
+    """Build the repository for one of the names in ``constants.BACKENDS``.
+
+    With ``verify`` set, every row read back is re-validated instead of trusted,
+    and a binary snapshot's checksum is checked whenever it is loaded.
+    ``cached`` keeps decoded expenses in memory, which pays off in long-running processes.
+    ``ledger`` selects a named ledger instead of the default one; a new one starts out empty.
+    """
+    path = ledger_path(backend, ledger)
+    if path != ledger_path(backend):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if backend == "json" and not os.path.exists(path):
+            JSONFileHandler(path).write([])
+    cache = ExpenseCache() if cached else None
+    currency = load_ledger_currency(backend, ledger)
+    if backend in ("json", "journal", "binary"):
+        if backend == "json":
+            handler = JSONFileHandler(path, json_indent(), cache_encoded=cached)
+        elif backend == "journal":
+            handler = JournalFileHandler(path)
+        else:
+            handler = BinaryFileHandler(path, verify_checksum=verify)
+        # The json and journal backends share a data file but not its version, so each keeps its own feed.
+        feed_path = change_log_path(handler.journal_path if backend == "journal" else path)
+        return ExpenseJsonRepository(handler, verify=verify, cache=cache, currency=currency,
+                                     aggregate_index=AggregateIndex(aggregate_index_path(path), currency.scale),
+                                     change_log=ChangeLog(feed_path))
+    if backend == "partitioned":
+        return ExpensePartitionedRepository(path, verify=verify, currency=currency)
+    return ExpenseSqliteRepository(path, verify=verify, currency=currency)
@@ -1,40 +1,178 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from .models import Expense
-from .utils.logger_config import setup_logger
+from .constants import DEFAULT_BACKEND, DEFAULT_LEDGER
+from .currency import LedgerCurrency
+from .metrics import METRICS, timed
+from .models import Expense, ExpenseChange, ExpenseQuery, ExpenseSummary, ReportRow, STORED_CONTEXT
+from .reports import ReportEngine
+from .table import ExpenseTable
+from .importers import FileImportResult, ImportResult, normalise_row, read_import_file, validate_files, validate_rows
+from .utils.csv_export import CHANGES_CSV_HEADER, write_csv_rows
+from .utils.logger_config import get_logger
 from .boundaries import ExpenseRepositoryInterface
 
 
-logger = setup_logger()
+logger = get_logger()
 
 
 class ExpenseService:
 
-    def __init__(self, expense_repository: ExpenseRepositoryInterface):
+    def __init__(self, expense_repository: Optional[ExpenseRepositoryInterface] = None, ledger: Optional[str] = None,
+                 backend: str = DEFAULT_BACKEND):
+        """Work on ``expense_repository``, or else open ``ledger`` (the default one if not given) of ``backend``.
+
+        Processes serving many ledgers get their services from a LedgerRegistry instead.
+        """
+        if expense_repository is None:
+            from .repositories import create_repository
+            expense_repository = create_repository(backend, ledger=ledger)
+        self.ledger = ledger or DEFAULT_LEDGER
         self.repository = expense_repository
+        self.reports = ReportEngine(expense_repository)
 
+    @timed("service.add_expense")
     def add_expense(self, description: str, amount: float, category: str | None='',
-                    date_time: datetime=datetime.now()) -> Expense:
-        return self.repository.add_expense(Expense(description=description, amount=amount,
-                                                          category=category, date=date_time))
+                    date_time: Optional[datetime] = None) -> Expense:
+        return self.repository.add_expense(self.new_expense(description, amount, category, date_time))
+
+    @staticmethod
+    def new_expense(description: str, amount: float, category: str | None = '',
+                    date_time: Optional[datetime] = None) -> Expense:
+        """Validate a new expense without storing it. The date defaults to the time of the call."""
+        METRICS.count("validation.rows")
+        with METRICS.timer("validation"):
+            return Expense(description=description, amount=amount, category=category,
+                           date=date_time or datetime.now())
+
+
+    @timed("service.add_expenses")
+    def add_expenses(self, rows: Iterable[Dict], batch_size: int = 1000) -> ImportResult:
+        """Validate ``rows`` in batches and store the valid ones in a single write.
+
+        Errors are reported by 1-based row position and do not stop the import.
+        """
+        return self._import_rows(enumerate(map(normalise_row, rows), start=1), batch_size)
 
+    @timed("service.import_expenses")
+    def import_expenses(self, file_path: str, file_format: Optional[str] = None,
+                        batch_size: int = 1000) -> ImportResult:
+        """Import a CSV or JSON-lines file; errors are reported by line number."""
+        return self._import_rows(read_import_file(file_path, file_format), batch_size)
 
+    @timed("service.import_files")
+    def import_files(self, file_paths: List[str], file_format: Optional[str] = None, workers: int = 1,
+                     batch_size: int = 1000, chunk_bytes: int = 1 << 20) -> List[FileImportResult]:
+        """Import several files in one write, validating them in ``workers`` processes.
+
+        Ids follow file order, then line order. Errors are reported per file.
+        """
+        expenses, results = validate_files(file_paths, file_format, workers, chunk_bytes, batch_size)
+        if expenses:
+            self.repository.add_expenses(expenses)
+        return results
+
+    def _import_rows(self, numbered_rows, batch_size: int) -> ImportResult:
+        expenses, errors = validate_rows(numbered_rows, batch_size)
+        if expenses:
+            self.repository.add_expenses(expenses)
+        return ImportResult(added=len(expenses), errors=errors)
+
+    @timed("service.list_expenses")
     def list_expenses(self, category: Optional[str]='') -> List[Expense]:
         if category:
             return self.repository.get_all_expenses_by_category(category)
         return self.repository.get_all_expenses()
 
-    def summary(self, month:int=None):
-        if month:
-            return self.repository.total_expense_by_month(month)
-        return self.repository.total_expense()
+    def query_expenses(self, category: Optional[str] = None, search: Optional[str] = None, sort: str = "id",
+                       descending: bool = False, limit: Optional[int] = None, offset: int = 0,
+                       after: Optional[str] = None) -> Iterator[Expense]:
+        """Stream one page of matching expenses; see ExpenseQuery. Rows are read from storage as they are consumed."""
+        query = ExpenseQuery(category=category or None, search=search or None, sort=sort, descending=descending,
+                             limit=limit, offset=offset, after=after)
+        return self.repository.query_expenses(query)
+
+    @timed("service.expense_table")
+    def expense_table(self, category: Optional[str] = None, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> ExpenseTable:
+        """The matching expenses as columns, for analytics over ledgers too large for one model per row."""
+        table = self.repository.get_expense_table()
+        if category or start or end:
+            table = table.where(category or None, start, end)
+        return table
+
+    def summary(self, month: int = None, year: Optional[int] = None, category: Optional[str] = None,
+                start_month: Optional[Tuple[int, int]] = None, end_month: Optional[Tuple[int, int]] = None) -> float:
+        return self.summary_details(month, year, category, start_month, end_month).total
 
+    @timed("service.summary_details")
+    def summary_details(self, month: int = None, year: Optional[int] = None, category: Optional[str] = None,
+                        start_month: Optional[Tuple[int, int]] = None,
+                        end_month: Optional[Tuple[int, int]] = None) -> ExpenseSummary:
+        """Total, count, min and max of the matching expenses. A month without a year means this year."""
+        if month and not year:
+            year = datetime.now().year
+        return self.repository.expense_summary(year, month or None, category or None, start_month, end_month)
+
+    def report(self, period: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               category: Optional[str] = None, by_category: bool = False) -> Iterator[ReportRow]:
+        """Stream totals per day, week, month or year for expenses dated in ``[start, end)``."""
+        return self.reports.report(period, start, end, category or None, by_category)
+
+    @timed("service.get")
+    def get(self, expense_id: int) -> Expense:
+        return self.repository.get_expense(expense_id)
+
+    @timed("service.update")
+    def update(self, expense_id: int, description: Optional[str] = None, amount: Optional[float] = None,
+               category: Optional[str] = None, date_time: Optional[datetime] = None) -> Expense:
+        """Change the given fields of an expense; the others keep their stored values."""
+        current = self.repository.get_expense(expense_id)
+        return self.repository.update_expense(self.changed_expense(current, description, amount, category, date_time))
+
+    @staticmethod
+    def changed_expense(current: Expense, description: Optional[str] = None, amount: Optional[float] = None,
+                        category: Optional[str] = None, date_time: Optional[datetime] = None) -> Expense:
+        """Validate ``current`` with the given fields replaced, without storing it."""
+        changes = {field: value for field, value in
+                   {"description": description, "amount": amount, "category": category, "date": date_time}.items()
+                   if value is not None}
+        # An unchanged date is not held to the window that applies to new entries.
+        context = None if date_time is not None else STORED_CONTEXT
+        return Expense.model_validate({**current.model_dump(), **changes}, context=context)
+
+    @timed("service.delete")
     def delete(self, expense_id: int) -> None:
         self.repository.delete_expense(expense_id)
 
+    @timed("service.clear_all_expenses")
     def clear_all_expenses(self) -> None:
         self.repository.clear_all_expenses()
 
-    def export_expenses_to_csv(self, file_path: str) -> None:
-        self.repository.export_expenses_to_csv(file_path)
\ No newline at end of file
+    @timed("service.migrate_amounts")
+    def migrate_amounts(self, currency: LedgerCurrency) -> int:
+        """Store every amount as integer minor units of ``currency``. Returns the number of expenses."""
+        return self.repository.migrate_amounts(currency)
+
+    @timed("service.export_expenses_to_csv")
+    def export_expenses_to_csv(self, file_path: str, category: Optional[str] = None, month: Optional[int] = None,
+                               year: Optional[int] = None, compress: bool = False) -> None:
+        self.repository.export_expenses_to_csv(file_path, category, month, year, compress)
+
+    def changes_since(self, sequence: int = 0) -> Tuple[int, Iterator[ExpenseChange]]:
+        """The new checkpoint, and a stream of the adds, updates and tombstones after checkpoint ``sequence``.
+
+        Start from 0 for everything. Changes are read as they are consumed; only
+        those after ``sequence`` are ever read.
+        """
+        return self.repository.changes_since(sequence)
+
+    @timed("service.export_changes_to_csv")
+    def export_changes_to_csv(self, file_path: str, sequence: int = 0, compress: bool = False) -> Tuple[int, int]:
+        """Write the changes after checkpoint ``sequence`` as CSV. Returns the new checkpoint and the rows written."""
+        checkpoint, changes = self.repository.changes_since(sequence)
+        rows = ([change.sequence, change.operation, change.expense_id,
+                 *([change.expense.description, change.expense.category, change.expense.amount, change.expense.date]
+                   if change.expense is not None else [None, None, None, None])]
+                for change in changes)
+        return checkpoint, write_csv_rows(rows, file_path, compress, CHANGES_CSV_HEADER)
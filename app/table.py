@@ -0,0 +1,181 @@
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .currency import LedgerCurrency
+from .models import Expense
+from .utils.timestamps import from_timestamp, to_timestamp
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; every operation has a pure-Python fallback.
+    numpy = None
+
+
+class ExpenseTable:
+    """Expenses held column by column instead of one model per row.
+
+    Ids, amounts (integer minor units of ``currency``) and timestamps
+    (microseconds since the epoch) are packed ``array`` columns, so sums
+    are exact. Categories are dictionary-encoded: ``category_codes`` holds
+    one small int per row pointing into ``categories``. Filters and
+    aggregations run on whole columns, through NumPy when it is installed.
+    """
+
+    def __init__(self, currency: Optional[LedgerCurrency] = None):
+        self.currency = currency or LedgerCurrency()
+        self.ids = array("q")
+        self.amounts = array("q")
+        self.timestamps = array("q")
+        self.category_codes = array("i")
+        self.categories: List[Optional[str]] = []
+        self.descriptions: List[str] = []
+        self._category_lookup: Dict[Optional[str], int] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], currency: Optional[LedgerCurrency] = None) -> "ExpenseTable":
+        """Build a table straight from stored dicts without creating any models."""
+        table = cls(currency)
+        minor = table.currency.minor
+        for record in records:
+            table.append(record["id"], record["description"], minor(record["amount"]), record.get("category"),
+                         record["date"])
+        return table
+
+    @classmethod
+    def from_columns(cls, ids, amounts, timestamps, category_codes, categories: List[Optional[str]],
+                     descriptions, currency: Optional[LedgerCurrency] = None) -> "ExpenseTable":
+        """Wrap existing columns, such as the memory-mapped views of a binary snapshot, without copying."""
+        table = cls(currency)
+        if (amounts.typecode if isinstance(amounts, array) else amounts.format) != "q":
+            # Older snapshots hold float amounts in major units; only those are copied.
+            amounts = array("q", map(table.currency.minor, amounts))
+        table.ids, table.amounts, table.timestamps = ids, amounts, timestamps
+        table.category_codes, table.descriptions = category_codes, descriptions
+        table.categories = list(categories)
+        table._category_lookup = {category: code for code, category in enumerate(table.categories)}
+        return table
+
+    @classmethod
+    def from_expenses(cls, expenses: Iterable[Expense], currency: Optional[LedgerCurrency] = None) -> "ExpenseTable":
+        table = cls(currency)
+        to_minor = table.currency.to_minor
+        for expense in expenses:
+            table.append(expense.id, expense.description, to_minor(expense.amount), expense.category, expense.date)
+        return table
+
+    def append(self, expense_id: int, description: str, amount: int, category: Optional[str], date) -> None:
+        """Add one row; ``amount`` is in minor units."""
+        self.ids.append(expense_id)
+        self.descriptions.append(description)
+        self.amounts.append(amount)
+        self.category_codes.append(self._category_code(category))
+        self.timestamps.append(to_timestamp(date))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Expense]:
+        """Yield one Expense view per row, built only when it is reached."""
+        for row in range(len(self)):
+            yield self.expense(row)
+
+    def expense(self, row: int) -> Expense:
+        return Expense.model_construct(id=self.ids[row], description=self.descriptions[row],
+                                       amount=self.currency.from_minor(self.amounts[row]),
+                                       category=self.categories[self.category_codes[row]],
+                                       date=from_timestamp(self.timestamps[row]))
+
+    def where(self, category: Optional[str] = None, start: Optional[datetime] = None,
+              end: Optional[datetime] = None) -> "ExpenseTable":
+        """Rows in ``category`` dated in the half-open range ``[start, end)``; unset filters match everything."""
+        code = None
+        if category is not None:
+            if category not in self._category_lookup:
+                return self.take([])
+            code = self._category_lookup[category]
+        low = to_timestamp(start) if start is not None else None
+        high = to_timestamp(end) if end is not None else None
+
+        if numpy is not None:
+            mask = numpy.ones(len(self), dtype=bool)
+            if code is not None:
+                mask &= numpy.frombuffer(self.category_codes, dtype=numpy.intc) == code
+            timestamps = numpy.frombuffer(self.timestamps, dtype=numpy.int64)
+            if low is not None:
+                mask &= timestamps >= low
+            if high is not None:
+                mask &= timestamps < high
+            return self.take(numpy.flatnonzero(mask).tolist())
+
+        rows = range(len(self))
+        if code is not None:
+            codes = self.category_codes
+            rows = [row for row in rows if codes[row] == code]
+        if low is not None or high is not None:
+            timestamps = self.timestamps
+            low = low if low is not None else -(1 << 63)
+            high = high if high is not None else (1 << 63) - 1
+            rows = [row for row in rows if low <= timestamps[row] < high]
+        return self if isinstance(rows, range) else self.take(rows)
+
+    def take(self, rows: List[int]) -> "ExpenseTable":
+        """A new table holding only the given row positions, in that order."""
+        table = ExpenseTable(self.currency)
+        table.ids = array("q", [self.ids[row] for row in rows])
+        table.amounts = array("q", [self.amounts[row] for row in rows])
+        table.timestamps = array("q", [self.timestamps[row] for row in rows])
+        table.category_codes = array("i", [self.category_codes[row] for row in rows])
+        table.descriptions = [self.descriptions[row] for row in rows]
+        # Codes stay valid because the category table is shared, not re-encoded.
+        table.categories = list(self.categories)
+        table._category_lookup = dict(self._category_lookup)
+        return table
+
+    def total(self) -> float:
+        if numpy is not None:
+            return self.currency.from_minor(int(numpy.frombuffer(self.amounts, dtype=numpy.int64).sum()))
+        return self.currency.from_minor(sum(self.amounts))
+
+    # Grouped sums accumulate into int64 with numpy.add.at; numpy.bincount would sum the weights as float64.
+
+    def sum_by_category(self) -> Dict[Optional[str], float]:
+        from_minor = self.currency.from_minor
+        if numpy is not None:
+            codes = numpy.frombuffer(self.category_codes, dtype=numpy.intc)
+            amounts = numpy.frombuffer(self.amounts, dtype=numpy.int64)
+            sums = numpy.zeros(len(self.categories), dtype=numpy.int64)
+            numpy.add.at(sums, codes, amounts)
+            counts = numpy.bincount(codes, minlength=len(self.categories))
+            return {self.categories[code]: from_minor(int(sums[code])) for code in numpy.flatnonzero(counts)}
+
+        sums: Dict[int, int] = {}
+        for code, amount in zip(self.category_codes, self.amounts):
+            sums[code] = sums.get(code, 0) + amount
+        return {self.categories[code]: from_minor(total) for code, total in sums.items()}
+
+    def sum_by_month(self) -> Dict[Tuple[int, int], float]:
+        from_minor = self.currency.from_minor
+        if numpy is not None:
+            months = numpy.frombuffer(self.timestamps, dtype=numpy.int64).astype("datetime64[us]") \
+                .astype("datetime64[M]").astype(numpy.int64)
+            keys, inverse = numpy.unique(months, return_inverse=True)
+            sums = numpy.zeros(len(keys), dtype=numpy.int64)
+            numpy.add.at(sums, inverse.ravel(), numpy.frombuffer(self.amounts, dtype=numpy.int64))
+            # datetime64[M] counts months since 1970-01.
+            return {(1970 + int(key) // 12, int(key) % 12 + 1): from_minor(int(total))
+                    for key, total in zip(keys, sums)}
+
+        sums: Dict[Tuple[int, int], int] = {}
+        for timestamp, amount in zip(self.timestamps, self.amounts):
+            date = from_timestamp(timestamp)
+            key = (date.year, date.month)
+            sums[key] = sums.get(key, 0) + amount
+        return {key: from_minor(total) for key, total in sums.items()}
+
+    def _category_code(self, category: Optional[str]) -> int:
+        code = self._category_lookup.get(category)
+        if code is None:
+            code = self._category_lookup[category] = len(self.categories)
+            self.categories.append(category)
+        return code
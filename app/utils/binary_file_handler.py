@@ -0,0 +1,242 @@
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.boundaries import ColumnarFileHandlerInterface
+from app.metrics import METRICS
+from app.utils.file_lock import FileLock
+from app.utils.timestamps import from_timestamp, to_timestamp
+
+MAGIC = b"EXPB"
+FORMAT_VERSION = 2
+# Format 1 always stored float amounts; it has no FLAG_INTEGER_AMOUNTS.
+READABLE_FORMAT_VERSIONS = (1, FORMAT_VERSION)
+# magic, format version, flags, rows, categories, heap size, crc32 of everything after the header, padding.
+HEADER = struct.Struct("<4sHHQQQII")
+# Set when the id column is strictly increasing, so an id can be found by binary search.
+FLAG_SORTED_IDS = 1
+# Set when every amount is an integer (minor units), stored as int64 instead of float64.
+FLAG_INTEGER_AMOUNTS = 2
+
+
+class StringColumn(Sequence):
+    """One string per row, decoded from the heap only when it is indexed."""
+
+    def __init__(self, heap: memoryview, offsets: memoryview):
+        self._heap = heap
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        if row < 0:
+            row += len(self)
+        return str(self._heap[self._offsets[row]:self._offsets[row + 1]], "utf-8")
+
+
+class BinarySnapshot:
+    """Columns of a snapshot file, as zero-copy views into its memory map.
+
+    ``ids`` and ``timestamps`` (microseconds since the epoch) are int64,
+    ``amounts`` int64 minor units (float64 major units in snapshots of older
+    ledgers) and ``category_codes`` int32 indexes into
+    ``categories``, whose first entry is always None for uncategorised rows.
+    """
+
+    def __init__(self, ids, timestamps, amounts, category_codes, categories: List[Optional[str]],
+                 descriptions: StringColumn, sorted_ids: bool = False):
+        self.ids = ids
+        self.sorted_ids = sorted_ids
+        self.timestamps = timestamps
+        self.amounts = amounts
+        self.category_codes = category_codes
+        self.categories = categories
+        self.descriptions = descriptions
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def find(self, record_id: int) -> Optional[int]:
+        """Row holding ``record_id``, or None. O(log N) when the ids are sorted."""
+        if self.sorted_ids:
+            row = bisect_left(self.ids, record_id)
+            return row if row < len(self.ids) and self.ids[row] == record_id else None
+        for row, stored_id in enumerate(self.ids):
+            if stored_id == record_id:
+                return row
+        return None
+
+    def record(self, row: int) -> Dict:
+        return {"id": self.ids[row], "date": from_timestamp(self.timestamps[row]).isoformat(),
+                "amount": self.amounts[row], "description": self.descriptions[row],
+                "category": self.categories[self.category_codes[row]]}
+
+
+class BinaryFileHandler(ColumnarFileHandlerInterface):
+    """Stores the ledger as a versioned, checksummed columnar snapshot.
+
+    The file is a fixed header followed by the id, timestamp and amount
+    columns, string offsets, category codes and a UTF-8 string heap holding
+    descriptions and the category table. Reading maps the file into memory,
+    so summaries and range scans only touch the columns they use. Writes
+    replace the whole file atomically, as in JSONFileHandler. A missing file
+    reads as an empty ledger.
+
+    Checking the checksum reads the whole body, so loads only do it with
+    ``verify_checksum`` set: when converting and when asked to verify.
+    """
+
+    def __init__(self, file_path: str, verify_checksum: bool = False):
+        self.file_path = file_path
+        self.verify_checksum = verify_checksum
+        self._file_lock = FileLock(file_path)
+        self._snapshot: Optional[BinarySnapshot] = None
+        self._snapshot_version: Optional[Tuple] = None
+
+    def read(self) -> List[Dict]:
+        return self.read_versioned()[1]
+
+    def read_versioned(self) -> Tuple[Optional[Tuple], List[Dict]]:
+        version, snapshot = self._load()
+        return version, [snapshot.record(row) for row in range(len(snapshot))]
+
+    def iter_records(self) -> Iterator[Dict]:
+        snapshot = self.columns()
+        for row in range(len(snapshot)):
+            yield snapshot.record(row)
+
+    def columns(self) -> BinarySnapshot:
+        return self._load()[1]
+
+    def lock(self) -> ContextManager:
+        return self._file_lock.acquire()
+
+    def write(self, data: List[Dict]) -> None:
+        directory, name = os.path.split(os.path.abspath(self.file_path))
+        with METRICS.timer("binary.encode"):
+            payload = self.encode(data)
+        METRICS.count("binary.bytes_written", len(payload))
+        with self.lock():
+            try:
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as file:
+                        file.write(payload)
+                        file.flush()
+                        os.fsync(file.fileno())
+                    os.replace(temp_path, self.file_path)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.unlink(temp_path)
+                    raise
+            except IOError as e:
+                raise IOError(f"Failed to write to {self.file_path}: {e}")
+
+    def version(self) -> Optional[Tuple]:
+        try:
+            return self._stat_key(os.stat(self.file_path))
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def encode(data: List[Dict]) -> bytes:
+        ids, timestamps, amounts = array("q"), array("q"), []
+        codes, description_offsets, category_offsets = array("i"), array("Q", [0]), array("Q")
+        heap = bytearray()
+        # Code 0 is reserved for "no category"; it has no entry in the stored category table.
+        category_codes: Dict[Optional[str], int] = {None: 0}
+
+        for record in data:
+            ids.append(record["id"])
+            timestamps.append(to_timestamp(record["date"]))
+            amounts.append(record["amount"])
+            codes.append(category_codes.setdefault(record.get("category"), len(category_codes)))
+            heap += record["description"].encode("utf-8")
+            description_offsets.append(len(heap))
+
+        category_offsets.append(len(heap))
+        for category in list(category_codes)[1:]:
+            heap += category.encode("utf-8")
+            category_offsets.append(len(heap))
+
+        integer_amounts = all(type(amount) is int for amount in amounts)
+        amounts = array("q" if integer_amounts else "d", amounts)
+        # Eight-byte columns come first so every column stays aligned.
+        body = b"".join(column.tobytes() for column in (ids, timestamps, amounts, description_offsets,
+                                                        category_offsets, codes)) + bytes(heap)
+        flags = FLAG_SORTED_IDS if all(ids[row] < ids[row + 1] for row in range(len(ids) - 1)) else 0
+        flags |= FLAG_INTEGER_AMOUNTS if integer_amounts else 0
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(ids), len(category_codes) - 1, len(heap),
+                             zlib.crc32(body), 0)
+        return header + body
+
+    def _load(self) -> Tuple[Optional[Tuple], BinarySnapshot]:
+        version = self.version()
+        if self._snapshot is not None and version is not None and version == self._snapshot_version:
+            return version, self._snapshot
+        try:
+            with open(self.file_path, "rb") as snapshot_file:
+                version = self._stat_key(os.fstat(snapshot_file.fileno()))
+                # The mapping outlives the file object; replacing the file later does not disturb it.
+                view = memoryview(mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            version, view = None, memoryview(self.encode([]))
+        except (IOError, ValueError) as e:
+            raise IOError(f"Failed to read {self.file_path}: {e}")
+
+        METRICS.count("binary.bytes_mapped", len(view))
+        with METRICS.timer("binary.decode"):
+            self._snapshot = self._decode(view)
+        self._snapshot_version = version
+        return version, self._snapshot
+
+    def _decode(self, view: memoryview) -> BinarySnapshot:
+        if len(view) < HEADER.size:
+            raise ValueError(f"{self.file_path} is not an expense snapshot.")
+        magic, format_version, flags, rows, category_count, heap_size, checksum, _ = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{self.file_path} is not an expense snapshot.")
+        if format_version not in READABLE_FORMAT_VERSIONS:
+            raise ValueError(f"{self.file_path} uses snapshot format {format_version}, "
+                             f"expected {FORMAT_VERSION}.")
+        body = view[HEADER.size:]
+        expected_size = 8 * (3 * rows + (rows + 1) + (category_count + 1)) + 4 * rows + heap_size
+        if len(body) != expected_size:
+            raise ValueError(f"{self.file_path} is truncated.")
+        if self.verify_checksum and zlib.crc32(body) != checksum:
+            raise ValueError(f"{self.file_path} failed its checksum.")
+
+        position = 0
+
+        def column(typecode: str, size: int, count: int) -> memoryview:
+            nonlocal position
+            start, position = position, position + size * count
+            return body[start:position].cast(typecode)
+
+        ids = column("q", 8, rows)
+        timestamps = column("q", 8, rows)
+        amounts = column("q" if flags & FLAG_INTEGER_AMOUNTS else "d", 8, rows)
+        description_offsets = column("Q", 8, rows + 1)
+        category_offsets = column("Q", 8, category_count + 1)
+        codes = column("i", 4, rows)
+        heap = body[position:]
+        categories = [None] + list(StringColumn(heap, category_offsets))
+        return BinarySnapshot(ids, timestamps, amounts, codes, categories, StringColumn(heap, description_offsets),
+                              sorted_ids=bool(flags & FLAG_SORTED_IDS))
+
+    @staticmethod
+    def _stat_key(stat: os.stat_result) -> Tuple:
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def convert(source, target) -> int:
+    """Copy every record from one file handler to another. Returns the number of records copied."""
+    records = source.read()
+    target.write(records)
+    return len(records)
@@ -0,0 +1,48 @@
+import csv
+import gzip
+import io
+import sys
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, TextIO
+
+CSV_HEADER: List[str] = ["ID", "Description", "Category", "Amount", "Date"]
+# Written by ``export --since``: the expense columns follow the change; they are empty for deletes and clears.
+CHANGES_CSV_HEADER: List[str] = ["Sequence", "Operation", *CSV_HEADER]
+STDOUT_PATH: str = "-"
+
+
+@contextmanager
+def open_csv_output(file_path: str, compress: bool = False) -> Iterator[TextIO]:
+    """Open ``file_path`` for CSV writing; ``-`` means stdout and ``compress`` gzips the stream."""
+    if file_path == STDOUT_PATH:
+        if not compress:
+            yield sys.stdout
+            sys.stdout.flush()
+            return
+        with gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb") as gzip_file:
+            text_file = io.TextIOWrapper(gzip_file, newline="")
+            yield text_file
+            text_file.flush()
+            text_file.detach()
+        sys.stdout.buffer.flush()
+        return
+
+    try:
+        opener = gzip.open(file_path, "wt", newline="") if compress else open(file_path, "w", newline="")
+    except IOError as e:
+        raise IOError(f"Failed to write to {file_path}: {e}")
+    with opener as csv_file:
+        yield csv_file
+
+
+def write_csv_rows(rows: Iterable[list], file_path: str, compress: bool = False,
+                   header: List[str] = CSV_HEADER) -> int:
+    """Stream ``rows`` to ``file_path`` under ``header``. Returns the number of rows written."""
+    written = 0
+    with open_csv_output(file_path, compress) as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+    return written
@@ -0,0 +1,42 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no fcntl; only threads are serialised there.
+    fcntl = None
+
+
+class FileLock:
+    """Re-entrant advisory lock on ``<path>.lock`` shared by threads and processes.
+
+    The lock is held on a separate file so the data file itself can be
+    replaced with ``os.replace`` while it is locked. Nested ``acquire`` calls
+    from the same owner only take the OS lock once.
+    """
+
+    def __init__(self, path: str):
+        self.lock_path = f"{path}.lock"
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._lock_file: Optional[int] = None
+
+    @contextmanager
+    def acquire(self) -> Iterator[None]:
+        with self._thread_lock:
+            if self._depth == 0:
+                self._lock_file = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    os.close(self._lock_file)
+                    self._lock_file = None
@@ -0,0 +1,216 @@
+import json
+import os
+from typing import ContextManager, List, Dict, Optional, Tuple, Iterator
+
+from app.boundaries import AppendableFileHandlerInterface
+from app.metrics import METRICS
+from app.utils.file_lock import FileLock
+from app.utils.json_file_handler import DateTimeEncoder, encode_array, encode_record
+
+
+class JournalFileHandler(AppendableFileHandlerInterface):
+    """Snapshot plus append-only JSON-lines journal.
+
+    The snapshot at ``file_path`` is a plain JSON array, the same format
+    JSONFileHandler writes. Adds, updates and deletes are appended as single lines
+    to ``<file_path>.journal`` and reads replay the journal on top of the snapshot.
+    The replayed records are kept in a dict keyed by id, which makes ``get`` O(1).
+    ``compact`` folds the journal back into the snapshot; it also runs on its own
+    once the journal grows larger than the live data.
+
+    Every mutation runs under ``lock()`` and first catches up with appends made
+    by other processes, so concurrent writers never reuse an id or clobber a line.
+    """
+
+    def __init__(self, file_path: str, compact_threshold: int = 10000, fsync: bool = False):
+        self.file_path = file_path
+        self.journal_path = f"{file_path}.journal"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self._records: Dict[int, Dict] = {}
+        self._last_id = 0
+        self._snapshot_key: Optional[Tuple] = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._loaded = False
+        self._file_lock = FileLock(file_path)
+
+    def lock(self) -> ContextManager:
+        return self._file_lock.acquire()
+
+    def read(self) -> List[Dict]:
+        self._refresh()
+        return [dict(record) for record in self._records.values()]
+
+    def iter_records(self) -> Iterator[Dict]:
+        self._refresh()
+        for record in list(self._records.values()):
+            yield dict(record)
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        self._refresh()
+        record = self._records.get(record_id)
+        return dict(record) if record is not None else None
+
+    def write(self, data: List[Dict]) -> None:
+        with self.lock():
+            self._refresh()
+            # The reset marker keeps a replay idempotent if we crash before compaction finishes.
+            entries = [{"op": "reset"}] + [{"op": "add", "record": record} for record in data]
+            self._append_entries(entries)
+            self.compact()
+
+    def append(self, record: Dict) -> None:
+        self.extend([record])
+
+    def extend(self, records: List[Dict]) -> None:
+        with self.lock():
+            self._refresh()
+            self._append_entries([{"op": "add", "record": record} for record in records])
+            self._compact_if_needed()
+
+    def remove(self, record_id: int) -> Optional[Dict]:
+        with self.lock():
+            self._refresh()
+            record = self._records.get(record_id)
+            if record is None:
+                return None
+            self._append_entries([{"op": "delete", "id": record_id}])
+            self._compact_if_needed()
+            return dict(record)
+
+    def replace(self, record: Dict) -> Optional[Dict]:
+        with self.lock():
+            self._refresh()
+            previous = self._records.get(record["id"])
+            if previous is None:
+                return None
+            self._append_entries([{"op": "update", "record": record}])
+            self._compact_if_needed()
+            return dict(previous)
+
+    def last_id(self) -> int:
+        self._refresh()
+        return self._last_id
+
+    def version(self) -> Optional[Tuple]:
+        snapshot_key = self._stat_key(self.file_path)
+        journal_key = self._stat_key(self.journal_path)
+        if snapshot_key is None and journal_key is None:
+            return None
+        return snapshot_key, journal_key
+
+    def compact(self) -> None:
+        with self.lock(), METRICS.timer("journal.compact"):
+            self._refresh()
+            temp_path = f"{self.file_path}.tmp"
+            try:
+                with open(temp_path, "w") as snapshot_file:
+                    snapshot_file.write(encode_array([encode_record(record) for record in self._records.values()]))
+                    snapshot_file.flush()
+                    os.fsync(snapshot_file.fileno())
+                os.replace(temp_path, self.file_path)
+                # Replaying a stale journal over the new snapshot is harmless, so a crash here loses nothing.
+                with open(self.journal_path, "wb"):
+                    pass
+            except IOError as e:
+                raise IOError(f"Failed to compact {self.file_path}: {e}")
+
+            self._snapshot_key = self._stat_key(self.file_path)
+            self._journal_offset = 0
+            self._journal_entries = 0
+
+    def _compact_if_needed(self) -> None:
+        if self._journal_entries >= max(self.compact_threshold, len(self._records)):
+            self.compact()
+
+    def _append_entries(self, entries: List[Dict]) -> None:
+        payload = "".join(json.dumps(entry, cls=DateTimeEncoder) + "\n" for entry in entries).encode()
+        try:
+            with open(self.journal_path, "ab") as journal:
+                if journal.tell() != self._journal_offset:
+                    # Drop a torn line left behind by a crashed writer before appending.
+                    journal.truncate(self._journal_offset)
+                journal.write(payload)
+                journal.flush()
+                METRICS.count("journal.bytes_written", len(payload))
+                if self.fsync:
+                    os.fsync(journal.fileno())
+        except IOError as e:
+            raise IOError(f"Failed to append to {self.journal_path}: {e}")
+
+        self._journal_offset += len(payload)
+        for entry in entries:
+            self._apply(entry)
+
+    def _refresh(self) -> None:
+        snapshot_key = self._stat_key(self.file_path)
+        journal_key = self._stat_key(self.journal_path)
+        journal_size = journal_key[1] if journal_key else 0
+
+        if not self._loaded or snapshot_key != self._snapshot_key or journal_size < self._journal_offset:
+            self._load_snapshot()
+            self._snapshot_key = snapshot_key
+            self._loaded = True
+        if journal_size > self._journal_offset:
+            self._replay_journal()
+
+    def _load_snapshot(self) -> None:
+        self._records = {}
+        self._last_id = 0
+        self._journal_offset = 0
+        self._journal_entries = 0
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with METRICS.timer("journal.read_snapshot"), open(self.file_path, "r") as snapshot_file:
+                records = json.load(snapshot_file)
+                METRICS.count("journal.bytes_read", snapshot_file.tell())
+        except json.JSONDecodeError:
+            raise ValueError(f"{self.file_path} contains invalid JSON.")
+        except IOError as e:
+            raise IOError(f"Failed to read {self.file_path}: {e}")
+        for record in records:
+            self._apply({"op": "add", "record": record})
+        self._journal_entries = 0
+
+    def _replay_journal(self) -> None:
+        try:
+            with open(self.journal_path, "rb") as journal:
+                journal.seek(self._journal_offset)
+                tail = journal.read()
+            METRICS.count("journal.bytes_read", len(tail))
+        except IOError as e:
+            raise IOError(f"Failed to read {self.journal_path}: {e}")
+
+        # Anything after the last newline is a torn append and is ignored.
+        for line in tail.split(b"\n")[:-1]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError(f"{self.journal_path} contains invalid JSON near byte {self._journal_offset}.")
+            self._apply(entry)
+            self._journal_offset += len(line) + 1
+
+    def _apply(self, entry: Dict) -> None:
+        op = entry["op"]
+        if op in ("add", "update"):
+            record = entry["record"]
+            self._records[record["id"]] = record
+            self._last_id = max(self._last_id, record["id"])
+        elif op == "delete":
+            self._records.pop(entry["id"], None)
+        elif op == "reset":
+            self._records = {}
+            self._last_id = 0
+        else:
+            raise ValueError(f"{self.journal_path} contains an unknown operation: {op}")
+        self._journal_entries += 1
+
+    @staticmethod
+    def _stat_key(path: str) -> Optional[Tuple]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
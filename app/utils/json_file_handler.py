@@ -1,7 +1,11 @@
 import json
+import os
+import tempfile
 from datetime import datetime
-from typing import List, Dict
-from app.boundaries import FileHandlerInterface
+from typing import ContextManager, List, Dict, Optional, Tuple, Iterator
+from app.boundaries import ExtendableFileHandlerInterface
+from app.metrics import METRICS
+from app.utils.file_lock import FileLock
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -11,23 +15,218 @@ class DateTimeEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
-class JSONFileHandler(FileHandlerInterface):
-    def __init__(self, file_path: str):
+def encode_record(record: Dict) -> str:
+    return json.dumps(record, cls=DateTimeEncoder)
+
+
+def encode_array(encoded_records: List[str]) -> str:
+    """The compact layout: one encoded record per line between the brackets.
+
+    An empty ledger is written as ``[]``, byte for byte what earlier versions wrote.
+    """
+    if not encoded_records:
+        return "[]"
+    return "[\n" + ",\n".join(encoded_records) + "\n]\n"
+
+
+class JSONFileHandler(ExtendableFileHandlerInterface):
+    """Keeps the whole ledger in one JSON array, one compact record per line.
+
+    Writes go to a temporary file that is fsynced and then renamed over the
+    data file, so readers always see either the old or the new array. Use
+    ``lock()`` around a read-modify-write so concurrent processes do not lose updates.
+
+    ``extend`` instead splices the new records onto the end of the array in
+    place, so adding writes bytes in proportion to the new records rather than
+    the ledger. A splice cut short by a crash leaves a torn last line; reads
+    drop it and the next write repairs the file.
+
+    Pass ``indent`` for a pretty-printed file; every write then rewrites the
+    whole file. With ``cache_encoded`` the encoded text of each record is kept
+    between writes and reused while the caller passes the same record dict,
+    which pays off in long-running processes.
+    """
+
+    # How often read_versioned retries when the file changes underneath it.
+    READ_ATTEMPTS = 5
+    # Enough of the file's end to find the closing bracket and what precedes it.
+    TAIL_BYTES = 64
+
+    def __init__(self, file_path: str, indent: Optional[int] = None, cache_encoded: bool = False):
         self.file_path = file_path
+        self.indent = indent
+        self.cache_encoded = cache_encoded
+        self._file_lock = FileLock(file_path)
+        # id -> (record dict, its encoded text)
+        self._encoded: Dict[int, Tuple[Dict, str]] = {}
 
     def read(self) -> List[Dict]:
+        return self.read_versioned()[1]
+
+    def read_versioned(self) -> Tuple[Optional[Tuple], List[Dict]]:
+        for _ in range(self.READ_ATTEMPTS):
+            try:
+                with METRICS.timer("json.read"), open(self.file_path, "r") as data_file:
+                    before = self._stat_key(os.fstat(data_file.fileno()))
+                    text = data_file.read()
+                    after = self._stat_key(os.fstat(data_file.fileno()))
+            except IOError as e:
+                raise IOError(f"Failed to read {self.file_path}: {e}")
+            METRICS.count("json.bytes_read", after[1])
+            if before != after:
+                continue
+            try:
+                data = json.loads(text)
+            except json.JSONDecodeError:
+                data = self._recover(text)
+            METRICS.count("json.records_read", len(data))
+            return before, data
+        raise IOError(f"Failed to read {self.file_path}: it kept changing while being read.")
+
+    def lock(self) -> ContextManager:
+        return self._file_lock.acquire()
+
+    def iter_records(self, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+        """Decode the top-level array one element at a time, holding at most one chunk in memory."""
+        decoder = json.JSONDecoder()
         try:
             with open(self.file_path, "r") as data_file:
-                return json.load(data_file)
-        except json.JSONDecodeError:
-            raise ValueError(f"{self.file_path} contains invalid JSON.")
+                if METRICS.enabled:
+                    METRICS.count("json.bytes_read", os.fstat(data_file.fileno()).st_size)
+                buffer = data_file.read(chunk_size).lstrip()
+                if not buffer.startswith("["):
+                    raise ValueError(f"{self.file_path} contains invalid JSON.")
+                position = 1
+                eof = False
+                while True:
+                    while position < len(buffer) and buffer[position] in " \t\r\n,":
+                        position += 1
+                    if position < len(buffer) and buffer[position] == "]":
+                        return
+                    try:
+                        record, end = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        if eof:
+                            if "\n" in buffer[position:].rstrip():
+                                raise ValueError(f"{self.file_path} contains invalid JSON.")
+                            # A torn splice: the records before the partial last line are intact.
+                            return
+                        chunk = data_file.read(chunk_size)
+                        eof = not chunk
+                        buffer = buffer[position:] + chunk
+                        position = 0
+                        continue
+                    yield record
+                    position = end
         except IOError as e:
             raise IOError(f"Failed to read {self.file_path}: {e}")
 
     def write(self, data: List[dict]) -> None:
+        directory, name = os.path.split(os.path.abspath(self.file_path))
+        with self.lock():
+            try:
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+                try:
+                    with METRICS.timer("json.write"), os.fdopen(fd, "w") as file:
+                        if self.indent is not None:
+                            json.dump(data, file, indent=self.indent, cls=DateTimeEncoder)
+                        else:
+                            file.write(encode_array(self._encode_all(data)))
+                        file.flush()
+                        os.fsync(file.fileno())
+                        METRICS.count("json.bytes_written", file.tell())
+                    if os.path.exists(self.file_path):
+                        os.chmod(temp_path, os.stat(self.file_path).st_mode)
+                    os.replace(temp_path, self.file_path)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.unlink(temp_path)
+                    raise
+            except IOError as e:
+                raise IOError(f"Failed to write to {self.file_path}: {e}")
+
+    def extend(self, records: List[Dict]) -> None:
+        if not records:
+            return
+        with self.lock():
+            if self.indent is None and self._splice(records):
+                return
+            # Pretty-printed, missing, or torn: rewrite the whole file, which also repairs it.
+            existing = self.read() if os.path.exists(self.file_path) else []
+            self.write(existing + records)
+
+    def version(self) -> Optional[Tuple]:
         try:
-            with open(self.file_path, "w") as file:
-                json.dump(data, file, indent=4, cls=DateTimeEncoder)
+            return self._stat_key(os.stat(self.file_path))
+        except FileNotFoundError:
+            return None
 
+    def _splice(self, records: List[Dict]) -> bool:
+        """Overwrite the closing bracket with the new records and a new bracket. False if the end is not intact."""
+        try:
+            with METRICS.timer("json.splice"), open(self.file_path, "r+b") as file:
+                size = file.seek(0, os.SEEK_END)
+                base = max(size - self.TAIL_BYTES, 0)
+                file.seek(base)
+                tail = file.read().rstrip()
+                if not tail.endswith(b"]"):
+                    return False
+                body = tail[:-1].rstrip()
+                if body.endswith(b"}"):
+                    separator = b",\n"
+                elif body.endswith(b"[") and base == 0 and not body[:-1].strip():
+                    separator = b"\n"
+                else:
+                    return False
+                encoded = [self._encode(record) for record in records]
+                payload = separator + ",\n".join(encoded).encode() + b"\n]\n"
+                file.seek(base + len(body))
+                file.write(payload)
+                file.truncate()
+                file.flush()
+                os.fsync(file.fileno())
+        except FileNotFoundError:
+            return False
         except IOError as e:
             raise IOError(f"Failed to write to {self.file_path}: {e}")
+        METRICS.count("json.bytes_written", len(payload))
+        return True
+
+    def _recover(self, text: str) -> List[Dict]:
+        """Parse an array whose last splice was cut short: drop a partial last line and close the array.
+
+        Full writes are atomic, so a torn end can only come from a splice.
+        """
+        stripped = text.rstrip()
+        for candidate in (stripped, stripped[:stripped.rfind("\n")]):
+            candidate = candidate.rstrip().rstrip(",").rstrip()
+            if not candidate.startswith("["):
+                break
+            try:
+                data = json.loads(candidate + "]")
+            except json.JSONDecodeError:
+                continue
+            if isinstance(data, list):
+                return data
+        raise ValueError(f"{self.file_path} contains invalid JSON.")
+
+    def _encode(self, record: Dict) -> str:
+        if not self.cache_encoded:
+            return encode_record(record)
+        entry = self._encoded.get(record.get("id"))
+        if entry is None or entry[0] is not record:
+            METRICS.count("json.records_encoded")
+            entry = (record, encode_record(record))
+            self._encoded[record.get("id")] = entry
+        return entry[1]
+
+    def _encode_all(self, data: List[Dict]) -> List[str]:
+        encoded = [self._encode(record) for record in data]
+        if self.cache_encoded and len(self._encoded) > len(data):
+            # Forget records that are no longer stored.
+            self._encoded = {record.get("id"): self._encoded[record.get("id")] for record in data}
+        return encoded
+
+    @staticmethod
+    def _stat_key(stat: os.stat_result) -> Tuple:
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
@@ -1,30 +1,101 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
-
-def setup_logger():
-    """Set up the logging configuration."""
-    logger = logging.getLogger("ExpenseTracker")
-    logger.setLevel(logging.DEBUG)
-
-    # Formatter
-    formatter = logging.Formatter(
-        "%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
-    )
-
-    # Console Handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-
-    # File Handler
-    file_handler = RotatingFileHandler(
-        "expense_tracker.log", maxBytes=5 * 1024 * 1024, backupCount=3
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-
-    # Add Handlers
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+import os
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 
+from app.constants import LOG_FILE, LOG_FILE_ENV_VAR, LOG_FORMAT_ENV_VAR, LOG_LEVEL_ENV_VAR
+
+LOGGER_NAME = "ExpenseTracker"
+
+# The listener behind the handler that setup_logger installed last, if any.
+_listener: Optional[QueueListener] = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queues records as they are, so even merging the message with its arguments happens on the listener thread.
+
+    The queue never leaves the process, so records need not be made picklable.
+    Log only immutable arguments (ids, counts, names) for the same reason.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, for log shippers. Fields passed with ``extra`` are included."""
+
+    # Attributes every LogRecord has; anything else came in through ``extra``.
+    _STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                 "level": record.levelname, "logger": record.name, "message": record.getMessage()}
+        entry.update((key, value) for key, value in vars(record).items() if key not in self._STANDARD)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def get_logger():
+    """Return the application logger without configuring any handlers."""
+    return logging.getLogger(LOGGER_NAME)
+
+
+def setup_logger(level: Optional[str] = None, log_file: Optional[str] = None, log_format: Optional[str] = None,
+                 console: bool = True):
+    """Set up the logging configuration; calling it again replaces the previous one.
+
+    Records are handed to a queue and written by a background thread, so
+    logging never waits on the console or the disk. ``level`` is a level name,
+    ``log_file`` the rotating file to write (an empty string for none) and
+    ``log_format`` either "text" or "json". Each defaults to its environment
+    variable, then to INFO, ``constants.LOG_FILE`` and "text".
+    """
+    global _listener
+    logger = get_logger()
+    level = (level or os.environ.get(LOG_LEVEL_ENV_VAR) or "INFO").upper()
+    log_file = log_file if log_file is not None else os.environ.get(LOG_FILE_ENV_VAR, LOG_FILE)
+    log_format = log_format or os.environ.get(LOG_FORMAT_ENV_VAR) or "text"
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler())
+    if log_file:
+        # delay=True: the log file is only created once something is logged.
+        handlers.append(RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=3, delay=True))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    shutdown_logger()
+    logger.setLevel(level)
+    # Records are not passed on to the root logger, so a host application's handlers do not log them twice.
+    logger.propagate = False
+    logger.addHandler(_DeferredQueueHandler(queue.SimpleQueue()))
+    _listener = QueueListener(logger.handlers[-1].queue, *handlers)
+    _listener.start()
     return logger
+
+
+def shutdown_logger() -> None:
+    """Write out the queued records and remove the handler installed by setup_logger."""
+    global _listener
+    logger = get_logger()
+    for handler in [handler for handler in logger.handlers if isinstance(handler, _DeferredQueueHandler)]:
+        logger.removeHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logger)
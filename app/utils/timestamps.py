@@ -0,0 +1,15 @@
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_timestamp(date) -> int:
+    """Microseconds since the epoch for a naive datetime or a stored ISO-8601 string."""
+    if not isinstance(date, datetime):
+        date = datetime.fromisoformat(date)
+    return (date - EPOCH) // _MICROSECOND
+
+
+def from_timestamp(timestamp: int) -> datetime:
+    return EPOCH + timedelta(microseconds=timestamp)
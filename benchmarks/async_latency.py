@@ -0,0 +1,86 @@
+"""Request latency of AsyncExpenseService under many concurrent callers.
+
+Each round starts ``--concurrency`` requests at once: mostly adds, with some
+listings and summaries, as a web service might see them. Per-request
+latency percentiles are reported together with the longest stall of the
+event loop, which stays near zero because no file I/O runs on it.
+
+    python -m benchmarks.async_latency --concurrency 10 100 500 --rounds 20 --backend json sqlite
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from statistics import quantiles
+from typing import Dict, List
+
+from app.async_services import AsyncExpenseService
+from app.utils.logger_config import get_logger
+
+from .suite import make_repository
+
+
+async def _watch_loop(stalls: List[float], stopped: asyncio.Event, interval: float = 0.001) -> None:
+    while not stopped.is_set():
+        began = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - began - interval)
+
+
+async def _request(service: AsyncExpenseService, index: int, latencies: List[float]) -> None:
+    began = time.perf_counter()
+    if index % 10 == 8:
+        await service.list_expenses("food")
+    elif index % 10 == 9:
+        await service.summary_details(category="food")
+    else:
+        await service.add_expense(f"Expense {index}", 1 + index % 50, "food" if index % 2 else "home")
+    latencies.append(time.perf_counter() - began)
+
+
+async def _run(service: AsyncExpenseService, concurrency: int, rounds: int) -> Dict:
+    latencies: List[float] = []
+    stalls: List[float] = []
+    stopped = asyncio.Event()
+    watcher = asyncio.create_task(_watch_loop(stalls, stopped))
+    began = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(_request(service, index, latencies) for index in range(concurrency)))
+    elapsed = time.perf_counter() - began
+    stopped.set()
+    await watcher
+    percentiles = quantiles(latencies, n=100)
+    return {"requests": len(latencies), "per_second": len(latencies) / elapsed, "p50": percentiles[49],
+            "p99": percentiles[98], "max_stall": max(stalls, default=0.0)}
+
+
+def run(backend: str, concurrency: int, rounds: int) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        service = AsyncExpenseService(make_repository(backend, directory))
+        try:
+            return asyncio.run(_run(service, concurrency, rounds))
+        finally:
+            service.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--rounds", type=int, default=20, help="Bursts of concurrent requests per run")
+    parser.add_argument("--backend", nargs="+", default=["json", "journal", "sqlite"])
+    args = parser.parse_args()
+    get_logger().disabled = True
+
+    print(f"{'backend':<12} {'concurrent':>10} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'max stall ms':>12}")
+    for backend in args.backend:
+        for concurrency in args.concurrency:
+            result = run(backend, concurrency, args.rounds)
+            print(f"{backend:<12} {concurrency:>10} {result['requests']:>9} {result['per_second']:>8.0f} "
+                  f"{result['p50'] * 1e3:>8.2f} {result['p99'] * 1e3:>8.2f} {result['max_stall'] * 1e3:>12.2f}",
+                  flush=True)
+
+
+if __name__ == "__main__":
+    main()
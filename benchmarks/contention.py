@@ -0,0 +1,79 @@
+"""Throughput of concurrent writers sharing one ledger.
+
+Each writer is a separate process with its own repository, exactly like
+several ``cli.py add`` runs from cron. After every run the ledger is checked
+for lost updates and duplicate ids.
+
+    python -m benchmarks.contention --writers 1 2 4 8 --adds 200 --backend json journal
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from app.models import Expense
+from app.repositories import ExpenseJsonRepository
+from app.utils.json_file_handler import JSONFileHandler
+from app.utils.journal_file_handler import JournalFileHandler
+from app.utils.logger_config import get_logger
+
+HANDLERS = {"json": JSONFileHandler, "journal": JournalFileHandler}
+
+
+def _writer(backend: str, data_file: str, adds: int, start: multiprocessing.Event) -> None:
+    logger = get_logger()
+    logger.disabled = True
+    repository = ExpenseJsonRepository(HANDLERS[backend](data_file), logger)
+    start.wait()
+    for _ in range(adds):
+        repository.add_expense(Expense(description="Coffee", amount=3.5, category="food", date=datetime.now()))
+
+
+def run(backend: str, writers: int, adds: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "expenses.json")
+        HANDLERS[backend](data_file).write([])
+
+        start = multiprocessing.Event()
+        processes = [multiprocessing.Process(target=_writer, args=(backend, data_file, adds, start))
+                     for _ in range(writers)]
+        for process in processes:
+            process.start()
+        began = time.perf_counter()
+        start.set()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - began
+
+        ids = [record["id"] for record in HANDLERS[backend](data_file).read()]
+        expected = writers * adds
+        return {
+            "backend": backend,
+            "writers": writers,
+            "adds": expected,
+            "seconds": elapsed,
+            "adds_per_second": expected / elapsed if elapsed else float("inf"),
+            "lost": expected - len(ids),
+            "duplicate_ids": len(ids) - len(set(ids)),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--adds", type=int, default=200, help="Adds per writer.")
+    parser.add_argument("--backend", nargs="+", choices=sorted(HANDLERS), default=sorted(HANDLERS))
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'writers':>7} {'adds':>6} {'seconds':>8} {'adds/s':>9} {'lost':>5} {'dup ids':>7}")
+    for backend in args.backend:
+        for writers in args.writers:
+            result = run(backend, writers, args.adds)
+            print(f"{result['backend']:<8} {result['writers']:>7} {result['adds']:>6} {result['seconds']:>8.2f} "
+                  f"{result['adds_per_second']:>9.0f} {result['lost']:>5} {result['duplicate_ids']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Deterministic synthetic ledgers for benchmarks.
+
+The same ``count``, ``seed`` and ``end`` always produce the same expenses.
+Categories follow a skewed household-budget mix, amounts are log-normal per
+category, and dates spread evenly over the ``years`` before ``end``, with
+larger amounts at weekends. Without an ``end`` the window closes on
+``default_end()``, which keeps every date importable.
+
+    python -m benchmarks.generator --count 1000000 --output ledger.jsonl
+"""
+import argparse
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+from app.models import MAX_EXPENSE_AGE
+
+# category: (weight, median amount, spread, descriptions)
+CATEGORIES = {
+    "food": (30, 18.0, 0.6, ("Grocery", "Lunch", "Coffee", "Dinner", "Bakery")),
+    "transport": (15, 12.0, 0.8, ("Bus ticket", "Taxi", "Fuel", "Parking", "Train")),
+    "home": (10, 85.0, 1.0, ("Rent", "Electricity", "Water bill", "Furniture", "Repairs")),
+    "health": (6, 40.0, 0.9, ("Pharmacy", "Doctor", "Dentist", "Gym")),
+    "entertainment": (12, 25.0, 0.7, ("Movie", "Concert", "Streaming", "Books", "Games")),
+    "shopping": (14, 45.0, 1.1, ("Clothes", "Shoes", "Electronics", "Gift")),
+    "travel": (4, 220.0, 1.0, ("Hotel", "Flight", "Car rental")),
+    "utilities": (7, 60.0, 0.4, ("Internet", "Phone", "Insurance")),
+}
+# Roughly 2% of expenses have no category.
+UNCATEGORISED_WEIGHT = 2
+WEEKEND_FACTOR = 1.4
+# Fixed rather than taken from the clock, so a ledger and the timings measured on it never depend on the run date.
+DEFAULT_END = datetime(2025, 1, 1)
+
+
+def default_end(years: int = 5, now: Optional[datetime] = None) -> datetime:
+    """DEFAULT_END, moved forward by whole weeks once the window before it reaches past ``MAX_EXPENSE_AGE``.
+
+    The model rejects new expenses dated earlier than that. Whole weeks keep
+    every weekday, so only the dates move; amounts, categories and
+    descriptions stay exactly as generated from ``DEFAULT_END``.
+    """
+    # A day of slack, so rows generated now are still accepted when they are imported.
+    oldest = (now or datetime.now()) - MAX_EXPENSE_AGE + timedelta(days=1)
+    start = DEFAULT_END - timedelta(days=365 * years)
+    if start >= oldest:
+        return DEFAULT_END
+    return DEFAULT_END + timedelta(weeks=math.ceil((oldest - start) / timedelta(weeks=1)))
+
+
+def generate_expenses(count: int, seed: int = 0, end: Optional[datetime] = None,
+                      years: int = 5) -> Iterator[Dict]:
+    """Yield ``count`` expense rows (description, amount, category, date) in date order."""
+    rng = random.Random(seed)
+    end = end or default_end(years)
+    span = timedelta(days=365 * years).total_seconds()
+    start = end - timedelta(seconds=span)
+    names = list(CATEGORIES) + [None]
+    weights = [CATEGORIES[name][0] for name in CATEGORIES] + [UNCATEGORISED_WEIGHT]
+    step = span / max(count, 1)
+
+    for index in range(count):
+        # Spread evenly with jitter, so rows stay in date order without sorting.
+        date = start + timedelta(seconds=step * index + rng.random() * step)
+        name = rng.choices(names, weights)[0]
+        _, median, spread, descriptions = CATEGORIES[name or "shopping"]
+        if date.weekday() >= 5:
+            median *= WEEKEND_FACTOR
+        amount = round(min(median * math.exp(rng.gauss(0, spread)), 1e6), 2) or 0.01
+        yield {
+            "description": rng.choice(descriptions),
+            "amount": amount,
+            "category": name,
+            "date": date.replace(microsecond=0).isoformat(),
+        }
+
+
+def write_jsonl(file_path: str, count: int, seed: int = 0, end: Optional[datetime] = None, years: int = 5) -> None:
+    with open(file_path, "w") as output:
+        for row in generate_expenses(count, seed, end, years):
+            output.write(json.dumps(row) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, required=True, help="Number of expenses")
+    parser.add_argument("--output", required=True, help="JSON-lines file to write, ready for 'import'")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--years", type=int, default=5, help="Years of history before --end")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None,
+                        help=f"Latest date, as YYYY-MM-DD (default: {DEFAULT_END.date()}, or later once the "
+                             "window would reach past the dates new expenses may have)")
+    args = parser.parse_args()
+    write_jsonl(args.output, args.count, args.seed, args.end, args.years)
+
+
+if __name__ == "__main__":
+    main()
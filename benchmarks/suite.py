@@ -0,0 +1,206 @@
+"""Timings and peak memory of every storage backend on synthetic ledgers.
+
+For each backend and ledger size a fresh process imports a generated
+ledger, then times listing a category, a summary, a CSV export, single adds
+and single deletes. Results are printed and can be written as JSON and
+compared with an earlier run to catch regressions between releases.
+
+    python -m benchmarks.suite --sizes 1000 100000 --output results.json
+    python -m benchmarks.suite --sizes 1000 100000 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Callable, Dict, List
+
+from app.aggregates import AggregateIndex, aggregate_index_path
+from app.boundaries import ExpenseRepositoryInterface
+from app.constants import BACKENDS
+from app.models import MAX_EXPENSE_AGE
+from app.repositories import ExpenseJsonRepository, ExpensePartitionedRepository, ExpenseSqliteRepository
+from app.services import ExpenseService
+from app.utils.binary_file_handler import BinaryFileHandler
+from app.utils.journal_file_handler import JournalFileHandler
+from app.utils.json_file_handler import JSONFileHandler
+from app.utils.logger_config import get_logger
+
+from .generator import DEFAULT_END, default_end, write_jsonl
+
+RESULTS_FORMAT = 1
+OPERATIONS = ("bulk_import", "list_by_category", "summary", "export", "add", "delete")
+
+
+def make_repository(backend: str, directory: str) -> ExpenseRepositoryInterface:
+    """Like ``create_repository``, but with an empty ledger inside ``directory``."""
+    if backend in ("json", "journal", "binary"):
+        handler_class = {"json": JSONFileHandler, "journal": JournalFileHandler, "binary": BinaryFileHandler}[backend]
+        data_file = os.path.join(directory, f"expenses.{'bin' if backend == 'binary' else 'json'}")
+        handler = handler_class(data_file)
+        handler.write([])
+        return ExpenseJsonRepository(handler,
+                                     aggregate_index=AggregateIndex(aggregate_index_path(data_file)))
+    if backend == "partitioned":
+        return ExpensePartitionedRepository(os.path.join(directory, "expenses.d"))
+    if backend == "sqlite":
+        return ExpenseSqliteRepository(os.path.join(directory, "expenses.db"))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of this process so far, in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _timed(function: Callable, repeat: int = 1) -> float:
+    """Best of ``repeat`` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        began = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - began)
+    return best
+
+
+def run(backend: str, size: int, ops: int, repeat: int, seed: int) -> Dict:
+    """Benchmark one backend at one ledger size. Meant to run in a fresh process."""
+    get_logger().disabled = True
+    timings: Dict[str, Dict] = {}
+
+    def record(operation: str, seconds: float, count: int = 1) -> None:
+        timings[operation] = {"ops": count, "seconds": seconds, "per_op": seconds / count}
+
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = os.path.join(directory, "ledger.jsonl")
+        write_jsonl(ledger, size, seed)
+        service = ExpenseService(make_repository(backend, directory))
+
+        result = None
+
+        def bulk_import() -> None:
+            nonlocal result
+            result = service.import_expenses(ledger, "jsonl")
+
+        record("bulk_import", _timed(bulk_import), size)
+        if result.errors:
+            raise ValueError(f"The generated ledger has {len(result.errors)} invalid rows: {result.errors[0]}")
+        record("list_by_category", _timed(lambda: service.list_expenses("food"), repeat))
+        record("summary", _timed(lambda: service.summary_details(category="food"), repeat))
+        export_path = os.path.join(directory, "export.csv")
+        record("export", _timed(lambda: service.export_expenses_to_csv(export_path), repeat))
+
+        def add() -> None:
+            for _ in range(ops):
+                service.add_expense("Coffee", 3.5, "food")
+
+        record("add", _timed(add), ops)
+        # Delete from the middle of the ledger, away from any append-friendly tail.
+        middle = max(size // 2, 1)
+        ids = range(middle, min(middle + ops, size + 1))
+
+        def delete() -> None:
+            for expense_id in ids:
+                service.delete(expense_id)
+
+        record("delete", _timed(delete), max(len(ids), 1))
+
+    return {"backend": backend, "size": size, "peak_rss_kb": peak_rss_kb(), "operations": timings}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: List[Dict], baseline: Dict, threshold: float) -> List[str]:
+    """Describe every timing or peak RSS more than ``threshold`` (a fraction) worse than ``baseline``."""
+    previous = {(entry["backend"], entry["size"]): entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        old = previous.get((entry["backend"], entry["size"]))
+        if old is None:
+            continue
+        name = f"{entry['backend']} @ {entry['size']}"
+        for operation, timing in entry["operations"].items():
+            old_timing = old["operations"].get(operation)
+            if old_timing and timing["per_op"] > old_timing["per_op"] * (1 + threshold):
+                regressions.append(f"{name} {operation}: {old_timing['per_op'] * 1e3:.3f} ms -> "
+                                   f"{timing['per_op'] * 1e3:.3f} ms per op")
+        if entry["peak_rss_kb"] > old["peak_rss_kb"] * (1 + threshold):
+            regressions.append(f"{name} peak RSS: {old['peak_rss_kb'] / 1024:.1f} MiB -> "
+                               f"{entry['peak_rss_kb'] / 1024:.1f} MiB")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Ledger sizes to generate")
+    parser.add_argument("--backend", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--ops", type=int, default=20, help="Single adds and deletes timed per run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each read; the best is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Slowdown, as a fraction, reported as a regression (default: 0.25)")
+    args = parser.parse_args()
+
+    results = []
+    end = default_end()
+    if end != DEFAULT_END:
+        # Same rows as on earlier runs, only dated later, so the timings still compare.
+        print(f"Generated dates end on {end.date()} rather than {DEFAULT_END.date()}: the model no longer accepts "
+              f"expenses from before {(datetime.now() - MAX_EXPENSE_AGE).date()}.")
+    print("Milliseconds per operation; bulk_import is per imported row.")
+    print(f"{'backend':<12} {'size':>9} " + " ".join(f"{operation:>16}" for operation in OPERATIONS)
+          + f" {'peak MiB':>9}")
+    for backend in args.backend:
+        for size in args.sizes:
+            # A fresh interpreter per run keeps each peak RSS to that run alone.
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                entry = pool.submit(run, backend, size, args.ops, args.repeat, args.seed).result()
+            results.append(entry)
+            cells = " ".join(f"{entry['operations'][operation]['per_op'] * 1e3:>13.3f} ms"
+                             for operation in OPERATIONS)
+            print(f"{backend:<12} {size:>9} {cells} {entry['peak_rss_kb'] / 1024:>9.1f}", flush=True)
+
+    if args.output:
+        report = {
+            "format": RESULTS_FORMAT,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "ops": args.ops,
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,162 @@
 #!/usr/bin/env python3
 
 import argparse
+import os
 
-from pydantic import ValidationError
+# Only constants are imported up front; each command imports what it needs so
+# that --help and index-backed summaries never load pydantic or open the log file.
+from app.constants import (DATA_FILE, BINARY_DATA_FILE, BACKENDS, BACKEND_ENV_VAR, DEFAULT_BACKEND,
+                           DEFAULT_LEDGER, IMPORT_FORMATS, LEDGER_ENV_VAR, LOG_FILE, LOG_FILE_ENV_VAR, LOG_FORMATS,
+                           LOG_FORMAT_ENV_VAR, LOG_LEVELS, LOG_LEVEL_ENV_VAR, QUERY_SORTS, REPORT_FORMATS,
+                           REPORT_PERIODS, SOCKET_FILE, SOCKET_ENV_VAR)
 
-from app.services import ExpenseService
-from app.repositories import ExpenseJsonRepository
-from app.utils.json_file_handler import JSONFileHandler
-from app.constants import DATA_FILE
+# Commands a running daemon can answer on our behalf.
+DAEMON_COMMANDS = ("add", "get", "update", "list", "summary", "report", "delete", "export", "import", "clear")
+
+
+def year_month(value: str):
+    try:
+        year, month = (int(part) for part in value.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected YYYY-MM, got {value!r}")
+    if not 1 <= month <= 12:
+        raise argparse.ArgumentTypeError(f"Month out of range in {value!r}")
+    return year, month
+
+
+def day(value: str):
+    from datetime import datetime
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected YYYY-MM-DD, got {value!r}")
+
+
+def ledger_name(value: str):
+    from app.ledgers import check_ledger_name
+    try:
+        return check_ledger_name(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def summary_from_index(args):
+    """Answer ``summary`` from a current aggregate index without loading the model layer.
+
+    Returns None when the backend has no index or the index is out of date.
+    """
+    if args.verify or args.backend not in ("json", "journal", "binary"):
+        return None
+    from datetime import datetime
+    from app.aggregates import AggregateIndex, aggregate_index_path
+    from app.ledgers import ledger_path
+
+    path = ledger_path(args.backend, args.ledger)
+    if not os.path.exists(path):
+        return None
+    if args.backend == "json":
+        from app.utils.json_file_handler import JSONFileHandler
+        handler = JSONFileHandler(path)
+    elif args.backend == "journal":
+        from app.utils.journal_file_handler import JournalFileHandler
+        handler = JournalFileHandler(path)
+    else:
+        from app.utils.binary_file_handler import BinaryFileHandler
+        handler = BinaryFileHandler(path)
+    # The index records the scale its sums are in, so the ledger's currency settings are not needed.
+    index = AggregateIndex(aggregate_index_path(handler.file_path), scale=None)
+    if not index.is_current(handler.version()):
+        return None
+    year = args.year or (datetime.now().year if args.month else None)
+    return index.query(year, args.month or None, args.category or None, args.start_month, args.end_month)
+
+
+def connect_daemon(args):
+    """Return a client for a running daemon that can take this command, or None to run it locally."""
+    if args.no_daemon or args.verify or args.profile or args.command not in DAEMON_COMMANDS:
+        # A profile is only useful where the work happens, so profiled commands run locally.
+        return None
+    if args.command == "export" and (args.file_path == "-" or args.since is not None):
+        # The daemon cannot write to our stdout, and a change feed is read straight from its append-only log.
+        return None
+    if args.command == "import" and (len(args.file_path) > 1 or args.workers > 1):
+        # The daemon imports a single file on its writer; a parallel import runs here.
+        return None
+    from app.daemon_client import DaemonClient
+    return DaemonClient.connect(args.socket, args.backend, args.ledger)
+
+
+def convert_ledger(args) -> None:
+    import shutil
+    from app.currency import currency_path
+    from app.ledgers import ledger_path
+    from app.utils.binary_file_handler import BinaryFileHandler, convert
+    from app.utils.json_file_handler import JSONFileHandler
+
+    json_path, binary_path = ledger_path("json", args.ledger), ledger_path("binary", args.ledger)
+    if args.to == "binary":
+        source = JSONFileHandler(args.input or json_path)
+        target = BinaryFileHandler(args.output or binary_path)
+    else:
+        source = BinaryFileHandler(args.input or binary_path, verify_checksum=True)
+        target = JSONFileHandler(args.output or json_path)
+    try:
+        converted = convert(source, target)
+    except (IOError, ValueError) as e:
+        print(f"Error: {e}")
+        return
+    # Amounts are copied as stored, so the copy keeps the currency settings they are stored in.
+    if os.path.exists(currency_path(source.file_path)):
+        shutil.copyfile(currency_path(source.file_path), currency_path(target.file_path))
+    print(f"Converted {converted} expenses from {source.file_path} to {target.file_path}")
+
+
+def show_daemon_metrics(args) -> None:
+    import json
+    from app.daemon_client import DaemonClient
+    client = DaemonClient.connect(args.socket, args.backend, args.ledger)
+    if client is None:
+        print(f"Error: no {args.backend} daemon serving the {args.ledger} ledger is listening on {args.socket}.")
+        return
+    print(json.dumps(client.metrics(reset=args.reset), indent=2))
+
+
+def print_field_errors(error: ValueError) -> None:
+    # pydantic's ValidationError and DaemonError both list the failing fields.
+    field_errors = error.errors() if hasattr(error, "errors") else []
+    if field_errors:
+        for field_error in field_errors:
+            print(f"Error in field '{field_error['loc'][0]}': {field_error['msg']}")
+    else:
+        print(f"Error: {error}")
+
+
+def print_summary(details: dict, stats: bool) -> None:
+    print(f"Total expense: {details['total']}")
+    if stats:
+        print(f"Count: {details['count']}, Minimum: {details['minimum']}, Maximum: {details['maximum']}")
 
 
 def main():
     parser = argparse.ArgumentParser(prog="expense-tracker", description="Expense Tracker CLI")
+    parser.add_argument("--backend", choices=BACKENDS, default=os.environ.get(BACKEND_ENV_VAR, DEFAULT_BACKEND),
+                        help=f"Storage backend (default: ${BACKEND_ENV_VAR} or {DEFAULT_BACKEND})")
+    parser.add_argument("--ledger", type=ledger_name, default=os.environ.get(LEDGER_ENV_VAR, DEFAULT_LEDGER),
+                        help=f"Ledger to work on (default: ${LEDGER_ENV_VAR} or {DEFAULT_LEDGER})")
+    parser.add_argument("--verify", action="store_true", help="Re-validate every stored expense while reading")
+    parser.add_argument("--socket", default=os.environ.get(SOCKET_ENV_VAR, SOCKET_FILE),
+                        help=f"Daemon socket path (default: ${SOCKET_ENV_VAR} or {SOCKET_FILE})")
+    parser.add_argument("--no-daemon", action="store_true", help="Do not forward the command to a running daemon")
+    parser.add_argument("--log-level", type=str.upper, choices=LOG_LEVELS, required=False,
+                        help=f"Lowest level logged (default: ${LOG_LEVEL_ENV_VAR} or INFO)")
+    parser.add_argument("--log-file", required=False,
+                        help=f"Rotating log file, or '' for none (default: ${LOG_FILE_ENV_VAR} or {LOG_FILE})")
+    parser.add_argument("--log-format", choices=LOG_FORMATS, required=False,
+                        help=f"Log as text or as one JSON object per line (default: ${LOG_FORMAT_ENV_VAR} or text)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Run locally and print where the time went to stderr")
+    parser.add_argument("--profile-output", metavar="FILE",
+                        help="Also write a cProfile dump to FILE for pstats (implies --profile)")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # Add expense command
@@ -20,13 +165,49 @@ def main():
     add_parser.add_argument("--amount", type=float, required=True, help="Amount of the expense")
     add_parser.add_argument("--category", type=str, required=False, help="Category of the expense")
 
+    # Get expense command
+    get_parser = subparsers.add_parser(name="get", help="Show one expense by ID")
+    get_parser.add_argument("--id", type=int, required=True, help="ID of the expense")
+
+    # Update expense command
+    update_parser = subparsers.add_parser(name="update", help="Change fields of an expense by ID")
+    update_parser.add_argument("--id", type=int, required=True, help="ID of the expense to update")
+    update_parser.add_argument("--description", type=str, required=False, help="New description")
+    update_parser.add_argument("--amount", type=float, required=False, help="New amount")
+    update_parser.add_argument("--category", type=str, required=False, help="New category")
+    update_parser.add_argument("--date", type=day, required=False, help="New date (YYYY-MM-DD)")
+
     # List expenses command
     list_parser = subparsers.add_parser(name="list", help="List all expenses")
     list_parser.add_argument("--category", type=str, required=False,help="Category of the expense")
+    list_parser.add_argument("--search", type=str, required=False, help="Only descriptions containing this text")
+    list_parser.add_argument("--sort", choices=QUERY_SORTS, default="id", help="Order of the listing (default: id)")
+    list_parser.add_argument("--desc", action="store_true", help="Sort in descending order")
+    list_parser.add_argument("--limit", type=int, required=False, help="Show at most this many expenses")
+    list_parser.add_argument("--offset", type=int, default=0, help="Skip this many expenses first")
+    list_parser.add_argument("--after", type=str, required=False,
+                             help="Continue after this cursor, as printed below a full page")
 
     # Summary command
     summary_parser = subparsers.add_parser(name="summary", help="Show total expense summary")
     summary_parser.add_argument("--month", type=int, required=False,help="Get Summary by month")
+    summary_parser.add_argument("--year", type=int, required=False, help="Get Summary by year")
+    summary_parser.add_argument("--category", type=str, required=False, help="Get Summary by category")
+    summary_parser.add_argument("--from", dest="start_month", type=year_month, required=False,
+                                help="First month to include, as YYYY-MM")
+    summary_parser.add_argument("--to", dest="end_month", type=year_month, required=False,
+                                help="Last month to include, as YYYY-MM")
+    summary_parser.add_argument("--stats", action="store_true", help="Also show count, minimum and maximum")
+
+    # Report command
+    report_parser = subparsers.add_parser(name="report", help="Show totals per day, week, month or year")
+    report_parser.add_argument("--period", choices=REPORT_PERIODS, default="month", help="Bucket size (default: month)")
+    report_parser.add_argument("--from", dest="start", type=day, required=False,
+                               help="First day to include, as YYYY-MM-DD")
+    report_parser.add_argument("--to", dest="end", type=day, required=False, help="Last day to include, as YYYY-MM-DD")
+    report_parser.add_argument("--category", type=str, required=False, help="Only include this category")
+    report_parser.add_argument("--by-category", action="store_true", help="Split every bucket by category")
+    report_parser.add_argument("--format", choices=REPORT_FORMATS, default="table", help="Output format")
 
     # Delete expense command
     delete_parser = subparsers.add_parser(name="delete", help="Delete an expense by ID")
@@ -34,40 +215,167 @@ def main():
 
     # Export expenses command
     csv_export_parser = subparsers.add_parser(name="export", help="Export expenses to a csv file")
-    csv_export_parser.add_argument("--file-path", required=True, help="Path to save the exported CSV file")
+    csv_export_parser.add_argument("--file-path", required=True, help="Path to save the exported CSV file, or - for stdout")
+    csv_export_parser.add_argument("--category", type=str, required=False, help="Only export this category")
+    csv_export_parser.add_argument("--month", type=int, required=False, help="Only export this month")
+    csv_export_parser.add_argument("--year", type=int, required=False, help="Year of --month (default: current year)")
+    csv_export_parser.add_argument("--gzip", action="store_true", help="Gzip the CSV output")
+    csv_export_parser.add_argument("--since", type=int, required=False, metavar="CHECKPOINT",
+                                   help="Only export the adds, updates and deletes after this checkpoint (0 for all)")
+
 
+    # Import expenses command
+    import_parser = subparsers.add_parser(name="import", help="Import expenses from CSV or JSON-lines files")
+    import_parser.add_argument("--file-path", nargs="+", required=True, help="Paths of the files to import")
+    import_parser.add_argument("--workers", type=int, default=1,
+                               help="Processes used to validate the files (default: 1)")
+    import_parser.add_argument("--format", choices=IMPORT_FORMATS, required=False,
+                               help="Input format (default: guessed from the file extension)")
 
     # Clear all expenses command
     subparsers.add_parser(name="clear", help="Clear all expenses")
 
+    # Migrate command
+    subparsers.add_parser(name="migrate", help=f"Copy expenses from {DATA_FILE} into the selected backend")
+
+    # Migrate amounts command
+    migrate_amounts_parser = subparsers.add_parser(
+        name="migrate-amounts", help="Store amounts as integer minor units, optionally changing the currency")
+    migrate_amounts_parser.add_argument("--currency", type=str, required=False,
+                                        help="Currency code of the ledger (default: keep it, initially USD)")
+    migrate_amounts_parser.add_argument("--scale", type=int, required=False,
+                                        help="Decimal places of the minor unit, 0 to 6 (default: keep it, initially 2)")
+
+    # Verify command
+    subparsers.add_parser(name="verify", help="Check the stored expenses, and the checksum of a binary snapshot")
+
+    # Compact command
+    subparsers.add_parser(name="compact", help="Fold the journal into the snapshot (journal backend)")
+
+    # Convert command
+    convert_parser = subparsers.add_parser(name="convert", help="Convert between the JSON and binary formats")
+    convert_parser.add_argument("--to", choices=("binary", "json"), required=True, help="Format to write")
+    convert_parser.add_argument("--input", required=False,
+                                help=f"File to read (default: {DATA_FILE} or {BINARY_DATA_FILE})")
+    convert_parser.add_argument("--output", required=False,
+                                help=f"File to write (default: {BINARY_DATA_FILE} or {DATA_FILE})")
+
+    # Serve command
+    serve_parser = subparsers.add_parser(name="serve", help="Keep ledgers in memory and answer commands over --socket")
+    serve_parser.add_argument("--max-ledgers", type=int, default=256,
+                              help="Most ledgers besides --ledger kept open at once (default: 256)")
+    serve_parser.add_argument("--ledger-memory", type=int, required=False, metavar="MIB",
+                              help="Close least recently used ledgers beyond about this many MiB of cached data")
+    serve_parser.add_argument("--ledger-idle", type=float, required=False, metavar="SECONDS",
+                              help="Close ledgers left unused for this long")
+
+    # Metrics command
+    metrics_parser = subparsers.add_parser(name="metrics", help="Show the counters and timers of a running daemon")
+    metrics_parser.add_argument("--reset", action="store_true", help="Start the daemon's metrics over")
+
     # Parse the arguments
     args = parser.parse_args()
+    args.profile = args.profile or bool(args.profile_output)
 
-    repository = ExpenseJsonRepository(JSONFileHandler(DATA_FILE))
-    expense_service = ExpenseService(repository)
+    from app.daemon_client import DaemonUnavailable
+    try:
+        if args.profile:
+            from app.metrics import profiled
+            with profiled(args.profile_output):
+                run_command(args)
+        else:
+            run_command(args)
+    except DaemonUnavailable as e:
+        # Not retried locally: the daemon may have stored a write before it went away.
+        print(f"Error: {e} Pass --no-daemon to run commands without it.")
+
+
+def run_command(args):
+    if args.command == "metrics":
+        show_daemon_metrics(args)
+        return
+
+    if args.command == "convert":
+        convert_ledger(args)
+        return
+
+    expense_service = connect_daemon(args)
+
+    if expense_service is None and args.command == "summary":
+        details = summary_from_index(args)
+        if details is not None:
+            print_summary(details, args.stats)
+            return
+
+    if expense_service is None:
+        from app.utils.logger_config import setup_logger
+        from app.services import ExpenseService
+        from app.repositories import create_repository
+
+        setup_logger(args.log_level, args.log_file, args.log_format)
+        repository = create_repository(args.backend, verify=args.verify or args.command == "verify",
+                                       cached=args.command == "serve", ledger=args.ledger)
+        expense_service = ExpenseService(repository, ledger=args.ledger)
 
     if args.command == "add":
         try:
             new_expense = expense_service.add_expense(args.description, args.amount, args.category)
             print(f"Added expense: ID={new_expense.id}, Description={new_expense.description},"
                   f" Amount={new_expense.amount}, Category={new_expense.category}")
-        except ValidationError as ve:
-            for error in ve.errors():
-                print(f"Error in field '{error['loc'][0]}': {error['msg']}")
+        except ValueError as ve:
+            print_field_errors(ve)
+
+    elif args.command == "get":
+        try:
+            expense = expense_service.get(args.id)
+            print(f"ID: {expense.id}, Description: {expense.description},"
+                  f" Amount: {expense.amount}, Category: {expense.category}, Date: {expense.date}")
+        except ValueError as e:
+            print(f"Error: {e}")
+
+    elif args.command == "update":
+        try:
+            expense = expense_service.update(args.id, args.description, args.amount, args.category, args.date)
+            print(f"Updated expense: ID={expense.id}, Description={expense.description},"
+                  f" Amount={expense.amount}, Category={expense.category}")
+        except ValueError as ve:
+            print_field_errors(ve)
 
     elif args.command == "list":
-        expenses = expense_service.list_expenses(args.category)
-        if not expenses:
-            print("No expenses found.")
-        else:
-            print("Expenses:")
-            for expense in expenses:
-                print(f"ID: {expense.id}, Description: {expense.description},"
-                      f" Amount: {expense.amount}, Category: {expense.category}, Date: {expense.date}")
+        from app.queries import cursor_for
+        try:
+            expenses = iter(expense_service.query_expenses(args.category, args.search, args.sort, args.desc,
+                                                           args.limit, args.offset, args.after))
+            # Rows are printed as they are read, so the first page shows up before a large ledger is scanned.
+            expense = next(expenses, None)
+            if expense is None:
+                print("No expenses found.")
+            else:
+                print("Expenses:")
+                shown = 0
+                while expense is not None:
+                    print(f"ID: {expense.id}, Description: {expense.description},"
+                          f" Amount: {expense.amount}, Category: {expense.category}, Date: {expense.date}")
+                    shown, last = shown + 1, expense
+                    expense = next(expenses, None)
+                if args.limit is not None and shown == args.limit:
+                    print(f"More may follow: --after {cursor_for(last, args.sort)}")
+        except ValueError as e:
+            print_field_errors(e)
 
     elif args.command == "summary":
-        total = expense_service.summary(args.month)
-        print(f"Total expense: {total}")
+        details = expense_service.summary_details(args.month, args.year, args.category,
+                                                  args.start_month, args.end_month)
+        print_summary(dict(details), args.stats)
+
+    elif args.command == "report":
+        import sys
+        from datetime import timedelta
+        from app.reports import write_report
+        end = args.end + timedelta(days=1) if args.end else None
+        rows = expense_service.report(args.period, args.start, end, args.category, args.by_category)
+        if not write_report(rows, args.format, sys.stdout, args.by_category) and args.format == "table":
+            print("No expenses found.")
 
     elif args.command == "delete":
         try:
@@ -77,12 +385,100 @@ def main():
             print(f"Error: {e}")
 
     elif args.command == "export":
-        expense_service.export_expenses_to_csv(args.file_path)
-        print(f"Expenses exported successfully to {args.file_path}")
+        from app.utils.csv_export import STDOUT_PATH
+        if args.since is None:
+            expense_service.export_expenses_to_csv(args.file_path, args.category, args.month, args.year, args.gzip)
+            if args.file_path != STDOUT_PATH:
+                print(f"Expenses exported successfully to {args.file_path}")
+        elif args.category or args.month:
+            print("Error: --since exports every change and cannot be combined with --category or --month.")
+        else:
+            import sys
+            try:
+                checkpoint, written = expense_service.export_changes_to_csv(args.file_path, args.since, args.gzip)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
+            # On stdout the CSV is the output, so the checkpoint goes to stderr.
+            print(f"Exported {written} changes. Next time pass --since {checkpoint}",
+                  file=sys.stderr if args.file_path == STDOUT_PATH else sys.stdout)
+
+    elif args.command == "import":
+        if len(args.file_path) == 1 and args.workers <= 1:
+            try:
+                result = expense_service.import_expenses(args.file_path[0], args.format)
+            except (IOError, ValueError) as e:
+                print(f"Error: {e}")
+                return
+            for error in result.errors:
+                print(f"Line {error.line}: {error.message}")
+            print(f"Imported {result.added} expenses, skipped {len(result.errors)} invalid rows")
+        else:
+            results = expense_service.import_files(args.file_path, args.format, args.workers)
+            for result in results:
+                for error in result.errors:
+                    print(f"{result.file_path}: Line {error.line}: {error.message}" if error.line
+                          else f"{result.file_path}: {error.message}")
+                print(f"{result.file_path}: imported {result.added} expenses, skipped {len(result.errors)} invalid rows")
+            print(f"Imported {sum(result.added for result in results)} expenses from {len(results)} files")
 
     elif args.command == "clear":
         expense_service.clear_all_expenses()
         print("All expenses cleared.")
 
+    elif args.command == "migrate":
+        from app.repositories import ExpensePartitionedRepository, ExpenseSqliteRepository, ledger_path
+        from app.utils.json_file_handler import JSONFileHandler
+        json_path = ledger_path("json", args.ledger)
+        if args.backend == "binary":
+            print(f"Use 'convert --to binary' to copy {json_path} into {ledger_path('binary', args.ledger)}.")
+        elif not isinstance(repository, (ExpenseSqliteRepository, ExpensePartitionedRepository)):
+            print(f"The {args.backend} backend already reads {json_path}; nothing to migrate.")
+        elif repository.expense_summary().count:
+            print("Error: the target backend already contains expenses.")
+        else:
+            from app.repositories import load_ledger_currency
+            migrated = repository.migrate_from(JSONFileHandler(json_path), load_ledger_currency("json", args.ledger))
+            print(f"Migrated {migrated} expenses from {json_path}")
+
+    elif args.command == "migrate-amounts":
+        from app.currency import LedgerCurrency
+        from app.repositories import load_ledger_currency, save_ledger_currency
+        current = load_ledger_currency(args.backend, args.ledger)
+        try:
+            currency = LedgerCurrency(code=args.currency or current.code,
+                                      scale=current.scale if args.scale is None else args.scale)
+        except ValueError as ve:
+            print_field_errors(ve)
+            return
+        converted = expense_service.migrate_amounts(currency)
+        save_ledger_currency(args.backend, currency, args.ledger)
+        print(f"Stored {converted} amounts in minor units of {currency.code} ({currency.scale} decimal places).")
+
+    elif args.command == "verify":
+        try:
+            verified = sum(1 for _ in repository.iter_expenses())
+        except (IOError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+        print(f"Verified {verified} expenses.")
+
+    elif args.command == "compact":
+        if args.backend != "journal":
+            print("Only the journal backend needs compaction.")
+        else:
+            repository.compact()
+            print("Journal compacted.")
+
+    elif args.command == "serve":
+        from app.daemon import ExpenseDaemon
+        from app.ledgers import LedgerRegistry
+        memory_budget = args.ledger_memory << 20 if args.ledger_memory is not None else None
+        registry = LedgerRegistry(args.backend, max_open=args.max_ledgers, memory_budget=memory_budget,
+                                  idle_seconds=args.ledger_idle, verify=args.verify)
+        print(f"Serving the {args.backend} backend on {args.socket} (Ctrl+C to stop)")
+        ExpenseDaemon(expense_service, args.socket, args.backend, ledger=args.ledger, registry=registry).run()
+        registry.close()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,41 @@
+import pytest
+
+from app.aggregates import AggregateIndex
+from app.cache import ExpenseCache
+from app.changes import ChangeLog
+from app.repositories import ExpenseJsonRepository, ExpensePartitionedRepository, ExpenseSqliteRepository
+from app.utils.binary_file_handler import BinaryFileHandler
+from app.utils.json_file_handler import JSONFileHandler
+from app.utils.journal_file_handler import JournalFileHandler
+
+# "cached" is the json backend with an ExpenseCache.
+BACKENDS = ["json", "cached", "journal", "binary", "sqlite", "partitioned"]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def make_repository(tmp_path):
+    """A factory for a repository of the given backend, with its files under ``tmp_path``."""
+    def make(backend):
+        data_file = str(tmp_path / "expenses.json")
+        index = AggregateIndex(str(tmp_path / "expenses.summary.json"))
+        change_log = ChangeLog(str(tmp_path / "expenses.changes.jsonl"))
+        if backend == "json":
+            return ExpenseJsonRepository(JSONFileHandler(data_file), aggregate_index=index, change_log=change_log)
+        if backend == "cached":
+            return ExpenseJsonRepository(JSONFileHandler(data_file), cache=ExpenseCache(), aggregate_index=index,
+                                         change_log=change_log)
+        if backend == "journal":
+            return ExpenseJsonRepository(JournalFileHandler(data_file), aggregate_index=index, change_log=change_log)
+        if backend == "binary":
+            return ExpenseJsonRepository(BinaryFileHandler(str(tmp_path / "expenses.bin")), aggregate_index=index,
+                                         change_log=change_log)
+        if backend == "sqlite":
+            return ExpenseSqliteRepository(str(tmp_path / "expenses.db"))
+        return ExpensePartitionedRepository(str(tmp_path / "expenses.d"))
+
+    return make
@@ -0,0 +1,95 @@
+from datetime import datetime
+
+from app.aggregates import AggregateIndex
+from app.repositories import ExpenseJsonRepository, ExpenseSqliteRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+from app.utils.journal_file_handler import JournalFileHandler
+
+ROWS = [
+    {"description": "Grocery", "amount": 100, "category": "Basic", "date": datetime(2025, 1, 10)},
+    {"description": "Rent", "amount": 900, "category": "Basic", "date": datetime(2025, 2, 1)},
+    {"description": "Movie", "amount": 40, "category": "Fun", "date": datetime(2025, 2, 14)},
+    {"description": "Books", "amount": 60, "category": "Fun", "date": datetime(2024, 12, 5)},
+]
+
+
+def test_index_query_filters():
+    index = AggregateIndex()
+    # Entries are in minor units; queries answer in major units.
+    index.rebuild([(row["date"], row["category"], row["amount"] * 100) for row in ROWS], None)
+
+    assert index.query()["total"] == 1100
+    assert index.query(year=2025)["count"] == 3
+    assert index.query(year=2025, month=2)["total"] == 940
+    assert index.query(category="Fun") == {"total": 100, "count": 2, "minimum": 40, "maximum": 60}
+    assert index.query(start_month=(2024, 12), end_month=(2025, 1))["total"] == 160
+
+
+def test_index_is_persisted_and_updated_incrementally(tmp_path):
+    data_file = str(tmp_path / "expenses.json")
+    index_file = str(tmp_path / "expenses.json.summary.json")
+    expense_service = ExpenseService(ExpenseJsonRepository(JournalFileHandler(data_file),
+                                                           aggregate_index=AggregateIndex(index_file)))
+    expense_service.add_expenses(ROWS)
+    assert expense_service.summary(year=2025, category="Basic") == 1000
+
+    expense_service.add_expense("Taxi", 25, "Fun", datetime(2025, 2, 20))
+    rent = [expense for expense in expense_service.list_expenses() if expense.description == "Rent"][0]
+    expense_service.delete(rent.id)
+
+    reopened = AggregateIndex(index_file)
+    assert reopened.is_current(JournalFileHandler(data_file).version())
+    assert reopened.query(year=2025, month=2) == {"total": 65, "count": 2, "minimum": 25, "maximum": 40}
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    index = AggregateIndex(str(tmp_path / "expenses.json.summary.json"))
+    expense_service = ExpenseService(ExpenseJsonRepository(handler, aggregate_index=index))
+    expense_service.add_expense("Grocery", 100, "Basic", datetime(2025, 1, 10))
+
+    # Another writer that does not maintain the index.
+    ExpenseService(ExpenseJsonRepository(JSONFileHandler(handler.file_path))).add_expense(
+        "Rent", 900, "Basic", datetime(2025, 1, 11))
+
+    assert expense_service.summary(1, 2025) == 1000
+
+
+def test_summary_details_match_across_backends(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    json_service = ExpenseService(ExpenseJsonRepository(handler))
+    sqlite_service = ExpenseService(ExpenseSqliteRepository(str(tmp_path / "expenses.db")))
+    json_service.add_expenses(ROWS)
+    sqlite_service.add_expenses(ROWS)
+
+    for filters in [{}, {"year": 2025}, {"month": 2, "year": 2025}, {"category": "Fun"},
+                    {"start_month": (2024, 12), "end_month": (2025, 1)}]:
+        assert json_service.summary_details(**filters) == sqlite_service.summary_details(**filters)
+
+
+def test_adds_take_the_last_id_from_the_index(tmp_path, monkeypatch):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    index_file = str(tmp_path / "expenses.json.summary.json")
+    ExpenseService(ExpenseJsonRepository(handler, aggregate_index=AggregateIndex(index_file))).add_expenses(ROWS)
+
+    def unread(*args):
+        raise AssertionError("the ledger was read to find the last id")
+
+    # A new process numbers its add from the persisted index alone.
+    reopened = JSONFileHandler(handler.file_path)
+    monkeypatch.setattr(reopened, "iter_records", unread)
+    monkeypatch.setattr(reopened, "read_versioned", unread)
+    repository = ExpenseJsonRepository(reopened, aggregate_index=AggregateIndex(index_file))
+    assert ExpenseService(repository).add_expense("Taxi", 25, "Fun").id == 5
+    saved = AggregateIndex(index_file)
+    assert saved.is_current(reopened.version()) and saved.last_id == 5
+    monkeypatch.undo()
+
+    expense_service = ExpenseService(ExpenseJsonRepository(JSONFileHandler(handler.file_path),
+                                                           aggregate_index=AggregateIndex(index_file)))
+    expense_service.delete(5)
+    assert expense_service.add_expense("Bus", 3, "Fun").id == 5
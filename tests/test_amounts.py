@@ -0,0 +1,132 @@
+import json
+import sqlite3
+from array import array
+from datetime import datetime
+
+from app.aggregates import AggregateIndex
+from app.currency import LedgerCurrency
+from app.models import Expense
+from app.repositories import (ExpenseJsonRepository, ExpensePartitionedRepository, ExpenseSqliteRepository,
+                              stored_record)
+from app.services import ExpenseService
+from app.table import ExpenseTable
+from app.utils.binary_file_handler import BinaryFileHandler
+from app.utils.json_file_handler import JSONFileHandler
+
+LEGACY_RECORDS = [
+    {"id": record_id, "date": f"2024-01-{record_id:02d}T10:00:00", "amount": 0.1, "description": f"Coffee {record_id}",
+     "category": "food"} for record_id in range(1, 11)
+] + [{"id": 11, "date": "2024-02-01T09:00:00", "amount": 12.345, "description": "Rent", "category": "home"}]
+
+
+def test_totals_are_exact_on_every_backend(backend, make_repository):
+    service = ExpenseService(make_repository(backend))
+    service.clear_all_expenses()
+    for day in range(1, 11):
+        service.add_expense(f"Coffee {day}", 0.1, "food", datetime(2024, 1, day))
+    service.add_expense("Tip", 0.2, "food", datetime(2024, 2, 1))
+
+    # Summed as floats, ten times 0.1 comes to 0.9999999999999999.
+    assert service.summary(1, 2024) == 1.0
+    assert service.summary_details(category="food").model_dump() == \
+        {"total": 1.2, "count": 11, "minimum": 0.1, "maximum": 0.2}
+    assert service.expense_table().total() == 1.2
+    assert [row.total for row in service.report("month")] == [1.0, 0.2]
+
+
+def test_json_ledger_stores_integer_minor_units(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    service = ExpenseService(ExpenseJsonRepository(handler))
+
+    added = service.add_expense("Lunch", 12.5, "food", datetime(2024, 1, 5))
+    rounded = service.add_expense("Taxi", 19.999, "travel", datetime(2024, 1, 6))
+
+    assert [record["amount"] for record in handler.read()] == [1250, 2000]
+    assert (added.amount, rounded.amount) == (12.5, 20.0)
+    assert [expense.amount for expense in service.list_expenses()] == [12.5, 20.0]
+
+
+def test_stored_records_leave_the_expense_alone():
+    expense = Expense(description="Taxi", amount=19.999, category="travel", date=datetime(2024, 1, 6))
+
+    record = stored_record(expense, LedgerCurrency())
+
+    assert (record["amount"], expense.amount) == (2000, 19.999)
+
+
+def test_float_ledgers_are_read_and_migrated(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write(LEGACY_RECORDS)
+    index = AggregateIndex(str(tmp_path / "expenses.json.summary.json"))
+    service = ExpenseService(ExpenseJsonRepository(handler, aggregate_index=index))
+
+    assert service.summary(1, 2024) == 1.0
+    assert service.get(11).amount == 12.345
+
+    assert service.migrate_amounts(LedgerCurrency(code="EUR")) == 11
+
+    assert [record["amount"] for record in handler.read()] == [10] * 10 + [1234]
+    assert service.get(11).amount == 12.34
+    assert service.summary_details().total == 13.34
+    assert AggregateIndex(index.file_path).is_current(handler.version())
+
+
+def test_sqlite_real_column_is_migrated(tmp_path):
+    database_path = str(tmp_path / "expenses.db")
+    with sqlite3.connect(database_path) as connection:
+        # The schema databases were created with before amounts were stored in minor units.
+        connection.execute("CREATE TABLE expenses (id INTEGER PRIMARY KEY, date TEXT NOT NULL, amount REAL NOT NULL, "
+                           "description TEXT NOT NULL, category TEXT)")
+        connection.executemany("INSERT INTO expenses VALUES (?, ?, ?, ?, ?)",
+                               [(record["id"], record["date"], record["amount"], record["description"],
+                                 record["category"]) for record in LEGACY_RECORDS])
+    repository = ExpenseSqliteRepository(database_path)
+    service = ExpenseService(repository)
+    assert service.summary(1, 2024) == 1.0
+
+    service.migrate_amounts(LedgerCurrency())
+    service.add_expense("Tip", 0.2, "food", datetime(2024, 2, 2))
+
+    assert repository.connection.execute("SELECT DISTINCT typeof(amount) FROM expenses").fetchall() == [("integer",)]
+    assert service.summary_details(year=2024, month=2).model_dump() == \
+        {"total": 12.54, "count": 2, "minimum": 0.2, "maximum": 12.34}
+    assert [expense.id for expense in service.query_expenses(sort="amount", after="0.1,10")] == [12, 11]
+
+
+def test_changing_the_scale_rewrites_the_amounts(tmp_path):
+    directory = str(tmp_path / "expenses.d")
+    service = ExpenseService(ExpensePartitionedRepository(directory))
+    service.add_expense("Sushi", 1250.4, "food", datetime(2024, 1, 5))
+    service.add_expense("Ramen", 980, "food", datetime(2024, 2, 5))
+
+    service.migrate_amounts(LedgerCurrency(code="JPY", scale=0))
+
+    reopened = ExpenseService(ExpensePartitionedRepository(directory, currency=LedgerCurrency(code="JPY", scale=0)))
+    assert [expense.amount for expense in reopened.list_expenses()] == [1250.0, 980.0]
+    assert reopened.summary_details().total == 2230
+    assert json.loads((tmp_path / "expenses.d" / "2024-01.json").read_text())[0]["amount"] == 1250
+
+
+def test_binary_snapshots_keep_amounts_as_int64(tmp_path):
+    handler = BinaryFileHandler(str(tmp_path / "expenses.bin"))
+    service = ExpenseService(ExpenseJsonRepository(handler))
+    service.add_expense("Lunch", 12.5, "food", datetime(2024, 1, 5))
+
+    assert handler.columns().amounts.format == "q"
+    assert list(handler.columns().amounts) == [1250]
+    assert service.expense_table().total() == 12.5
+
+
+def test_totals_over_ten_million_rows_are_exact():
+    rows = 10_000_000
+    cents = [1, 10, 99, 12345]
+    repeat = rows // len(cents)
+    table = ExpenseTable.from_columns(array("q", range(1, rows + 1)), array("q", cents) * repeat,
+                                      array("q", [0]) * rows, array("i", [0, 1, 0, 2]) * repeat,
+                                      ["food", "home", "travel"], None)
+
+    assert table.total() == 311_375_000.0
+    assert table.sum_by_category() == {"food": 2_500_000.0, "home": 250_000.0, "travel": 308_625_000.0}
+    # The same amounts summed as floats are already off by more than a cent.
+    assert abs(sum([0.01, 0.1, 0.99, 123.45] * repeat) - 311_375_000.0) > 0.01
@@ -0,0 +1,117 @@
+import asyncio
+import io
+from datetime import datetime
+
+import pytest
+
+from app.async_repositories import ExecutorExpenseRepository
+from app.async_services import AsyncExpenseService
+from app.metrics import profiled
+from app.repositories import ExpenseJsonRepository, ExpenseSqliteRepository
+from app.utils.json_file_handler import JSONFileHandler
+
+
+class CountingJSONFileHandler(JSONFileHandler):
+    def __init__(self, file_path):
+        super().__init__(file_path)
+        self.reads = 0
+        self.writes = 0
+
+    def read_versioned(self):
+        self.reads += 1
+        return super().read_versioned()
+
+    def write(self, data):
+        self.writes += 1
+        super().write(data)
+
+
+@pytest.fixture
+def handler(tmp_path):
+    handler = CountingJSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    handler.writes = 0
+    return handler
+
+
+def run(coroutine_function, service):
+    try:
+        return asyncio.run(coroutine_function())
+    finally:
+        service.close()
+
+
+def test_concurrent_adds_are_written_in_batches(handler):
+    service = AsyncExpenseService(ExpenseJsonRepository(handler))
+
+    async def scenario():
+        return await asyncio.gather(*(service.add_expense(f"Expense {index}", index + 1) for index in range(300)))
+
+    expenses = run(scenario, service)
+
+    assert sorted(expense.id for expense in expenses) == list(range(1, 301))
+    assert handler.writes < 10
+    assert len(handler.read()) == 300
+
+
+def test_concurrent_identical_reads_share_one_load(handler):
+    service = AsyncExpenseService(ExpenseJsonRepository(handler))
+
+    async def scenario():
+        await service.add_expense("Grocery", 50, "food")
+        handler.reads = 0
+        return await asyncio.gather(*(service.list_expenses() for _ in range(100)))
+
+    results = run(scenario, service)
+
+    assert handler.reads == 1
+    assert all([expense.description for expense in result] == ["Grocery"] for result in results)
+
+
+def test_reads_after_a_write_see_it(handler):
+    service = AsyncExpenseService(ExpenseJsonRepository(handler))
+
+    async def scenario():
+        early_read = asyncio.ensure_future(service.list_expenses())
+        await asyncio.sleep(0)
+        expense = await service.add_expense("Grocery", 50, "food")
+        await service.update(expense.id, amount=75)
+        return await early_read, await service.list_expenses()
+
+    before, after = run(scenario, service)
+
+    assert before == []
+    assert [expense.amount for expense in after] == [75]
+
+
+def test_sqlite_repository_runs_on_the_executor(tmp_path):
+    repository = ExecutorExpenseRepository(ExpenseSqliteRepository(str(tmp_path / "expenses.db")))
+    service = AsyncExpenseService(repository)
+
+    async def scenario():
+        await asyncio.gather(*(service.add_expense("Lunch", 10, "food", datetime(2024, 3, day)) for day in range(1, 6)))
+        await service.delete(1)
+        with pytest.raises(ValueError):
+            await service.get(1)
+        return await service.summary_details(3, 2024)
+
+    summary = run(scenario, service)
+
+    assert (summary.total, summary.count) == (40, 4)
+
+
+def test_identical_page_queries_share_one_load(handler):
+    service = AsyncExpenseService(ExpenseJsonRepository(handler))
+
+    async def scenario():
+        for index in range(5):
+            await service.add_expense(f"Expense {index}", index + 1)
+        with profiled(stream=io.StringIO()) as metrics:
+            pages = await asyncio.gather(*(service.query_expenses(sort="amount", descending=True, limit=2)
+                                           for _ in range(50)))
+            return pages, metrics.snapshot()["counters"]
+
+    pages, counters = run(scenario, service)
+
+    assert counters["async.coalesced_reads"] == 49
+    assert all([expense.amount for expense in page] == [5, 4] for page in pages)
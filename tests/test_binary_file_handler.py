@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import Expense
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.utils.binary_file_handler import BinaryFileHandler, HEADER, convert
+from app.utils.json_file_handler import JSONFileHandler
+
+RECORDS = [
+    {"id": 1, "date": "2024-01-05T10:00:00", "amount": 50.0, "description": "Grocery", "category": "food"},
+    {"id": 2, "date": "2024-01-31T23:59:59.500000", "amount": 900.0, "description": "Rent", "category": "home"},
+    {"id": 3, "date": "2024-02-01T12:30:00", "amount": 12.5, "description": "Café", "category": "food"},
+    {"id": 4, "date": "2024-02-14T09:00:00", "amount": 30.0, "description": "Gift", "category": None},
+]
+
+
+def test_snapshot_round_trips_records(tmp_path):
+    handler = BinaryFileHandler(str(tmp_path / "expenses.bin"))
+    handler.write(RECORDS)
+
+    assert BinaryFileHandler(handler.file_path).read() == RECORDS
+    columns = handler.columns()
+    assert list(columns.ids) == [1, 2, 3, 4]
+    assert columns.categories == [None, "food", "home"]
+    assert columns.descriptions[2] == "Café"
+
+
+def test_missing_snapshot_reads_as_empty(tmp_path):
+    handler = BinaryFileHandler(str(tmp_path / "expenses.bin"))
+
+    assert handler.read() == []
+    assert handler.version() is None
+
+
+def test_corrupted_snapshot_is_rejected(tmp_path):
+    data_file = tmp_path / "expenses.bin"
+    BinaryFileHandler(str(data_file)).write(RECORDS)
+    payload = bytearray(data_file.read_bytes())
+    payload[HEADER.size + 3] ^= 0xFF
+    data_file.write_bytes(bytes(payload))
+
+    assert len(BinaryFileHandler(str(data_file)).read()) == len(RECORDS)
+    with pytest.raises(ValueError, match="checksum"):
+        BinaryFileHandler(str(data_file), verify_checksum=True).read()
+    data_file.write_bytes(bytes(payload[:-1]))
+    with pytest.raises(ValueError, match="truncated"):
+        BinaryFileHandler(str(data_file)).read()
+
+
+def test_repository_summaries_and_table_read_the_columns(tmp_path):
+    handler = BinaryFileHandler(str(tmp_path / "expenses.bin"))
+    handler.write(RECORDS)
+    service = ExpenseService(ExpenseJsonRepository(handler))
+
+    service.add_expense("Taxi", 20, "travel", datetime(2024, 2, 20))
+
+    assert service.summary(2, 2024) == 62.5
+    assert service.summary_details(category="food").count == 2
+    assert service.expense_table(start=datetime(2024, 2, 1)).sum_by_category() == {
+        "food": 12.5, None: 30.0, "travel": 20.0}
+    assert [expense.id for expense in service.list_expenses("travel")] == [5]
+    assert isinstance(service.list_expenses()[0], Expense)
+
+
+def test_convert_to_json_and_back(tmp_path):
+    json_handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    json_handler.write(RECORDS)
+    binary_handler = BinaryFileHandler(str(tmp_path / "expenses.bin"))
+
+    assert convert(json_handler, binary_handler) == 4
+    restored = JSONFileHandler(str(tmp_path / "restored.json"))
+    convert(binary_handler, restored)
+
+    assert restored.read() == RECORDS
+
+
+def test_find_uses_the_sorted_id_flag(tmp_path):
+    handler = BinaryFileHandler(str(tmp_path / "expenses.bin"))
+    handler.write(RECORDS)
+    assert handler.columns().sorted_ids
+    assert handler.columns().find(3) == 2
+    assert handler.columns().find(5) is None
+
+    handler.write([RECORDS[2], RECORDS[0]])
+    assert not handler.columns().sorted_ids
+    assert handler.columns().find(1) == 1
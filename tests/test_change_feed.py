@@ -0,0 +1,226 @@
+import json
+import sqlite3
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.changes import ChangeLog
+from app.currency import LedgerCurrency
+from app.repositories import ExpenseJsonRepository, ExpenseSqliteRepository, create_repository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+
+
+def operations(changes):
+    return [(change.operation, change.expense_id) for change in changes]
+
+
+def test_feed_covers_adds_updates_deletes_and_clears(backend, make_repository):
+    service = ExpenseService(make_repository(backend))
+    # The feed starts when it is first read.
+    assert service.changes_since(0)[0] == 0
+    service.clear_all_expenses()
+    service.add_expense("Grocery", 50, "food", datetime(2024, 1, 5))
+    service.add_expenses([{"description": "Rent", "amount": 900, "category": "home", "date": "2024-02-01"},
+                          {"description": "Lunch", "amount": 12.5, "category": "food", "date": "2024-02-03"}])
+    checkpoint, changes = service.changes_since(0)
+    assert operations(changes) == [("clear", None), ("add", 1), ("add", 2), ("add", 3)]
+
+    service.update(2, amount=950)
+    service.delete(1)
+    service.add_expense("Taxi", 19.999, "travel", datetime(2024, 3, 1))
+    next_checkpoint, changes = service.changes_since(checkpoint)
+    changes = list(changes)
+
+    assert operations(changes) == [("update", 2), ("delete", 1), ("add", 4)]
+    assert changes[0].expense.amount == 950 and changes[1].expense is None
+    assert (changes[2].expense.description, changes[2].expense.amount) == ("Taxi", 20.0)
+    assert next_checkpoint == changes[-1].sequence > checkpoint
+    assert list(service.changes_since(next_checkpoint)[1]) == []
+
+    service.clear_all_expenses()
+    service.add_expense("Coffee", 4, "food", datetime(2024, 3, 2))
+    last_checkpoint, changes = service.changes_since(next_checkpoint)
+    assert operations(changes) == [("clear", None), ("add", 1)]
+    assert last_checkpoint == next_checkpoint + 2
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite", "partitioned"])
+def test_a_checkpoint_past_the_feed_is_rejected(backend, make_repository):
+    service = ExpenseService(make_repository(backend))
+    service.clear_all_expenses()
+    service.add_expense("Grocery", 50, "food", datetime(2024, 1, 5))
+
+    with pytest.raises(ValueError, match="Invalid checkpoint 5"):
+        service.changes_since(5)
+
+
+def test_ledgers_older_than_the_feed_start_with_their_expenses(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([{"id": 3, "date": "2024-01-05T10:00:00", "amount": 1250, "description": "Lunch",
+                    "category": "food"}, {"id": 7, "date": "2024-01-06T10:00:00", "amount": 12.5,
+                                          "description": "Legacy", "category": None}])
+    change_log = ChangeLog(str(tmp_path / "changes.jsonl"))
+    service = ExpenseService(ExpenseJsonRepository(handler, change_log=change_log))
+
+    service.delete(7)
+    assert not change_log.exists()
+    service.changes_since(0)
+    service.add_expense("Tea", 2, None, datetime(2024, 1, 7))
+    checkpoint, changes = service.changes_since(0)
+
+    assert operations(changes) == [("add", 3), ("add", 4)]
+    assert [change.expense.amount for change in service.changes_since(0)[1]] == [12.5, 2]
+    assert checkpoint == 2
+
+
+def test_sqlite_databases_older_than_the_feed_start_with_their_expenses(tmp_path):
+    database_path = str(tmp_path / "expenses.db")
+    with sqlite3.connect(database_path) as connection:
+        connection.execute("CREATE TABLE expenses (id INTEGER PRIMARY KEY, date TEXT NOT NULL, amount INTEGER NOT NULL, "
+                           "description TEXT NOT NULL, category TEXT)")
+        connection.execute("INSERT INTO expenses VALUES (4, '2024-01-05T10:00:00', 1250, 'Lunch', 'food')")
+
+    checkpoint, changes = ExpenseService(ExpenseSqliteRepository(database_path)).changes_since(0)
+
+    changes = list(changes)
+    assert (checkpoint, operations(changes)) == (1, [("add", 4)])
+    assert changes[0].expense.amount == 12.5
+
+
+def test_writes_made_without_the_feed_start_it_over(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    service = ExpenseService(ExpenseJsonRepository(handler, change_log=ChangeLog(str(tmp_path / "changes.jsonl"))))
+    service.add_expense("Grocery", 50, "food", datetime(2024, 1, 5))
+    checkpoint, _ = service.changes_since(0)
+
+    ExpenseService(ExpenseJsonRepository(handler)).add_expense("Rent", 900, "home", datetime(2024, 2, 1))
+    service.add_expense("Lunch", 12, "food", datetime(2024, 2, 3))
+
+    assert operations(service.changes_since(checkpoint)[1]) == [("clear", None), ("add", 1), ("add", 2), ("add", 3)]
+    with pytest.raises(ValueError, match="no change feed"):
+        ExpenseService(ExpenseJsonRepository(handler)).changes_since(0)
+
+
+def test_json_and_journal_keep_their_own_feeds_from_the_first_read(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ledger_directory = tmp_path / "app" / "ledgers" / "team"
+    json_service = ExpenseService(create_repository("json", ledger="team"))
+    json_service.add_expense("Grocery", 50, "food", datetime(2024, 1, 5))
+    assert list(ledger_directory.glob("*.changes.jsonl")) == []
+    json_service.changes_since(0)
+    journal_service = ExpenseService(create_repository("journal", ledger="team"))
+    checkpoint, _ = journal_service.changes_since(0)
+    # Behind the journal's feed, which is left for its next reader to start over.
+    json_service.add_expense("Rent", 900, "home", datetime(2024, 2, 1))
+    json_feed = (ledger_directory / "expenses.json.changes.jsonl").read_text()
+
+    def rebuild(*args):
+        raise AssertionError("A write rebuilt the feed")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(ChangeLog, "seed", rebuild)
+        journal_service.add_expense("Lunch", 12, "food", datetime(2024, 2, 3))
+
+    assert (ledger_directory / "expenses.json.changes.jsonl").read_text() == json_feed
+    assert operations(json_service.changes_since(0)[1]) == [("add", 1), ("add", 2)]
+    assert operations(journal_service.changes_since(checkpoint)[1]) == [("clear", None), ("add", 1), ("add", 2),
+                                                                         ("add", 3)]
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "binary", "partitioned"])
+def test_a_change_the_log_missed_starts_the_feed_over(backend, monkeypatch, make_repository):
+    service = ExpenseService(make_repository(backend))
+    service.clear_all_expenses()
+    service.add_expense("Grocery", 50, "food", datetime(2024, 1, 5))
+    checkpoint, _ = service.changes_since(0)
+
+    def crash(*args):
+        raise OSError("Crashed before logging")
+
+    # The expense is stored, but the process dies before its entry is written.
+    monkeypatch.setattr(ChangeLog, "append", crash)
+    with pytest.raises(OSError):
+        service.add_expense("Rent", 900, "home", datetime(2024, 2, 1))
+    monkeypatch.undo()
+    service = ExpenseService(make_repository(backend))
+
+    next_checkpoint, changes = service.changes_since(checkpoint)
+    assert operations(changes) == [("clear", None), ("add", 1), ("add", 2)]
+    service.delete(1)
+    assert operations(service.changes_since(next_checkpoint)[1]) == [("delete", 1)]
+
+
+def test_migrating_amounts_logs_every_expense_as_updated(backend, make_repository):
+    service = ExpenseService(make_repository(backend))
+    service.clear_all_expenses()
+    service.add_expense("Grocery", 12.34, "food", datetime(2024, 1, 5))
+    service.add_expense("Rent", 900, "home", datetime(2024, 2, 1))
+    checkpoint = service.changes_since(0)[0]
+
+    service.migrate_amounts(LedgerCurrency(code="JPY", scale=0))
+    changes = list(service.changes_since(checkpoint)[1])
+
+    assert operations(changes) == [("update", 1), ("update", 2)]
+    assert [change.expense.amount for change in changes] == [12, 900]
+
+
+def test_compacting_a_journal_keeps_the_feed(make_repository):
+    service = ExpenseService(make_repository("journal"))
+    service.clear_all_expenses()
+    service.add_expense("Grocery", 50, "food", datetime(2024, 1, 5))
+    checkpoint, _ = service.changes_since(0)
+
+    service.repository.compact()
+    service.add_expense("Rent", 900, "home", datetime(2024, 2, 1))
+
+    assert operations(service.changes_since(checkpoint)[1]) == [("add", 2)]
+
+
+def test_reading_after_a_checkpoint_skips_the_history(tmp_path, monkeypatch):
+    change_log = ChangeLog(str(tmp_path / "changes.jsonl"))
+    change_log.append(("add", expense_id, {"id": expense_id, "description": "x" * 50})
+                      for expense_id in range(1, 100_001))
+    decoded = []
+
+    def counting_loads(text):
+        decoded.append(text)
+        return json.loads(text)
+
+    monkeypatch.setattr("app.changes.json", SimpleNamespace(loads=counting_loads, dumps=json.dumps))
+    entries = list(change_log.read(99_990))
+
+    assert [entry["seq"] for entry in entries] == list(range(99_991, 100_001))
+    # A binary search over about 10 MB, then one block of lines, instead of 100,000 decoded lines.
+    assert len(decoded) < 2000
+
+
+def test_a_torn_entry_is_ignored_and_replaced(tmp_path):
+    change_log = ChangeLog(str(tmp_path / "changes.jsonl"))
+    change_log.append([("add", 1, None), ("add", 2, None)])
+    with open(change_log.file_path, "a") as log_file:
+        log_file.write('{"seq": 3, "op": "ad')
+
+    assert ChangeLog(change_log.file_path).last_sequence() == 2
+    assert [entry["seq"] for entry in change_log.read(0)] == [1, 2]
+    assert change_log.append([("delete", 1, None)]) == 3
+    assert [entry["op"] for entry in change_log.read(0)] == ["add", "add", "delete"]
+
+
+def test_changes_are_exported_as_csv(tmp_path, make_repository):
+    service = ExpenseService(make_repository("json"))
+    service.clear_all_expenses()
+    service.add_expense("Grocery", 50, "food", datetime(2024, 1, 5))
+    checkpoint, _ = service.changes_since()
+    service.add_expense("Rent", 900, "home", datetime(2024, 2, 1))
+    service.delete(1)
+    output = tmp_path / "changes.csv"
+
+    assert service.export_changes_to_csv(str(output), checkpoint) == (checkpoint + 2, 2)
+    assert output.read_text().splitlines() == [
+        "Sequence,Operation,ID,Description,Category,Amount,Date",
+        f"{checkpoint + 1},add,2,Rent,home,900.0,2024-02-01 00:00:00",
+        f"{checkpoint + 2},delete,1,,,,",
+    ]
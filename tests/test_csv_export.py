@@ -0,0 +1,60 @@
+import csv
+import gzip
+from datetime import datetime
+
+from app.repositories import ExpenseJsonRepository, ExpenseSqliteRepository
+from app.utils.csv_export import CSV_HEADER
+from app.utils.json_file_handler import JSONFileHandler
+
+RECORDS = [
+    {"id": 1, "date": datetime(2025, 1, 10), "amount": 100.0, "description": "Grocery", "category": "Basic"},
+    {"id": 2, "date": datetime(2025, 2, 10), "amount": 250.0, "description": "Rent", "category": "Basic"},
+    {"id": 3, "date": datetime(2025, 2, 11), "amount": 40.0, "description": "Movie", "category": "Fun"},
+]
+
+
+def read_csv(file_path, compressed=False):
+    opener = gzip.open(file_path, "rt", newline="") if compressed else open(file_path, newline="")
+    with opener as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def test_iter_records_decodes_across_chunks(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write(RECORDS)
+
+    assert list(handler.iter_records(chunk_size=7)) == handler.read()
+
+
+def test_export_with_filters(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write(RECORDS)
+    repository = ExpenseJsonRepository(handler)
+    output = str(tmp_path / "basic.csv")
+
+    repository.export_expenses_to_csv(output, category="Basic", month=2, year=2025)
+
+    assert read_csv(output) == [CSV_HEADER, ["2", "Rent", "Basic", "250.0", "2025-02-10 00:00:00"]]
+
+
+def test_export_gzip_matches_across_backends(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write(RECORDS)
+    sqlite_repository = ExpenseSqliteRepository(str(tmp_path / "expenses.db"))
+    sqlite_repository.migrate_from(handler)
+
+    ExpenseJsonRepository(handler).export_expenses_to_csv(str(tmp_path / "json.csv.gz"), compress=True)
+    sqlite_repository.export_expenses_to_csv(str(tmp_path / "sqlite.csv.gz"), compress=True)
+
+    json_rows = read_csv(str(tmp_path / "json.csv.gz"), compressed=True)
+    assert len(json_rows) == 4
+    assert json_rows == read_csv(str(tmp_path / "sqlite.csv.gz"), compressed=True)
+
+
+def test_export_to_stdout(tmp_path, capsys):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write(RECORDS)
+
+    ExpenseJsonRepository(handler).export_expenses_to_csv("-", category="Fun")
+
+    assert capsys.readouterr().out.splitlines() == [",".join(CSV_HEADER), "3,Movie,Fun,40.0,2025-02-11 00:00:00"]
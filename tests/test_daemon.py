@@ -0,0 +1,189 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.cache import ExpenseCache
+from app.daemon import ExpenseDaemon
+from app.daemon_client import DaemonClient, DaemonError
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.utils.journal_file_handler import JournalFileHandler
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    repository = ExpenseJsonRepository(JournalFileHandler(str(tmp_path / "expenses.json")), cache=ExpenseCache())
+    expense_daemon = ExpenseDaemon(ExpenseService(repository), str(tmp_path / "daemon.sock"), "journal")
+    thread = threading.Thread(target=asyncio.run, args=(expense_daemon.serve(),))
+    thread.start()
+    for _ in range(100):
+        if DaemonClient.connect(expense_daemon.socket_path, "journal"):
+            break
+        time.sleep(0.01)
+    yield expense_daemon
+    expense_daemon.stop()
+    thread.join()
+
+
+def test_client_round_trip(daemon):
+    client = DaemonClient.connect(daemon.socket_path, "journal")
+
+    expense = client.add_expense("Grocery", 50, "Basic")
+    client.add_expense("Rent", 900, "Basic")
+
+    assert expense.id == 1
+    assert [expense.description for expense in client.list_expenses("Basic")] == ["Grocery", "Rent"]
+    assert client.summary_details()["total"] == 950
+    client.delete(expense.id)
+    assert [expense.id for expense in client.list_expenses()] == [2]
+    with pytest.raises(DaemonError):
+        client.delete(expense.id)
+
+
+def test_validation_errors_are_reported_per_field(daemon):
+    client = DaemonClient.connect(daemon.socket_path, "journal")
+
+    with pytest.raises(DaemonError) as error:
+        client.add_expense("", -1)
+
+    assert {error["loc"][0] for error in error.value.errors()} == {"description", "amount"}
+
+
+def test_concurrent_adds_get_unique_ids(daemon):
+    client = DaemonClient.connect(daemon.socket_path, "journal")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        expenses = list(executor.map(lambda index: client.add_expense(f"Expense {index}", index + 1), range(50)))
+
+    assert sorted(expense.id for expense in expenses) == list(range(1, 51))
+    assert client.summary_details()["count"] == 50
+
+
+def test_connect_checks_backend(daemon):
+    assert DaemonClient.connect(daemon.socket_path, "sqlite") is None
+    assert DaemonClient.connect(daemon.socket_path + ".missing", "journal") is None
+
+
+def test_get_and_update_through_the_daemon(daemon):
+    client = DaemonClient.connect(daemon.socket_path, "journal")
+    expense = client.add_expense("Grocery", 50, "Basic")
+
+    updated = client.update(expense.id, amount=75)
+
+    assert (updated.description, updated.amount) == ("Grocery", 75)
+    assert client.get(expense.id).amount == 75
+    with pytest.raises(DaemonError):
+        client.get(42)
+
+
+def test_metrics_are_served_while_running(daemon):
+    client = DaemonClient.connect(daemon.socket_path, "journal")
+    client.metrics(reset=True)
+    client.add_expense("Grocery", 50, "Basic")
+    client.list_expenses()
+
+    metrics = client.metrics(reset=True)
+
+    assert metrics["counters"]["daemon.requests.add"] == 1
+    assert metrics["counters"]["journal.bytes_written"] > 0
+    assert metrics["timers"]["daemon.list"]["calls"] == 1
+    assert client.metrics()["counters"] == {"daemon.requests.metrics": 1}
+
+
+def test_a_slow_export_does_not_block_the_event_loop(daemon, tmp_path):
+    client = DaemonClient.connect(daemon.socket_path, "journal")
+    release = threading.Event()
+    daemon.expense_service.export_expenses_to_csv = lambda *args: release.wait(5)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        export = executor.submit(client.export_expenses_to_csv, str(tmp_path / "expenses.csv"))
+        time.sleep(0.1)
+        add = executor.submit(client.add_expense, "Grocery", 50)
+
+        assert DaemonClient(daemon.socket_path, "journal", timeout=1).request("ping")["backend"] == "journal"
+        assert not add.done()
+        release.set()
+        export.result()
+
+        assert add.result().id == 1
+
+
+def test_pages_are_queried_through_the_daemon(daemon):
+    from app.queries import cursor_for
+
+    client = DaemonClient.connect(daemon.socket_path, "journal")
+    for amount in (30, 10, 20):
+        client.add_expense(f"Lunch {amount}", amount, "food")
+
+    page = client.query_expenses(sort="amount", limit=2)
+
+    assert [expense.amount for expense in page] == [10, 20]
+    assert [expense.amount for expense in client.query_expenses(
+        sort="amount", limit=2, after=cursor_for(page[-1], "amount"))] == [30]
+    with pytest.raises(DaemonError, match="Invalid cursor"):
+        client.query_expenses(after="last")
+
+
+def test_reports_reuse_the_daemons_date_index(daemon):
+    from datetime import datetime
+
+    client = DaemonClient.connect(daemon.socket_path, "journal")
+    client.add_expense("Grocery", 50, "food", datetime(2024, 1, 5))
+    client.add_expense("Rent", 900, "home", datetime(2024, 2, 1))
+    client.metrics(reset=True)
+
+    rows = client.report("month", start=datetime(2024, 1, 1))
+    client.report("month", by_category=True)
+
+    assert [(row.bucket, row.total, row.count) for row in rows] == [("2024-01", 50, 1), ("2024-02", 900, 1)]
+    assert client.metrics()["timers"]["reports.build_index"]["calls"] == 1
+
+
+def test_other_ledgers_need_a_registry(daemon):
+    assert DaemonClient.connect(daemon.socket_path, "journal", "default") is not None
+    assert DaemonClient.connect(daemon.socket_path, "journal", "team-a") is None
+
+
+def test_unexpected_errors_are_still_answered(daemon):
+    client = DaemonClient.connect(daemon.socket_path, "journal")
+
+    def broken(category=''):
+        raise RuntimeError("index is corrupt")
+
+    daemon.expense_service.list_expenses = broken
+    with pytest.raises(DaemonError, match="index is corrupt"):
+        client.list_expenses()
+    assert client.summary_details()["count"] == 0
+
+
+def test_the_cli_reports_a_daemon_that_goes_away(tmp_path):
+    socket_path = str(tmp_path / "daemon.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+
+    def answer_ping_then_hang_up():
+        for reply in (b'{"ok": true, "result": "pong"}\n', b""):
+            connection, _ = listener.accept()
+            with connection:
+                connection.recv(65536)
+                connection.sendall(reply)
+
+    thread = threading.Thread(target=answer_ping_then_hang_up)
+    thread.start()
+    cli_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cli.py")
+    result = subprocess.run([sys.executable, cli_path, "--socket", socket_path, "add", "--description", "Tea",
+                             "--amount", "2"], cwd=tmp_path, capture_output=True, text=True, timeout=60)
+    thread.join()
+    listener.close()
+
+    assert "Error: The daemon at" in result.stdout and "closed the connection" in result.stdout
+    assert "Traceback" not in result.stderr
+    assert not os.path.exists(tmp_path / "app" / "expenses.json")
@@ -0,0 +1,51 @@
+from app.cache import ExpenseCache
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+from app.utils.journal_file_handler import JournalFileHandler
+
+
+def test_repeated_reads_are_served_from_cache(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    cache = ExpenseCache()
+    expense_service = ExpenseService(ExpenseJsonRepository(handler, cache=cache))
+    expense_service.add_expense("Grocery", 5000, "Basic")
+
+    misses = cache.misses
+    expense_service.list_expenses()
+    expense_service.summary()
+    expense_service.list_expenses("Basic")
+
+    assert cache.misses == misses
+    assert cache.hits >= 3
+
+
+def test_cache_invalidates_when_file_changes(tmp_path):
+    data_file = str(tmp_path / "expenses.json")
+    JSONFileHandler(data_file).write([])
+    cache = ExpenseCache()
+    cached_service = ExpenseService(ExpenseJsonRepository(JSONFileHandler(data_file), cache=cache))
+    other_service = ExpenseService(ExpenseJsonRepository(JSONFileHandler(data_file)))
+
+    assert cached_service.list_expenses() == []
+    other_service.add_expense("Rent", 10000)
+    other_service.add_expense("Grocery", 5000)
+
+    assert [expense.description for expense in cached_service.list_expenses()] == ["Rent", "Grocery"]
+    assert cache.misses == 2
+
+
+def test_cache_is_updated_in_place_after_appends(tmp_path):
+    cache = ExpenseCache()
+    repository = ExpenseJsonRepository(JournalFileHandler(str(tmp_path / "expenses.json")), cache=cache)
+    expense_service = ExpenseService(repository)
+
+    grocery = expense_service.add_expense("Grocery", 5000)
+    expense_service.list_expenses()
+    expense_service.add_expense("Rent", 10000)
+    expense_service.delete(grocery.id)
+    misses = cache.misses
+
+    assert [expense.description for expense in expense_service.list_expenses()] == ["Rent"]
+    assert cache.misses == misses
@@ -120,7 +120,7 @@ def test_monthly_summary_expense():
     expense_service.add_expense("Grocery", 5500, category="Basic", date_time=january_date)
     expense_service.add_expense("Rent", 11500, category="Basic", date_time=january_date)
 
-    january_total_expense = expense_service.summary(january_date.month)
+    january_total_expense = expense_service.summary(january_date.month, january_date.year)
 
     assert january_total_expense == 17000
 
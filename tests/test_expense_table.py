@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pytest
+
+from app import table as table_module
+from app.currency import LedgerCurrency
+from app.repositories import ExpenseJsonRepository, ExpenseSqliteRepository
+from app.services import ExpenseService
+from app.table import ExpenseTable
+from app.utils.json_file_handler import JSONFileHandler
+
+RECORDS = [
+    {"id": 1, "description": "Grocery", "amount": 50.0, "category": "food", "date": "2024-01-05T10:00:00"},
+    {"id": 2, "description": "Rent", "amount": 900.0, "category": "home", "date": "2024-01-31T23:59:59.500000"},
+    {"id": 3, "description": "Lunch", "amount": 12.5, "category": "food", "date": "2024-02-01T12:30:00"},
+    {"id": 4, "description": "Gift", "amount": 30.0, "category": None, "date": "2024-02-14T09:00:00"},
+]
+
+
+@pytest.fixture(params=["python", "numpy"])
+def vectorised(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(table_module, "numpy", None)
+    elif table_module.numpy is None:
+        pytest.skip("NumPy is not installed")
+    return request.param
+
+
+def test_columns_are_packed_and_categories_encoded():
+    table = ExpenseTable.from_records(RECORDS)
+
+    assert len(table) == 4
+    assert table.ids.typecode == "q" and table.amounts.typecode == "q" and table.timestamps.typecode == "q"
+    # The float amounts of these records are held as cents.
+    assert list(table.amounts) == [5000, 90000, 1250, 3000]
+    assert table.categories == ["food", "home", None]
+    assert list(table.category_codes) == [0, 1, 0, 2]
+
+
+def test_filters_and_aggregates(vectorised):
+    table = ExpenseTable.from_records(RECORDS)
+
+    assert table.total() == pytest.approx(992.5)
+    assert table.sum_by_category() == {"food": 62.5, "home": 900.0, None: 30.0}
+    assert table.sum_by_month() == {(2024, 1): 950.0, (2024, 2): 42.5}
+
+    january = table.where(start=datetime(2024, 1, 1), end=datetime(2024, 2, 1))
+    assert list(january.ids) == [1, 2]
+    assert list(table.where(category="food").ids) == [1, 3]
+    assert len(table.where(category="travel")) == 0
+    assert table.where(category="food", start=datetime(2024, 2, 1)).total() == 12.5
+
+
+def test_grouped_sums_are_exact_beyond_float_precision(vectorised):
+    # Summed as float64, adding 1 to 2**53 is lost; in integers it is not.
+    table = ExpenseTable.from_records([
+        {"id": expense_id, "description": "Transfer", "amount": amount, "category": "bank",
+         "date": "2024-01-05T10:00:00"} for expense_id, amount in enumerate([2 ** 53, 1, 1], start=1)
+    ], LedgerCurrency(scale=0))
+
+    assert table.sum_by_category() == {"bank": 2 ** 53 + 2}
+    assert table.sum_by_month() == {(2024, 1): 2 ** 53 + 2}
+
+
+def test_rows_come_back_as_expense_views():
+    expenses = list(ExpenseTable.from_records(RECORDS))
+
+    assert [expense.id for expense in expenses] == [1, 2, 3, 4]
+    assert expenses[1].date == datetime(2024, 1, 31, 23, 59, 59, 500000)
+    assert expenses[3].category is None
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_repositories_build_the_same_table(tmp_path, backend):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write(RECORDS)
+    if backend == "json":
+        repository = ExpenseJsonRepository(handler)
+    else:
+        repository = ExpenseSqliteRepository(str(tmp_path / "expenses.db"))
+        repository.migrate_from(handler)
+
+    table = ExpenseService(repository).expense_table(category="food")
+
+    assert list(table.ids) == [1, 3]
+    assert table.total() == 62.5
@@ -0,0 +1,83 @@
+import json
+import multiprocessing
+from datetime import datetime
+
+import pytest
+
+from app.aggregates import AggregateIndex, aggregate_index_path
+from app.models import Expense
+from app.repositories import ExpenseJsonRepository
+from app.utils.json_file_handler import JSONFileHandler
+from app.utils.journal_file_handler import JournalFileHandler
+
+HANDLERS = {"json": JSONFileHandler, "journal": JournalFileHandler}
+
+
+def _repository(backend, data_file, indexed=False):
+    index = AggregateIndex(aggregate_index_path(data_file)) if indexed else None
+    return ExpenseJsonRepository(HANDLERS[backend](data_file), aggregate_index=index)
+
+
+def _add_expenses(backend, data_file, count, indexed=False):
+    repository = _repository(backend, data_file, indexed)
+    for _ in range(count):
+        repository.add_expense(Expense(description="Coffee", amount=3.5, category="food", date=datetime.now()))
+
+
+def _summarise(backend, data_file, count):
+    for _ in range(count):
+        _repository(backend, data_file, indexed=True).expense_summary()
+
+
+@pytest.mark.parametrize("backend", sorted(HANDLERS))
+def test_concurrent_writers_lose_no_updates(tmp_path, backend):
+    data_file = str(tmp_path / "expenses.json")
+    HANDLERS[backend](data_file).write([])
+
+    processes = [multiprocessing.Process(target=_add_expenses, args=(backend, data_file, 20)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    ids = [record["id"] for record in HANDLERS[backend](data_file).read()]
+    assert sorted(ids) == list(range(1, 81))
+
+
+@pytest.mark.parametrize("backend", sorted(HANDLERS))
+def test_summaries_during_writes_lose_no_updates(tmp_path, backend):
+    data_file = str(tmp_path / "expenses.json")
+    HANDLERS[backend](data_file).write([])
+
+    processes = [multiprocessing.Process(target=_add_expenses, args=(backend, data_file, 100, True)) for _ in range(3)]
+    processes += [multiprocessing.Process(target=_summarise, args=(backend, data_file, 200)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0] * 5
+    assert sorted(record["id"] for record in HANDLERS[backend](data_file).read()) == list(range(1, 301))
+    assert _repository(backend, data_file, indexed=True).expense_summary().count == 300
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path):
+    data_file = tmp_path / "expenses.json"
+    handler = JSONFileHandler(str(data_file))
+    handler.write([{"id": 1, "description": "Grocery"}])
+
+    with pytest.raises(TypeError):
+        handler.write([{"id": 2, "description": object()}])
+
+    assert json.loads(data_file.read_text()) == [{"id": 1, "description": "Grocery"}]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["expenses.json", "expenses.json.lock"]
+
+
+def test_read_versioned_matches_the_data_read(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([{"id": 1}])
+
+    version, data = handler.read_versioned()
+
+    assert data == [{"id": 1}]
+    assert version == handler.version()
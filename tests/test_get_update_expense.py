@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+
+
+@pytest.fixture
+def service(backend, make_repository):
+    service = ExpenseService(make_repository(backend))
+    service.clear_all_expenses()
+    service.add_expense("Grocery", 50, "food", datetime(2024, 1, 5))
+    service.add_expense("Rent", 900, "home", datetime(2024, 2, 1))
+    service.add_expense("Lunch", 12.5, "food", datetime(2024, 2, 3))
+    return service
+
+
+def test_get_expense_by_id(service):
+    assert service.get(2).description == "Rent"
+    with pytest.raises(ValueError, match="not found"):
+        service.get(42)
+
+
+def test_update_changes_only_the_given_fields(service):
+    updated = service.update(1, amount=60, category="groceries")
+
+    assert (updated.id, updated.description, updated.amount, updated.category) == (1, "Grocery", 60, "groceries")
+    assert service.get(1).amount == 60
+    assert [expense.id for expense in service.list_expenses()] == [1, 2, 3]
+    assert service.summary_details(category="food").total == 12.5
+    assert service.summary(1, 2024) == 60
+
+
+def test_update_can_move_an_expense_to_another_month(service):
+    service.update(3, date_time=datetime(2024, 1, 31))
+
+    assert service.get(3).date == datetime(2024, 1, 31)
+    assert service.summary(1, 2024) == 62.5
+    assert service.summary(2, 2024) == 900
+
+
+def test_update_command_can_change_the_date(tmp_path):
+    cli = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cli.py")
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "expenses.json").write_text("[]")
+
+    def run(*args):
+        subprocess.run([sys.executable, cli, "--no-daemon", "--log-file", "", *args], cwd=tmp_path, check=True,
+                       capture_output=True)
+
+    run("add", "--description", "Lunch", "--amount", "12")
+    run("update", "--id", "1", "--date", "2024-01-31")
+
+    expense = ExpenseService(ExpenseJsonRepository(JSONFileHandler(str(tmp_path / "app" / "expenses.json")))).get(1)
+    assert expense.date == datetime(2024, 1, 31)
+    assert expense.description == "Lunch"
+
+
+def test_update_validates_and_reports_missing_ids(service):
+    with pytest.raises(ValidationError):
+        service.update(1, amount=-5)
+    with pytest.raises(ValueError, match="not found"):
+        service.update(42, amount=5)
+    assert service.get(1).amount == 50
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from app.repositories import ExpenseJsonRepository, ExpenseSqliteRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+from app.utils.journal_file_handler import JournalFileHandler
+
+
+def test_add_expenses_reports_bad_rows_without_aborting(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    expense_service = ExpenseService(ExpenseJsonRepository(handler))
+    expense_service.add_expense("Existing", 10)
+
+    result = expense_service.add_expenses([
+        {"description": "Grocery", "amount": 5000, "category": "Basic"},
+        {"description": "Broken", "amount": -1},
+        {"description": "Rent", "amount": "10000"},
+        {"description": "", "amount": 1},
+    ], batch_size=3)
+
+    assert result.added == 2
+    assert [error.line for error in result.errors] == [2, 4]
+    assert "amount" in result.errors[0].message
+    expenses = expense_service.list_expenses()
+    assert [(expense.id, expense.description) for expense in expenses] == [(1, "Existing"), (2, "Grocery"),
+                                                                           (3, "Rent")]
+
+
+def test_import_csv_file(tmp_path):
+    import_file = tmp_path / "statement.csv"
+    import_file.write_text("ID,Description,Category,Amount,Date\n"
+                           "9,Grocery,Basic,12.5,2025-02-10 00:00:00\n"
+                           "10,Movie,,not-a-number,\n"
+                           "11,Rent,,900,\n")
+    expense_service = ExpenseService(ExpenseSqliteRepository(str(tmp_path / "expenses.db")))
+
+    result = expense_service.import_expenses(str(import_file))
+
+    assert result.added == 2
+    assert [error.line for error in result.errors] == [3]
+    expenses = expense_service.list_expenses()
+    assert [expense.id for expense in expenses] == [1, 2]
+    assert expenses[0].amount == 12.5
+    assert expenses[1].category is None
+
+
+def test_import_json_lines_file(tmp_path):
+    import_file = tmp_path / "statement.jsonl"
+    import_file.write_text('{"description": "Grocery", "amount": 10}\n'
+                           '{"description": "Rent", "amount": \n'
+                           '\n'
+                           '{"description": "Movie", "amount": 5, "category": "Fun"}\n')
+    expense_service = ExpenseService(ExpenseJsonRepository(JournalFileHandler(str(tmp_path / "expenses.json"))))
+
+    result = expense_service.import_expenses(str(import_file))
+
+    assert result.added == 2
+    assert [error.line for error in result.errors] == [2]
+    assert [expense.description for expense in expense_service.list_expenses()] == ["Grocery", "Movie"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_import_files_merges_in_file_order_with_per_file_errors(tmp_path, workers):
+    first = tmp_path / "january.csv"
+    first.write_text("description,amount,category,date\n"
+                     "Grocery,50,food,2024-01-05T10:00:00\n"
+                     "Broken,-1,food,2024-01-06T10:00:00\n"
+                     "Rent,900,home,2024-01-31T09:00:00\n")
+    second = tmp_path / "february.jsonl"
+    second.write_text("".join(json.dumps({"description": f"Coffee {day}", "amount": 3, "date": f"2024-02-{day:02d}"})
+                              + "\n" for day in range(1, 8)) + "not json\n")
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    expense_service = ExpenseService(ExpenseJsonRepository(handler))
+
+    results = expense_service.import_files([str(first), str(second), str(tmp_path / "missing.csv")],
+                                           workers=workers, batch_size=2, chunk_bytes=64)
+
+    assert [(result.added, [error.line for error in result.errors]) for result in results] == [
+        (2, [3]), (7, [8]), (0, [0])]
+    expenses = expense_service.list_expenses()
+    assert [expense.id for expense in expenses] == list(range(1, 10))
+    assert [expense.description for expense in expenses[:3]] == ["Grocery", "Rent", "Coffee 1"]
+
+
+def test_import_reports_unreadable_files_as_errors(tmp_path):
+    import_file = tmp_path / "statement.csv"
+    import_file.write_bytes("description,amount\nCafé,3\n".encode("latin-1"))
+    expense_service = ExpenseService(ExpenseSqliteRepository(str(tmp_path / "expenses.db")))
+
+    with pytest.raises(ValueError, match="not UTF-8"):
+        expense_service.import_expenses(str(import_file))
+    with pytest.raises(IOError, match="Failed to read"):
+        expense_service.import_expenses(str(tmp_path / "missing.csv"))
+    assert expense_service.list_expenses() == []
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_import_files_reports_undecodable_files_and_keeps_the_rest(tmp_path, workers):
+    good = tmp_path / "good.csv"
+    good.write_text("description,amount\nGrocery,50\nRent,900\n")
+    bad = tmp_path / "bad.csv"
+    bad.write_bytes(("description,amount\n" + "Coffee,3\n" * 20 + "Café,3\n").encode("latin-1"))
+    expense_service = ExpenseService(ExpenseSqliteRepository(str(tmp_path / "expenses.db")))
+
+    results = expense_service.import_files([str(good), str(bad)], workers=workers, chunk_bytes=64)
+
+    assert results[0].added == 2 and results[0].errors == []
+    assert results[1].added == 0 and [error.line for error in results[1].errors] == [0]
+    assert "not UTF-8" in results[1].errors[0].message
+    assert [expense.description for expense in expense_service.list_expenses()] == ["Grocery", "Rent"]
+
+
+def test_parallel_import_keeps_quoted_fields_that_span_chunks(tmp_path):
+    import_file = tmp_path / "statement.csv"
+    import_file.write_text("description,amount\n" + "Coffee,3\n" * 10 + '"Split\nacross lines",4\n'
+                           + "Tea,2\n" * 10 + "Broken,-1\n")
+    expense_service = ExpenseService(ExpenseSqliteRepository(str(tmp_path / "expenses.db")))
+
+    [result] = expense_service.import_files([str(import_file)], workers=2, chunk_bytes=32)
+
+    assert result.added == 21
+    assert [error.line for error in result.errors] == [24]
+    assert "Split\nacross lines" in [expense.description for expense in expense_service.list_expenses()]
@@ -0,0 +1,77 @@
+import json
+
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.utils.journal_file_handler import JournalFileHandler
+
+
+def test_append_and_remove_replay_from_journal(tmp_path):
+    data_file = str(tmp_path / "expenses.json")
+    handler = JournalFileHandler(data_file)
+    handler.append({"id": 1, "description": "Grocery"})
+    handler.append({"id": 2, "description": "Rent"})
+
+    assert handler.remove(1)
+    assert not handler.remove(42)
+
+    reopened = JournalFileHandler(data_file)
+    assert reopened.read() == [{"id": 2, "description": "Rent"}]
+    assert reopened.last_id() == 2
+
+
+def test_torn_append_does_not_corrupt_earlier_records(tmp_path):
+    data_file = str(tmp_path / "expenses.json")
+    handler = JournalFileHandler(data_file)
+    handler.append({"id": 1, "description": "Grocery"})
+    with open(handler.journal_path, "a") as journal:
+        journal.write('{"op": "add", "record": {"id": 2, "desc')
+
+    reopened = JournalFileHandler(data_file)
+    assert reopened.read() == [{"id": 1, "description": "Grocery"}]
+
+    reopened.append({"id": 2, "description": "Rent"})
+    assert JournalFileHandler(data_file).read() == [{"id": 1, "description": "Grocery"},
+                                                    {"id": 2, "description": "Rent"}]
+
+
+def test_compact_folds_journal_into_snapshot(tmp_path):
+    data_file = str(tmp_path / "expenses.json")
+    handler = JournalFileHandler(data_file)
+    handler.append({"id": 1, "description": "Grocery"})
+    handler.append({"id": 2, "description": "Rent"})
+    handler.remove(1)
+
+    handler.compact()
+
+    with open(data_file) as snapshot_file:
+        assert json.load(snapshot_file) == [{"id": 2, "description": "Rent"}]
+    with open(handler.journal_path) as journal:
+        assert journal.read() == ""
+    assert JournalFileHandler(data_file).read() == [{"id": 2, "description": "Rent"}]
+
+
+def test_journal_compacts_automatically(tmp_path):
+    data_file = str(tmp_path / "expenses.json")
+    handler = JournalFileHandler(data_file, compact_threshold=3)
+    for expense_id in range(1, 5):
+        handler.append({"id": expense_id})
+
+    with open(data_file) as snapshot_file:
+        assert len(json.load(snapshot_file)) == 3
+    assert [record["id"] for record in handler.read()] == [1, 2, 3, 4]
+
+
+def test_repository_with_journal_handler(tmp_path):
+    repository = ExpenseJsonRepository(JournalFileHandler(str(tmp_path / "expenses.json")))
+    expense_service = ExpenseService(repository)
+
+    grocery = expense_service.add_expense("Grocery", 5000, "Basic")
+    rent = expense_service.add_expense("Rent", 10000, "Basic")
+    expense_service.delete(grocery.id)
+
+    expenses = expense_service.list_expenses()
+    assert [expense.id for expense in expenses] == [rent.id]
+    assert expense_service.summary() == 10000
+
+    expense_service.clear_all_expenses()
+    assert expense_service.list_expenses() == []
@@ -0,0 +1,82 @@
+import io
+import json
+from datetime import datetime
+
+from app.cache import ExpenseCache
+from app.metrics import profiled
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+
+
+def records(start, stop):
+    return [{"id": record_id, "description": f"Expense {record_id}"} for record_id in range(start, stop)]
+
+
+def test_extend_splices_records_onto_the_array(tmp_path):
+    data_file = tmp_path / "expenses.json"
+    handler = JSONFileHandler(str(data_file))
+    handler.write(records(1, 101))
+    size = data_file.stat().st_size
+
+    handler.extend(records(101, 102))
+
+    assert handler.read() == records(1, 102)
+    assert data_file.stat().st_size - size == len(json.dumps(records(101, 102)[0])) + 2
+    assert data_file.read_text().splitlines()[-2:] == [json.dumps(records(101, 102)[0]), "]"]
+
+
+def test_extend_on_an_empty_or_missing_file(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.extend(records(1, 3))
+    handler.write([])
+    assert (tmp_path / "expenses.json").read_text() == "[]"
+    handler.extend(records(3, 4))
+
+    assert handler.read() == records(3, 4)
+
+
+def test_a_torn_splice_is_dropped_and_repaired(tmp_path):
+    data_file = tmp_path / "expenses.json"
+    handler = JSONFileHandler(str(data_file))
+    handler.write(records(1, 3))
+    # A crash while splicing record 3 in: the closing bracket is gone and the last line is cut short.
+    data_file.write_text(data_file.read_text()[:-3] + ',\n{"id": 3, "descr')
+
+    assert handler.read() == records(1, 3)
+    assert list(handler.iter_records()) == records(1, 3)
+
+    handler.extend(records(4, 5))
+
+    assert json.loads(data_file.read_text()) == records(1, 3) + records(4, 5)
+
+
+def test_pretty_printing_is_opt_in(tmp_path):
+    data_file = tmp_path / "expenses.json"
+    handler = JSONFileHandler(str(data_file), indent=4)
+    handler.write(records(1, 2))
+    handler.extend(records(2, 3))
+
+    assert data_file.read_text() == json.dumps(records(1, 3), indent=4)
+
+
+def test_unchanged_cached_expenses_are_not_serialised_again(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"), cache_encoded=True)
+    handler.write([])
+    expense_service = ExpenseService(ExpenseJsonRepository(handler, cache=ExpenseCache()))
+    for day in range(1, 21):
+        expense_service.add_expense(f"Expense {day}", day, "food", datetime(2024, 1, day))
+
+    with profiled(stream=io.StringIO()) as metrics:
+        expense_service.add_expense("Rent", 900, "home", datetime(2024, 1, 21))
+        added = metrics.snapshot()["counters"]
+        metrics.reset()
+        expense_service.delete(5)
+        deleted = metrics.snapshot()["counters"]
+
+    assert added["json.bytes_written"] < 150
+    assert (added["repository.rows_serialised"], added["json.records_encoded"]) == (1, 1)
+    assert "repository.rows_serialised" not in deleted
+    assert "json.records_encoded" not in deleted
+    assert [expense.id for expense in ExpenseService(ExpenseJsonRepository(handler)).list_expenses()] == \
+        [*range(1, 5), *range(6, 22)]
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from app.cache import ExpenseCache
+from app.constants import DATA_FILE, LEDGERS_DIR
+from app.daemon import ExpenseDaemon
+from app.daemon_client import DaemonClient
+from app.ledgers import LedgerRegistry, ledger_path
+from app.repositories import ExpenseJsonRepository, ExpenseSqliteRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+
+
+def json_opener(tmp_path, opened=None):
+    def open_ledger(name):
+        if opened is not None:
+            opened.append(name)
+        handler = JSONFileHandler(str(tmp_path / f"{name}.json"), cache_encoded=True)
+        if not os.path.exists(handler.file_path):
+            handler.write([])
+        return ExpenseService(ExpenseJsonRepository(handler, cache=ExpenseCache()), ledger=name)
+    return open_ledger
+
+
+def test_named_ledgers_get_their_own_directory():
+    assert ledger_path("json") == ledger_path("json", "default") == DATA_FILE
+    assert ledger_path("sqlite", "team-a") == os.path.join(LEDGERS_DIR, "team-a", "expenses.db")
+    assert ledger_path("partitioned", "acme.eu_2") == os.path.join(LEDGERS_DIR, "acme.eu_2", "expenses.d")
+    for name in ("", "..", "../etc", "a/b", ".hidden", "x" * 65):
+        with pytest.raises(ValueError, match="Invalid ledger name"):
+            ledger_path("json", name)
+
+
+def test_services_are_pooled_and_least_recently_used_closed_first(tmp_path):
+    opened = []
+    registry = LedgerRegistry(max_open=2, opener=json_opener(tmp_path, opened))
+
+    first = registry.service("a")
+    assert registry.service("a") is first
+    registry.service("b")
+    registry.service("a")
+    registry.service("c")
+
+    assert registry.open_ledgers() == ["a", "c"]
+    assert opened == ["a", "b", "c"]
+    registry.service("b")
+    assert opened == ["a", "b", "c", "b"]
+    assert "a" not in registry
+
+
+def test_memory_budget_closes_ledgers_holding_cached_data(tmp_path):
+    for name in ("a", "b", "c"):
+        json_opener(tmp_path)(name).add_expenses(
+            {"description": f"Expense {index}", "amount": 1, "category": "food"} for index in range(1000))
+    registry = LedgerRegistry(memory_budget=2_000_000, opener=json_opener(tmp_path))
+
+    for name in ("a", "b", "c"):
+        assert len(registry.service(name).list_expenses()) == 1000
+
+    # Each ledger caches about 1.2 MB, so two loaded ledgers are over budget when the next one is opened.
+    assert registry.open_ledgers() == ["b", "c"]
+    registry.service("a")
+    assert registry.open_ledgers() == ["c", "a"]
+    assert registry.memory_footprint() <= 2_000_000
+
+
+def test_idle_ledgers_are_closed(tmp_path):
+    registry = LedgerRegistry(idle_seconds=0.05, opener=json_opener(tmp_path))
+    registry.service("a")
+    registry.service("b")
+    time.sleep(0.1)
+    registry.service("c")
+
+    assert registry.open_ledgers() == ["c"]
+    time.sleep(0.1)
+    assert registry.evict_idle() == 1
+    assert len(registry) == 0
+
+
+def test_closing_a_sqlite_ledger_closes_its_connection(tmp_path):
+    registry = LedgerRegistry(max_open=1, opener=lambda name: ExpenseService(
+        ExpenseSqliteRepository(str(tmp_path / f"{name}.db")), ledger=name))
+    repository = registry.service("a").repository
+    registry.service("b")
+
+    with pytest.raises(Exception, match="closed"):
+        repository.connection.execute("SELECT 1")
+
+
+def test_service_opens_named_ledgers_separately(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "app").mkdir()
+
+    team_a = ExpenseService(ledger="team-a")
+    team_b = ExpenseService(ledger="team-b", backend="sqlite")
+    team_a.add_expense("Coffee", 4, "food", datetime(2024, 1, 5))
+
+    assert team_a.ledger == "team-a"
+    assert [expense.description for expense in ExpenseService(ledger="team-a").list_expenses()] == ["Coffee"]
+    assert team_b.list_expenses() == []
+    assert (tmp_path / LEDGERS_DIR / "team-b" / "expenses.db").exists()
+    assert not (tmp_path / DATA_FILE).exists()
+
+
+def test_daemon_serves_many_ledgers_from_the_registry(tmp_path):
+    home = ExpenseService(json_opener(tmp_path)("default").repository)
+    registry = LedgerRegistry(max_open=2, opener=json_opener(tmp_path))
+    expense_daemon = ExpenseDaemon(home, str(tmp_path / "daemon.sock"), "json", registry=registry)
+    thread = threading.Thread(target=asyncio.run, args=(expense_daemon.serve(),))
+    thread.start()
+    try:
+        for _ in range(100):
+            if DaemonClient.connect(expense_daemon.socket_path, "json"):
+                break
+            time.sleep(0.01)
+        clients = {name: DaemonClient.connect(expense_daemon.socket_path, "json", name)
+                   for name in ("default", "a", "b", "c")}
+        for name, client in clients.items():
+            client.add_expense(f"{name} rent", 100, "home")
+        clients["a"].add_expense("a lunch", 10, "food")
+
+        assert [expense.description for expense in clients["a"].list_expenses()] == ["a rent", "a lunch"]
+        assert clients["c"].summary_details()["total"] == 100
+        assert [expense.description for expense in clients["default"].list_expenses()] == ["default rent"]
+        assert len(registry) == 2
+    finally:
+        expense_daemon.stop()
+        thread.join()
@@ -0,0 +1,69 @@
+import json
+import threading
+
+import pytest
+
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+from app.utils.logger_config import get_logger, setup_logger, shutdown_logger
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    yield tmp_path / "expense_tracker.log"
+    shutdown_logger()
+    get_logger().propagate = True
+
+
+def test_setup_is_idempotent(log_file):
+    setup_logger(log_file=str(log_file), console=False)
+    setup_logger(log_file=str(log_file), console=False)
+
+    get_logger().info("Added %s expenses", 3)
+    shutdown_logger()
+
+    assert len(get_logger().handlers) == 0
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 1 and lines[0].endswith("INFO - Added 3 expenses")
+
+
+def test_messages_are_formatted_and_written_off_the_calling_thread(log_file):
+    threads = []
+
+    class Recorder:
+        def __str__(self):
+            threads.append(threading.current_thread())
+            return "recorded"
+
+    setup_logger(log_file=str(log_file), console=False)
+    get_logger().info("Value: %s", Recorder())
+    shutdown_logger()
+
+    assert threads and threading.current_thread() not in threads
+    assert log_file.read_text().endswith("Value: recorded\n")
+
+
+def test_json_format_and_level(log_file):
+    setup_logger(level="warning", log_file=str(log_file), log_format="json", console=False)
+    get_logger().info("Not written")
+    get_logger().warning("Slow batch of %s rows", 500, extra={"rows": 500})
+    shutdown_logger()
+
+    entry = json.loads(log_file.read_text())
+    assert (entry["level"], entry["message"], entry["rows"]) == ("WARNING", "Slow batch of 500 rows", 500)
+    assert entry["logger"] == "ExpenseTracker"
+
+
+def test_bulk_adds_log_one_record_per_batch(tmp_path, log_file):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    setup_logger(log_file=str(log_file), console=False)
+
+    result = ExpenseService(ExpenseJsonRepository(handler)).add_expenses(
+        {"description": f"Expense {index}", "amount": 1} for index in range(1000))
+    shutdown_logger()
+
+    lines = log_file.read_text().splitlines()
+    assert result.added == 1000
+    assert len(lines) == 1 and lines[0].endswith("INFO - Added 1000 expenses")
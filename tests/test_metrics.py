@@ -0,0 +1,53 @@
+import io
+import pstats
+
+from app.cache import ExpenseCache
+from app.metrics import METRICS, profiled
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+
+
+def make_service(tmp_path, cache=None):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([])
+    return ExpenseService(ExpenseJsonRepository(handler, cache=cache))
+
+
+def test_nothing_is_recorded_while_disabled(tmp_path):
+    expense_service = make_service(tmp_path)
+    METRICS.reset()
+
+    expense_service.add_expense("Grocery", 50, "Basic")
+    expense_service.list_expenses()
+
+    assert METRICS.snapshot() == {"counters": {}, "timers": {}}
+
+
+def test_profiled_records_the_hot_paths(tmp_path):
+    expense_service = make_service(tmp_path, cache=ExpenseCache())
+    output = io.StringIO()
+
+    with profiled(stream=output) as metrics:
+        expense_service.add_expense("Grocery", 50, "Basic")
+        expense_service.list_expenses()
+        snapshot = metrics.snapshot()
+
+    assert not METRICS.enabled
+    assert snapshot["counters"]["json.bytes_read"] > 0
+    assert snapshot["counters"]["json.bytes_written"] > 0
+    assert snapshot["counters"]["cache.hits"] == 1
+    assert snapshot["counters"]["validation.rows"] == 1
+    assert snapshot["timers"]["service.add_expense"]["calls"] == 1
+    assert snapshot["timers"]["repository.serialise"]["calls"] == 1
+    assert "service.list_expenses" in output.getvalue()
+
+
+def test_profile_output_is_a_cprofile_dump(tmp_path):
+    expense_service = make_service(tmp_path)
+    dump = str(tmp_path / "profile.out")
+
+    with profiled(dump, stream=io.StringIO()):
+        expense_service.list_expenses()
+
+    assert pstats.Stats(dump).total_calls > 0
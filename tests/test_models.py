@@ -1,5 +1,9 @@
 from datetime import datetime
-from app.models import Expense
+
+import pytest
+from pydantic import ValidationError
+
+from app.models import Expense, STORED_CONTEXT
 
 
 def test_create_expense_model():
@@ -8,3 +12,24 @@ def test_create_expense_model():
     assert expense.amount == 1000
     assert expense.description == "Example 1"
     assert expense.category == "Example 2"
+
+
+def test_stored_expense_skips_date_window():
+    data = {"id": 1, "date": "2001-05-21T10:00:00", "amount": 100, "description": "Grocery", "category": None}
+
+    with pytest.raises(ValidationError):
+        Expense(**data)
+
+    expense = Expense.model_validate(data, context=STORED_CONTEXT)
+    assert expense.date == datetime(2001, 5, 21, 10, 0, 0)
+
+
+def test_expense_from_storage():
+    data = {"id": 7, "date": "2025-01-10T09:30:00", "amount": 250, "description": "Rent", "category": "Basic"}
+
+    expense = Expense.from_storage(data)
+
+    assert expense.id == 7
+    assert expense.date == datetime(2025, 1, 10, 9, 30, 0)
+    assert expense.amount == 250.0
+    assert expense.category == "Basic"
@@ -0,0 +1,112 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from app.models import Expense
+from app.repositories import ExpensePartitionedRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+
+RECORDS = [
+    {"id": 1, "description": "Grocery", "amount": 50.0, "category": "food", "date": "2024-01-05T10:00:00"},
+    {"id": 2, "description": "Rent", "amount": 900.0, "category": "home", "date": "2024-02-01T09:00:00"},
+    {"id": 3, "description": "Lunch", "amount": 12.5, "category": "food", "date": "2024-01-20T12:30:00"},
+]
+
+
+@pytest.fixture
+def repository(tmp_path):
+    source = JSONFileHandler(str(tmp_path / "expenses.json"))
+    source.write(RECORDS)
+    repository = ExpensePartitionedRepository(str(tmp_path / "expenses.d"))
+    assert repository.migrate_from(source) == 3
+    return repository
+
+
+def partition_ids(repository, name):
+    with open(os.path.join(repository.directory, f"{name}.json")) as partition_file:
+        return [record["id"] for record in json.load(partition_file)]
+
+
+def test_migration_splits_records_by_month(repository):
+    assert partition_ids(repository, "2024-01") == [1, 3]
+    assert partition_ids(repository, "2024-02") == [2]
+    assert [expense.id for expense in repository.get_all_expenses()] == [1, 2, 3]
+    assert repository.manifest.last_id == 3
+
+
+def test_adds_and_deletes_touch_only_their_partition(repository):
+    service = ExpenseService(repository)
+    january_version = repository._handler("2024-01").version()
+
+    expense = service.add_expense("Taxi", 20, "travel", datetime(2024, 2, 3))
+    assert expense.id == 4
+    assert partition_ids(repository, "2024-02") == [2, 4]
+    assert repository._handler("2024-01").version() == january_version
+
+    service.delete(2)
+    assert partition_ids(repository, "2024-02") == [4]
+    assert repository._handler("2024-01").version() == january_version
+    with pytest.raises(ValueError):
+        service.delete(2)
+
+
+def test_summaries_come_from_the_manifest(repository):
+    service = ExpenseService(repository)
+
+    assert service.summary(1, 2024) == 62.5
+    details = service.summary_details(category="food")
+    assert (details.count, details.minimum, details.maximum) == (2, 12.5, 50.0)
+
+    service.delete(1)
+    assert service.summary_details(1, 2024).maximum == 12.5
+    assert service.summary(start_month=(2024, 2), end_month=(2024, 12)) == 900.0
+
+
+def test_partition_edited_behind_the_manifest_is_re_aggregated(repository):
+    JSONFileHandler(repository._handler("2024-02").file_path).write(
+        [dict(RECORDS[1], amount=100.0)])
+
+    assert ExpensePartitionedRepository(repository.directory).total_expense() == 162.5
+
+
+def test_ids_survive_clearing_and_reopening(repository):
+    reopened = ExpensePartitionedRepository(repository.directory)
+    new = reopened.add_expense(Expense(description="Book", amount=8, category="fun", date=datetime(2024, 3, 1)))
+    assert new.id == 4
+
+    reopened.clear_all_expenses()
+    assert reopened.get_all_expenses() == []
+    assert reopened.add_expense(Expense(description="Tea", amount=2, category=None, date=datetime(2024, 3, 2))).id == 1
+
+
+def test_adds_read_only_the_tail_of_the_id_index(repository):
+    id_log = os.path.join(repository.directory, "ids.log")
+    # Recorded by an add that crashed before it saved the manifest.
+    with open(id_log, "a") as index_file:
+        index_file.write("7 2024-01\n")
+    reopened = ExpensePartitionedRepository(repository.directory)
+
+    expense = reopened.add_expense(Expense(description="Book", amount=8, category="fun", date=datetime(2024, 3, 1)))
+
+    assert expense.id == 8
+    # The id map is only loaded for lookups.
+    assert (reopened.id_index.partitions, reopened.id_index._offset) == ({}, 0)
+    assert reopened.get_expense(8).description == "Book"
+    assert reopened.manifest.id_log_size == os.path.getsize(id_log)
+    assert reopened.id_index.last_id_after(reopened.manifest.id_log_size) == 0
+
+
+def test_lookups_follow_a_clear_by_another_process(repository):
+    assert repository.get_expense(2).description == "Rent"
+    other = ExpensePartitionedRepository(repository.directory)
+    other.clear_all_expenses()
+    # Refilled well past the offset the first repository had read up to.
+    for index in range(10):
+        other.add_expense(Expense(description=f"Expense {index}", amount=1, category=None,
+                                  date=datetime(2024, 5 + index % 2, 1)))
+
+    assert repository.get_expense(2).description == "Expense 1"
+    assert repository.id_index._offset == os.path.getsize(repository.id_index.file_path)
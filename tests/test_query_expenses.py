@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+from app.queries import cursor_for
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+
+
+@pytest.fixture
+def service(backend, make_repository):
+    service = ExpenseService(make_repository(backend))
+    service.clear_all_expenses()
+    service.add_expense("Grocery run", 50, "food", datetime(2024, 1, 5))
+    service.add_expense("Rent", 900, "home", datetime(2024, 2, 1))
+    service.add_expense("Lunch", 12.5, "food", datetime(2024, 1, 3))
+    service.add_expense("Groceries", 50, "food", datetime(2024, 3, 9))
+    service.add_expense("Coffee 100%_pure", 4, "food", datetime(2024, 1, 3))
+    return service
+
+
+def ids(expenses):
+    return [expense.id for expense in expenses]
+
+
+def test_limit_and_offset_page_through_in_id_order(service):
+    assert ids(service.query_expenses()) == [1, 2, 3, 4, 5]
+    assert ids(service.query_expenses(limit=2)) == [1, 2]
+    assert ids(service.query_expenses(limit=2, offset=2)) == [3, 4]
+    assert ids(service.query_expenses(category="food", offset=1)) == [3, 4, 5]
+    assert ids(service.query_expenses(descending=True, limit=2)) == [5, 4]
+
+
+@pytest.mark.parametrize("sort, descending, expected", [
+    ("id", False, [1, 2, 3, 4, 5]),
+    ("date", False, [3, 5, 1, 2, 4]),
+    ("date", True, [4, 2, 1, 5, 3]),
+    ("amount", False, [5, 3, 1, 4, 2]),
+    ("amount", True, [2, 4, 1, 3, 5]),
+])
+def test_keyset_pages_add_up_to_the_full_sort(service, sort, descending, expected):
+    assert ids(service.query_expenses(sort=sort, descending=descending)) == expected
+
+    pages, after = [], None
+    while True:
+        page = list(service.query_expenses(sort=sort, descending=descending, limit=2, after=after))
+        pages.append(ids(page))
+        if len(page) < 2:
+            break
+        after = cursor_for(page[-1], sort)
+    assert sum(pages, []) == expected
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+
+def test_search_matches_descriptions_ignoring_case(service):
+    assert ids(service.query_expenses(search="grocer")) == [1, 4]
+    assert ids(service.query_expenses(search="GROCER", sort="date", descending=True)) == [4, 1]
+    assert ids(service.query_expenses(search="%_")) == [5]
+    assert ids(service.query_expenses(category="home", search="grocer")) == []
+
+
+def test_an_invalid_cursor_is_rejected(service):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        list(service.query_expenses(sort="date", after="yesterday"))
+
+
+def test_the_first_page_stops_reading_early(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write([{"id": expense_id, "description": f"Expense {expense_id}", "amount": 1, "category": "food",
+                    "date": "2024-01-01T00:00:00"} for expense_id in range(1, 10001)])
+    records = handler.iter_records
+
+    read = []
+
+    def counting_records():
+        for record in records():
+            read.append(record["id"])
+            yield record
+
+    handler.iter_records = counting_records
+    page = list(ExpenseService(ExpenseJsonRepository(handler)).query_expenses(limit=10, offset=5))
+
+    assert ids(page) == list(range(6, 16))
+    assert len(read) == 15
@@ -0,0 +1,73 @@
+import io
+import json
+from datetime import datetime
+
+from app.reports import DateIndex, write_report
+from app.repositories import ExpenseJsonRepository
+from app.services import ExpenseService
+from app.table import ExpenseTable
+from app.utils.json_file_handler import JSONFileHandler
+
+RECORDS = [
+    {"id": 1, "description": "Rent", "amount": 900.0, "category": "home", "date": "2024-02-01T09:00:00"},
+    {"id": 2, "description": "Grocery", "amount": 50.0, "category": "food", "date": "2023-12-30T10:00:00"},
+    {"id": 3, "description": "Lunch", "amount": 12.5, "category": "food", "date": "2024-01-02T12:30:00"},
+    {"id": 4, "description": "Gift", "amount": 30.0, "category": None, "date": "2024-01-31T18:00:00"},
+]
+
+
+def make_service(tmp_path):
+    handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    handler.write(RECORDS)
+    return ExpenseService(ExpenseJsonRepository(handler))
+
+
+def test_date_index_finds_half_open_ranges():
+    index = DateIndex(ExpenseTable.from_records(RECORDS))
+
+    assert list(index.rows_between()) == [1, 2, 3, 0]
+    assert list(index.rows_between(datetime(2024, 1, 1), datetime(2024, 2, 1))) == [2, 3]
+    assert list(index.rows_between(end=datetime(2023, 12, 30, 10))) == []
+
+
+def test_report_buckets_by_period(tmp_path):
+    service = make_service(tmp_path)
+
+    def totals(period, **kwargs):
+        return [(row.bucket, row.total, row.count) for row in service.report(period, **kwargs)]
+
+    assert totals("month") == [("2023-12", 50.0, 1), ("2024-01", 42.5, 2), ("2024-02", 900.0, 1)]
+    assert totals("year") == [("2023", 50.0, 1), ("2024", 942.5, 3)]
+    assert totals("week", end=datetime(2024, 1, 8)) == [("2023-W52", 50.0, 1), ("2024-W01", 12.5, 1)]
+    assert totals("day", start=datetime(2024, 1, 31), category="food") == []
+
+
+def test_report_splits_buckets_by_category(tmp_path):
+    service = make_service(tmp_path)
+
+    rows = [(row.bucket, row.category, row.total) for row in service.report("month", by_category=True)]
+
+    assert rows == [("2023-12", "food", 50.0), ("2024-01", None, 30.0), ("2024-01", "food", 12.5),
+                    ("2024-02", "home", 900.0)]
+
+
+def test_date_index_is_rebuilt_only_after_changes(tmp_path):
+    service = make_service(tmp_path)
+    index = service.reports.index()
+
+    assert service.reports.index() is index
+    service.add_expense("Taxi", 20, "travel", datetime(2024, 2, 3))
+    assert service.reports.index() is not index
+    assert [row.total for row in service.report("month", start=datetime(2024, 2, 1))] == [920.0]
+
+
+def test_write_report_formats(tmp_path):
+    service = make_service(tmp_path)
+
+    csv_output, json_output = io.StringIO(), io.StringIO()
+    assert write_report(service.report("year"), "csv", csv_output) == 2
+    write_report(service.report("year", by_category=True), "json", json_output, by_category=True)
+
+    assert csv_output.getvalue().splitlines() == ["bucket,total,count", "2023,50.0,1", "2024,942.5,3"]
+    assert json.loads(json_output.getvalue())[0] == {"bucket": "2023", "category": "food", "total": 50.0,
+                                                     "count": 1}
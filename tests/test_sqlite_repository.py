@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+from app.repositories import ExpenseSqliteRepository
+from app.services import ExpenseService
+from app.utils.json_file_handler import JSONFileHandler
+
+
+def test_add_and_list_expenses_by_category(tmp_path):
+    repository = ExpenseSqliteRepository(str(tmp_path / "expenses.db"))
+    expense_service = ExpenseService(repository)
+
+    expense_service.add_expense("Grocery", 5000, "Basic")
+    expense_service.add_expense("Movie", 500, "Entertainment")
+    expense_service.add_expense("Electricity Bill", 3000, "Basic")
+
+    expenses = expense_service.list_expenses("Basic")
+    assert [expense.description for expense in expenses] == ["Grocery", "Electricity Bill"]
+    assert [expense.id for expense in expense_service.list_expenses()] == [1, 2, 3]
+
+
+def test_summary_is_computed_in_sql(tmp_path):
+    repository = ExpenseSqliteRepository(str(tmp_path / "expenses.db"))
+    expense_service = ExpenseService(repository)
+    now = datetime.now()
+
+    assert expense_service.summary() == 0
+    expense_service.add_expense("Grocery", 5500, "Basic", now)
+    expense_service.add_expense("Rent", 11500, "Basic", now)
+
+    assert expense_service.summary() == 17000
+    assert expense_service.summary(now.month) == 17000
+    assert expense_service.summary(now.month % 12 + 1) == 0
+
+
+def test_delete_expense(tmp_path):
+    repository = ExpenseSqliteRepository(str(tmp_path / "expenses.db"))
+    expense_service = ExpenseService(repository)
+    expense = expense_service.add_expense("Shoes", 1500)
+
+    expense_service.delete(expense.id)
+
+    assert expense_service.list_expenses() == []
+    with pytest.raises(ValueError):
+        expense_service.delete(expense.id)
+
+
+def test_migrate_from_json_file(tmp_path):
+    json_handler = JSONFileHandler(str(tmp_path / "expenses.json"))
+    json_handler.write([
+        {"id": 3, "date": datetime(2025, 1, 10), "amount": 100.0, "description": "Grocery", "category": "Basic"},
+        {"id": 7, "date": datetime(2025, 2, 10), "amount": 250.0, "description": "Rent", "category": None},
+    ])
+    repository = ExpenseSqliteRepository(str(tmp_path / "expenses.db"))
+
+    assert repository.migrate_from(json_handler) == 2
+
+    expenses = repository.get_all_expenses()
+    assert [expense.id for expense in expenses] == [3, 7]
+    assert expenses[0].date == datetime(2025, 1, 10)
+    assert repository.total_expense() == 350.0
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cli.py")
+# Generous enough for a slow CI box; loading pydantic alone costs more than this.
+COLD_START_BUDGET_US = 150_000
+
+
+def run_cli(cwd, *args):
+    """Run the CLI with -X importtime and return (stdout, imported module names, total import time in µs)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", CLI_PATH, *args],
+                            cwd=cwd, capture_output=True, text=True, check=True)
+    modules, total = [], 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.append(name.strip())
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return result.stdout, modules, total
+
+
+def test_help_stays_within_cold_start_budget(tmp_path):
+    _, modules, total = run_cli(tmp_path, "--help")
+
+    assert "pydantic" not in modules
+    assert "app.repositories" not in modules
+    assert total < COLD_START_BUDGET_US
+    assert not (tmp_path / "expense_tracker.log").exists()
+
+
+def test_summary_is_answered_from_index_without_models(tmp_path):
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "expenses.json").write_text("[]")
+    run_cli(tmp_path, "add", "--description", "Grocery", "--amount", "20")
+
+    output, modules, total = run_cli(tmp_path, "summary")
+
+    assert output == "Total expense: 20.0\n"
+    assert "pydantic" not in modules
+    assert total < COLD_START_BUDGET_US